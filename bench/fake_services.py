@@ -0,0 +1,462 @@
+"""
+Local stand-ins for the services the app talks to, served from one FastAPI
+app on 127.0.0.1:
+
+- OpenAI-compatible `/v1/chat/completions` (plans, tool calls, reports,
+  streaming), with configurable latency and output size;
+- Tavily `/tavily/search` (the app reaches it via DLAI_TAVILY_BASE_URL);
+- arXiv `/arxiv.org/api/query` (Atom) and `/arxiv.org/pdf/<id>.pdf`
+  (generated fixture PDFs);
+- Wikipedia `/w/api.php`.
+
+Every route records its own latency; tool calls are also timed from the
+app's side (see `_note_tool_results`).
+"""
+import re
+import json
+import time
+import uuid
+import random
+import socket
+import asyncio
+import hashlib
+import threading
+from typing import Dict, List, Optional
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+
+# order in which the fake model calls the research tools, one per turn
+TOOL_ORDER = (
+    "local_corpus_search_tool",
+    "tavily_search_tool",
+    "arxiv_search_tool",
+    "wikipedia_search_tool",
+)
+# the "for each collected item" step checks this many items in one batch lookup
+LOOKUP_ITEMS = 8
+
+_WORDS = (
+    "agent model retrieval evidence benchmark latency corpus citation survey "
+    "transformer dataset evaluation method result analysis baseline ablation "
+    "training inference context planning reasoning tool search report"
+).split()
+
+PLAN = [
+    {
+        "step": "Research agent: Use Tavily to perform a broad web search and collect top relevant items (title, authors, year, venue/source, URL, DOI if available).",
+        "depends_on": [],
+    },
+    {
+        "step": "Research agent: For each collected item, search on arXiv to find matching preprints/versions and record arXiv URLs (if they exist).",
+        "depends_on": [0],
+    },
+    {
+        "step": "Research agent: Search Wikipedia for background on the key concepts of the topic.",
+        "depends_on": [],
+    },
+    {
+        "step": "Research agent: Synthesize and rank findings by relevance, recency, and authority; deduplicate by title/DOI.",
+        "depends_on": [1, 2],
+    },
+    {
+        "step": "Writer agent: Draft a structured outline based on the ranked evidence.",
+        "depends_on": [3],
+    },
+    {
+        "step": "Editor agent: Review for coherence, coverage, and citation completeness; request fixes.",
+        "depends_on": [4],
+    },
+    {
+        "step": "Writer agent: Generate the final comprehensive Markdown report with inline citations and a complete References section with clickable links.",
+        "depends_on": [5],
+    },
+]
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _digest(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def _words(count: int, seed: str) -> List[str]:
+    rng = random.Random(seed)
+    return [rng.choice(_WORDS) for _ in range(count)]
+
+
+def _markdown(tokens: int, seed: str) -> str:
+    """Report-shaped text of about `tokens` words."""
+    words = _words(tokens, seed)
+    lines = ["# Benchmark report", ""]
+    for i in range(0, len(words), 60):
+        if i and i % 240 == 0:
+            lines += [f"## Section {i // 240}", ""]
+        lines += [" ".join(words[i : i + 60]) + " [1].", ""]
+    lines += ["## References", "", "1. Fixture paper. https://arxiv.org/abs/2401.00001v1"]
+    return "\n".join(lines)
+
+
+# ----- PDF fixtures -----
+def _pdf_escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def make_pdf(title: str, pages: int = 3, lines_per_page: int = 45) -> bytes:
+    """Minimal multi-page text PDF, readable by PyMuPDF and pdfminer."""
+    objects = []
+    page_ids = [4 + 2 * i for i in range(pages)]
+    objects.append("<< /Type /Catalog /Pages 2 0 R >>")
+    kids = " ".join(f"{pid} 0 R" for pid in page_ids)
+    objects.append(f"<< /Type /Pages /Kids [{kids}] /Count {pages} >>")
+    objects.append("<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+    for p in range(pages):
+        lines = [title] if p == 0 else []
+        lines += [
+            " ".join(_words(12, f"{title}:{p}:{n}")) for n in range(lines_per_page)
+        ]
+        body = "BT /F1 10 Tf 12 TL 50 790 Td " + " ".join(
+            f"({_pdf_escape(line)}) Tj T*" for line in lines
+        ) + " ET"
+        objects.append(
+            "<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 842] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {page_ids[p] + 1} 0 R >>"
+        )
+        objects.append(f"<< /Length {len(body.encode('latin-1'))} >>\nstream\n{body}\nendstream")
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for n, obj in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += f"{n} 0 obj\n{obj}\nendobj\n".encode("latin-1")
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode("latin-1")
+    for off in offsets:
+        out += f"{off:010d} 00000 n \n".encode("latin-1")
+    out += (
+        f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\n"
+        f"startxref\n{xref}\n%%EOF\n"
+    ).encode("latin-1")
+    return bytes(out)
+
+
+# ----- service -----
+class FakeServices:
+    """
+    Runs the fake upstreams in a background uvicorn thread.
+
+    Latency knobs: `llm_ttft` (seconds before the first token),
+    `llm_tokens_per_sec`, `llm_output_tokens` (research answers),
+    `report_tokens` (writer / editor output) and `tool_latency` for the
+    Tavily / arXiv / Wikipedia routes.
+    """
+
+    def __init__(
+        self,
+        llm_ttft: float = 0.3,
+        llm_tokens_per_sec: float = 150.0,
+        llm_output_tokens: int = 300,
+        report_tokens: int = 1200,
+        tool_latency: float = 0.15,
+        arxiv_results: int = 2,
+        pdf_pages: int = 4,
+        pdf_fixtures: int = 8,
+        port: Optional[int] = None,
+    ):
+        self.llm_ttft = llm_ttft
+        self.llm_tokens_per_sec = llm_tokens_per_sec
+        self.llm_output_tokens = llm_output_tokens
+        self.report_tokens = report_tokens
+        self.tool_latency = tool_latency
+        self.arxiv_results = arxiv_results
+        self.port = port or free_port()
+        self.pdfs = [make_pdf(f"Fixture paper {i}", pages=pdf_pages) for i in range(pdf_fixtures)]
+
+        self._lock = threading.Lock()
+        self._routes: Dict[str, List[float]] = {}
+        self._tools: Dict[str, List[float]] = {}
+        self._pending_tools: Dict[str, tuple] = {}
+        self._server: Optional[uvicorn.Server] = None
+        self._thread: Optional[threading.Thread] = None
+        self.app = self._build_app()
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    def env(self) -> Dict[str, str]:
+        """Environment that points the app at these services."""
+        return {
+            "OPENAI_BASE_URL": f"{self.url}/v1",
+            "OPENAI_API_KEY": "bench-key",
+            "TAVILY_API_KEY": "tvly-bench-key",
+            "DLAI_TAVILY_BASE_URL": f"{self.url}/tavily",
+            "ARXIV_API_URL": f"{self.url}/arxiv.org/api/query",
+            "WIKIPEDIA_API_URL": f"{self.url}/w/api.php",
+        }
+
+    # ----- lifecycle -----
+    def start(self, timeout: float = 10.0) -> "FakeServices":
+        config = uvicorn.Config(
+            self.app, host="127.0.0.1", port=self.port, log_level="warning", access_log=False
+        )
+        self._server = uvicorn.Server(config)
+        self._thread = threading.Thread(target=self._server.run, daemon=True)
+        self._thread.start()
+        deadline = time.monotonic() + timeout
+        while not self._server.started:
+            if time.monotonic() > deadline:
+                raise RuntimeError("fake services did not start")
+            time.sleep(0.02)
+        return self
+
+    def stop(self) -> None:
+        if self._server is not None:
+            self._server.should_exit = True
+            self._thread.join(timeout=10)
+
+    # ----- stats -----
+    def _record(self, bucket: Dict[str, List[float]], name: str, seconds: float) -> None:
+        with self._lock:
+            bucket.setdefault(name, []).append(seconds)
+
+    def samples(self) -> Dict[str, Dict[str, List[float]]]:
+        with self._lock:
+            return {
+                "routes": {k: list(v) for k, v in self._routes.items()},
+                "tools": {k: list(v) for k, v in self._tools.items()},
+            }
+
+    def _note_tool_results(self, messages: List[Dict]) -> None:
+        # The model answered with a tool call at t0; the request that carries
+        # its result arrives once the app has run the tool, so the gap is the
+        # tool's wall time as seen by the app.
+        now = time.perf_counter()
+        for m in messages:
+            if m.get("role") != "tool":
+                continue
+            with self._lock:
+                pending = self._pending_tools.pop(m.get("tool_call_id"), None)
+            if pending:
+                name, sent = pending
+                self._record(self._tools, name, now - sent)
+
+    # ----- app -----
+    def _build_app(self) -> FastAPI:
+        app = FastAPI()
+
+        @app.middleware("http")
+        async def timing(request: Request, call_next):
+            started = time.perf_counter()
+            response = await call_next(request)
+            route = request.scope.get("route")
+            name = getattr(route, "path", request.url.path)
+            self._record(self._routes, name, time.perf_counter() - started)
+            return response
+
+        @app.post("/v1/chat/completions")
+        async def chat_completions(request: Request):
+            body = await request.json()
+            return await self._chat(body)
+
+        @app.post("/tavily/search")
+        async def tavily_search(request: Request):
+            body = json.loads(await request.body() or b"{}")
+            await asyncio.sleep(self.tool_latency)
+            query = body.get("query", "")
+            n = int(body.get("max_results", 5))
+            return {
+                "query": query,
+                "results": [
+                    {
+                        "title": f"Web result {i} for {query[:40]}",
+                        "content": " ".join(_words(80, f"{query}:{i}")),
+                        "url": f"https://example.com/{_digest(query)[:8]}/{i}",
+                    }
+                    for i in range(n)
+                ],
+                "images": [],
+            }
+
+        @app.get("/arxiv.org/api/query")
+        async def arxiv_query(search_query: str = "", id_list: str = "", max_results: int = 3):
+            await asyncio.sleep(self.tool_latency)
+            if id_list:
+                ids = [i for i in id_list.split(",") if i]
+                return Response(self._atom_entries(ids), media_type="application/atom+xml")
+            # batch title lookup: one paper per "(ti:w1 AND ti:w2 ...)" clause
+            if search_query.startswith("(ti:"):
+                clauses = re.findall(r"\(([^()]*)\)", search_query)
+                titles = [" ".join(re.findall(r"ti:(\S+)", c)) for c in clauses]
+                ids = [self._paper_id(t, 0) for t in titles]
+                return Response(self._atom_entries(ids, titles), media_type="application/atom+xml")
+            n = min(max_results, self.arxiv_results)
+            return Response(self._atom(search_query, n), media_type="application/atom+xml")
+
+        @app.get("/arxiv.org/pdf/{paper_id}.pdf")
+        async def arxiv_pdf(paper_id: str):
+            await asyncio.sleep(self.tool_latency)
+            pdf = self.pdfs[int(_digest(paper_id), 16) % len(self.pdfs)]
+            return Response(pdf, media_type="application/pdf")
+
+        @app.get("/w/api.php")
+        async def wikipedia(request: Request):
+            await asyncio.sleep(self.tool_latency)
+            params = request.query_params
+            titles = [t for t in params.get("titles", "").split("|") if t]
+            if not titles and params.get("gsrsearch"):
+                titles = [params["gsrsearch"]]
+            pages = [
+                {
+                    "title": t,
+                    "index": i + 1,
+                    "extract": " ".join(_words(60, t)),
+                    "canonicalurl": f"https://en.wikipedia.org/wiki/{t.replace(' ', '_')}",
+                }
+                for i, t in enumerate(titles)
+            ]
+            return {"batchcomplete": True, "query": {"pages": pages}}
+
+        return app
+
+    @staticmethod
+    def _paper_id(query: str, i: int) -> str:
+        h = int(_digest(f"{query}:{i}"), 16)
+        return f"24{h % 12 + 1:02d}.{h % 100000:05d}v1"
+
+    def _atom(self, query: str, n: int) -> str:
+        return self._atom_entries([self._paper_id(query, i) for i in range(n)])
+
+    def _atom_entries(self, ids: List[str], titles: Optional[List[str]] = None) -> str:
+        entries = []
+        for i, paper_id in enumerate(ids):
+            title = titles[i] if titles else f"Fixture paper {paper_id}"
+            entries.append(
+                f"""<entry>
+<id>{self.url}/arxiv.org/abs/{paper_id}</id>
+<published>2024-01-01T00:00:00Z</published>
+<title>{title}</title>
+<summary>{" ".join(_words(40, paper_id))}</summary>
+<author><name>Ada Bench</name></author>
+<link title="pdf" href="{self.url}/arxiv.org/pdf/{paper_id}.pdf" rel="related" type="application/pdf"/>
+</entry>"""
+            )
+        return (
+            '<?xml version="1.0" encoding="UTF-8"?>\n'
+            '<feed xmlns="http://www.w3.org/2005/Atom">\n'
+            + "\n".join(entries)
+            + "\n</feed>"
+        )
+
+    # ----- fake model -----
+    async def _chat(self, body: Dict):
+        messages = body.get("messages") or []
+        self._note_tool_results(messages)
+        model = body.get("model", "fake")
+        first = str(messages[0].get("content", "")) if messages else ""
+        seed = _digest(first)
+        prompt_tokens = sum(len(str(m.get("content") or "").split()) for m in messages)
+
+        if first.lstrip().startswith("You are a planning agent"):
+            return await self._reply(body, model, json.dumps(PLAN), prompt_tokens, tokens=150)
+
+        tools = [t.get("function", {}).get("name") for t in body.get("tools") or []]
+        if tools:
+            called = {
+                c.get("function", {}).get("name")
+                for m in messages
+                for c in (m.get("tool_calls") or [])
+            }
+            order = TOOL_ORDER
+            task = first.rsplit("Your next task:", 1)[-1].lower()
+            if "for each collected item" in task and "arxiv_lookup_tool" in tools:
+                order = ("arxiv_lookup_tool",)
+            todo = [t for t in order if t in tools and t not in called]
+            if todo:
+                return await self._tool_call(model, todo[0], seed, prompt_tokens)
+            text = " ".join(_words(self.llm_output_tokens, seed))
+            return await self._reply(body, model, text, prompt_tokens, self.llm_output_tokens)
+
+        text = _markdown(self.report_tokens, seed)
+        return await self._reply(body, model, text, prompt_tokens, self.report_tokens)
+
+    async def _tool_call(self, model: str, name: str, seed: str, prompt_tokens: int):
+        await asyncio.sleep(self.llm_ttft)
+        call_id = "call_" + uuid.uuid4().hex[:12]
+        args = {"query": f"benchmark topic {seed[:8]}"}
+        if name == "arxiv_search_tool":
+            args["max_results"] = self.arxiv_results
+        if name == "arxiv_lookup_tool":
+            args = {
+                "items": [f"Benchmark item {seed[:6]} number {k}" for k in range(LOOKUP_ITEMS - 1)]
+                + [self._paper_id(seed, 0)]
+            }
+        with self._lock:
+            self._pending_tools[call_id] = (name, time.perf_counter())
+        message = {
+            "role": "assistant",
+            "content": None,
+            "tool_calls": [
+                {
+                    "id": call_id,
+                    "type": "function",
+                    "function": {"name": name, "arguments": json.dumps(args)},
+                }
+            ],
+        }
+        return self._completion(model, message, "tool_calls", prompt_tokens, 20)
+
+    def _completion(self, model, message, finish_reason, prompt_tokens, tokens) -> Dict:
+        return {
+            "id": "chatcmpl-" + uuid.uuid4().hex[:12],
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{"index": 0, "message": message, "finish_reason": finish_reason}],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": tokens,
+                "total_tokens": prompt_tokens + tokens,
+            },
+        }
+
+    async def _reply(self, body: Dict, model: str, text: str, prompt_tokens: int, tokens: int):
+        if not body.get("stream"):
+            await asyncio.sleep(self.llm_ttft + tokens / self.llm_tokens_per_sec)
+            message = {"role": "assistant", "content": text}
+            return JSONResponse(self._completion(model, message, "stop", prompt_tokens, tokens))
+        return StreamingResponse(
+            self._stream(model, text, tokens), media_type="text/event-stream"
+        )
+
+    async def _stream(self, model: str, text: str, tokens: int):
+        chunk_id = "chatcmpl-" + uuid.uuid4().hex[:12]
+        pieces = text.split(" ")
+        # emit ~10 tokens per chunk, paced at llm_tokens_per_sec
+        per_chunk = 10
+        delay = per_chunk / self.llm_tokens_per_sec * (tokens / max(len(pieces), 1))
+
+        def chunk(delta: Dict, finish: Optional[str] = None) -> str:
+            return "data: " + json.dumps(
+                {
+                    "id": chunk_id,
+                    "object": "chat.completion.chunk",
+                    "created": int(time.time()),
+                    "model": model,
+                    "choices": [{"index": 0, "delta": delta, "finish_reason": finish}],
+                }
+            ) + "\n\n"
+
+        await asyncio.sleep(self.llm_ttft)
+        yield chunk({"role": "assistant", "content": ""})
+        for i in range(0, len(pieces), per_chunk):
+            part = " ".join(pieces[i : i + per_chunk])
+            yield chunk({"content": part if i == 0 else " " + part})
+            await asyncio.sleep(delay)
+        yield chunk({}, "stop")
+        yield "data: [DONE]\n\n"
@@ -0,0 +1,366 @@
+"""
+Offline end-to-end benchmark.
+
+Boots the app (`uvicorn main:app`, in a subprocess) against the local fake
+services in bench/fake_services.py, submits `--tasks` reports through
+`/generate_report` at `--concurrency`, and reports throughput, p50/p95/p99
+latency (end to end, per step, per tool) and the app's peak RSS. The JSON
+written to `--output` carries the git commit, so runs can be compared across
+commits (`--baseline` prints the deltas against an earlier file).
+
+    python -m bench.run --tasks 8 --concurrency 4 --output bench.json
+"""
+import os
+import sys
+import json
+import time
+import signal
+import platform
+import argparse
+import tempfile
+import subprocess
+from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+import requests
+
+from bench.fake_services import FakeServices, free_port
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TERMINAL = ("done", "error", "cancelled", "timed_out")
+
+
+# ----- stats helpers -----
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    k = (len(ordered) - 1) * pct / 100
+    lo, hi = int(k), min(int(k) + 1, len(ordered) - 1)
+    return ordered[lo] + (ordered[hi] - ordered[lo]) * (k - lo)
+
+
+def summarize(values: List[float]) -> Dict:
+    """Latency summary in milliseconds."""
+    ms = [v * 1000 for v in values]
+    return {
+        "count": len(ms),
+        "p50_ms": round(percentile(ms, 50), 1),
+        "p95_ms": round(percentile(ms, 95), 1),
+        "p99_ms": round(percentile(ms, 99), 1),
+        "mean_ms": round(sum(ms) / len(ms), 1) if ms else 0.0,
+        "max_ms": round(max(ms), 1) if ms else 0.0,
+    }
+
+
+def _parse_ts(value: Optional[str]) -> Optional[float]:
+    if not value:
+        return None
+    parsed = datetime.fromisoformat(value)
+    # the app stores naive UTC timestamps
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=REPO_ROOT, capture_output=True, text=True
+        )
+        return out.stdout.strip() or None
+    except OSError:
+        return None
+
+
+# ----- app process -----
+def _peak_rss_kb(pid: int) -> Optional[int]:
+    """VmHWM (peak resident set) of a live process, Linux only."""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def _child_pids(pid: int) -> List[int]:
+    pids = []
+    try:
+        for tid in os.listdir(f"/proc/{pid}/task"):
+            with open(f"/proc/{pid}/task/{tid}/children") as f:
+                pids += [int(p) for p in f.read().split()]
+    except OSError:
+        pass
+    return pids
+
+
+def start_app(env: Dict[str, str], port: int, log_path: str, timeout: float = 60.0):
+    log = open(log_path, "w")
+    proc = subprocess.Popen(
+        [
+            sys.executable, "-m", "uvicorn", "main:app",
+            "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning",
+        ],
+        cwd=REPO_ROOT,
+        env=env,
+        stdout=log,
+        stderr=subprocess.STDOUT,
+    )
+    base = f"http://127.0.0.1:{port}"
+    started = time.perf_counter()
+    while time.perf_counter() - started < timeout:
+        if proc.poll() is not None:
+            raise RuntimeError(f"app exited during start-up, see {log_path}")
+        try:
+            if requests.get(base + "/api", timeout=1).ok:
+                return proc, base, time.perf_counter() - started
+        except requests.RequestException:
+            pass
+        time.sleep(0.05)
+    proc.terminate()
+    raise RuntimeError(f"app did not become healthy in {timeout}s, see {log_path}")
+
+
+def stop_app(proc: subprocess.Popen) -> None:
+    proc.send_signal(signal.SIGINT)
+    try:
+        proc.wait(timeout=15)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+        proc.wait()
+
+
+# ----- driver -----
+def run_task(http: requests.Session, base: str, prompt: str, poll: float, timeout: float) -> Dict:
+    submitted = time.perf_counter()
+    submitted_wall = time.time()
+    rejected = 0
+    while True:
+        r = http.post(base + "/generate_report", json={"prompt": prompt}, timeout=30)
+        if r.status_code != 429:
+            break
+        rejected += 1
+        time.sleep(float(r.headers.get("Retry-After", "1")))
+    r.raise_for_status()
+    task_id = r.json()["task_id"]
+
+    status = None
+    while time.perf_counter() - submitted < timeout:
+        status = http.get(
+            f"{base}/task_status/{task_id}", params={"view": "status"}, timeout=30
+        ).json()["status"]
+        if status in TERMINAL:
+            break
+        time.sleep(poll)
+    else:
+        status = "timeout"
+    finished = time.perf_counter()
+
+    history = http.get(
+        f"{base}/task_status/{task_id}",
+        params={"view": "history", "limit": 100},
+        timeout=30,
+    ).json().get("history", [])
+    return {
+        "task_id": task_id,
+        "status": status,
+        "seconds": finished - submitted,
+        "submitted_at": submitted_wall,
+        "rejected": rejected,
+        "steps": history,
+    }
+
+
+def run_benchmark(args) -> Dict:
+    fake = FakeServices(
+        llm_ttft=args.llm_ttft,
+        llm_tokens_per_sec=args.llm_tokens_per_sec,
+        llm_output_tokens=args.llm_output_tokens,
+        report_tokens=args.report_tokens,
+        tool_latency=args.tool_latency,
+        arxiv_results=args.arxiv_results,
+        pdf_pages=args.pdf_pages,
+    ).start()
+    workdir = tempfile.mkdtemp(prefix="bench-")
+    env = {
+        **os.environ,
+        "DATABASE_URL": f"sqlite:///{os.path.join(workdir, 'bench.sqlite3')}",
+        "DB_SCHEMA": "create",
+        "LLM_CACHE_URL": "off",
+        "ARXIV_CACHE_DIR": os.path.join(workdir, "arxiv_cache"),
+        "LOCAL_CORPUS_PATH": os.path.join(workdir, "local_corpus.sqlite3"),
+        # the fake arXiv is local: keep the previous, looser API spacing so
+        # runs stay comparable (override with --env to measure the polite defaults)
+        "ARXIV_API_MIN_INTERVAL_SECONDS": "0.5",
+        "ARXIV_API_MAX_CONCURRENT": "3",
+        **fake.env(),
+    }
+    for item in args.env:
+        key, _, value = item.partition("=")
+        env[key] = value
+    log_path = os.path.join(workdir, "app.log")
+    proc, base, boot_seconds = start_app(env, args.port or free_port(), log_path)
+    print(f"🚀 App healthy in {boot_seconds:.2f}s (log: {log_path})")
+
+    prompts = [f"{args.prompt} (benchmark run {i})" for i in range(args.tasks)]
+    http = requests.Session()
+    http.mount("http://", requests.adapters.HTTPAdapter(pool_maxsize=max(args.concurrency, 10)))
+    try:
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            tasks = list(
+                pool.map(
+                    lambda p: run_task(http, base, p, args.poll_interval, args.task_timeout),
+                    prompts,
+                )
+            )
+        wall = time.perf_counter() - started
+        rss = {"app_kb": _peak_rss_kb(proc.pid)}
+        children = [_peak_rss_kb(pid) or 0 for pid in _child_pids(proc.pid)]
+        rss["children_kb"] = sum(children)
+        rss["children"] = len(children)
+        executor_stats = http.get(base + "/executor_stats", timeout=10).json()
+        db_stats = http.get(base + "/db_stats", timeout=10).json()
+    finally:
+        stop_app(proc)
+        fake.stop()
+
+    return {
+        "meta": {
+            "git_commit": _git_commit(),
+            "timestamp": datetime.utcnow().isoformat() + "Z",
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "config": {
+                k: v for k, v in vars(args).items() if k not in ("output", "baseline")
+            },
+        },
+        "results": _results(tasks, wall, boot_seconds, rss, fake.samples()),
+        "app": {"executor": executor_stats, "db": db_stats},
+    }
+
+
+def _results(tasks, wall, boot_seconds, rss, samples) -> Dict:
+    ok = [t for t in tasks if t["status"] == "done"]
+    planning, by_agent, by_index = [], {}, {}
+    for t in ok:
+        starts = [_parse_ts(s.get("started_at")) for s in t["steps"]]
+        starts = [s for s in starts if s is not None]
+        if starts:
+            planning.append(min(starts) - t["submitted_at"])
+        for i, step in enumerate(t["steps"]):
+            begin, end = _parse_ts(step.get("started_at")), _parse_ts(step.get("finished_at"))
+            if begin is None or end is None:
+                continue
+            by_agent.setdefault(step.get("agent") or "unknown", []).append(end - begin)
+            by_index.setdefault(f"step_{i}", []).append(end - begin)
+
+    return {
+        "tasks": len(tasks),
+        "done": len(ok),
+        "failed": {s: sum(1 for t in tasks if t["status"] == s) for s in ("error", "cancelled", "timed_out", "timeout")},
+        "rejected_429": sum(t["rejected"] for t in tasks),
+        "boot_seconds": round(boot_seconds, 3),
+        "wall_seconds": round(wall, 3),
+        "throughput_tasks_per_min": round(len(ok) / wall * 60, 2) if wall else 0.0,
+        "end_to_end": summarize([t["seconds"] for t in ok]),
+        "planning": summarize(planning),
+        "steps_by_agent": {k: summarize(v) for k, v in sorted(by_agent.items())},
+        "steps_by_index": {k: summarize(v) for k, v in sorted(by_index.items())},
+        "tools": {k: summarize(v) for k, v in sorted(samples["tools"].items())},
+        "upstream_routes": {k: summarize(v) for k, v in sorted(samples["routes"].items())},
+        "peak_rss_mb": {
+            "app": round((rss["app_kb"] or 0) / 1024, 1),
+            "children": round(rss["children_kb"] / 1024, 1),
+            "child_processes": rss["children"],
+        },
+    }
+
+
+# ----- reporting -----
+def print_summary(report: Dict) -> None:
+    r = report["results"]
+    print("=" * 60)
+    print(f"📊 {r['done']}/{r['tasks']} tasks done in {r['wall_seconds']}s "
+          f"({r['throughput_tasks_per_min']} tasks/min), 429s: {r['rejected_429']}")
+    print(f"   peak RSS: app {r['peak_rss_mb']['app']} MB, "
+          f"workers {r['peak_rss_mb']['children']} MB")
+
+    def row(name, s):
+        print(f"   {name:<28} n={s['count']:<4} p50={s['p50_ms']:>9} "
+              f"p95={s['p95_ms']:>9} p99={s['p99_ms']:>9} ms")
+
+    row("end to end", r["end_to_end"])
+    row("planning", r["planning"])
+    for group in ("steps_by_agent", "steps_by_index", "tools"):
+        print(f" {group}:")
+        for name, s in r[group].items():
+            row(name, s)
+
+
+def compare(report: Dict, baseline: Dict) -> None:
+    """Prints relative changes of the headline metrics against `baseline`."""
+    new, old = report["results"], baseline["results"]
+    print(f"🔁 vs {baseline['meta'].get('git_commit', '?')[:10]}:")
+
+    def delta(label, a, b, higher_is_better=False):
+        if not b:
+            return
+        change = (a - b) / b * 100
+        worse = change < 0 if higher_is_better else change > 0
+        flag = "⚠️" if worse and abs(change) >= 10 else "  "
+        print(f" {flag} {label:<34} {b:>10} -> {a:>10} ({change:+.1f}%)")
+
+    delta("throughput tasks/min", new["throughput_tasks_per_min"],
+          old["throughput_tasks_per_min"], higher_is_better=True)
+    for pct in ("p50_ms", "p95_ms", "p99_ms"):
+        delta(f"end to end {pct}", new["end_to_end"][pct], old["end_to_end"][pct])
+    for group in ("steps_by_agent", "tools"):
+        for name, s in new[group].items():
+            if name in old.get(group, {}):
+                delta(f"{name} p95_ms", s["p95_ms"], old[group][name]["p95_ms"])
+    delta("peak RSS app MB", new["peak_rss_mb"]["app"], old["peak_rss_mb"]["app"])
+
+
+def parse_args(argv=None):
+    p = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    p.add_argument("--tasks", type=int, default=8, help="reports to generate")
+    p.add_argument("--concurrency", type=int, default=4, help="reports in flight")
+    p.add_argument("--prompt", default="Retrieval-augmented generation for scientific QA")
+    p.add_argument("--llm-ttft", type=float, default=0.3, help="seconds to first token")
+    p.add_argument("--llm-tokens-per-sec", type=float, default=150.0)
+    p.add_argument("--llm-output-tokens", type=int, default=300, help="research answer size")
+    p.add_argument("--report-tokens", type=int, default=1200, help="writer/editor output size")
+    p.add_argument("--tool-latency", type=float, default=0.15, help="fake Tavily/arXiv/Wikipedia latency")
+    p.add_argument("--arxiv-results", type=int, default=2, help="papers (PDFs) per arXiv search")
+    p.add_argument("--pdf-pages", type=int, default=4)
+    p.add_argument("--poll-interval", type=float, default=0.25)
+    p.add_argument("--task-timeout", type=float, default=600.0)
+    p.add_argument("--port", type=int, default=None, help="app port (default: a free one)")
+    p.add_argument("--env", action="append", default=[], metavar="KEY=VALUE",
+                   help="extra environment for the app, e.g. WORKFLOW_WORKERS=8")
+    p.add_argument("--output", help="write the JSON report here")
+    p.add_argument("--baseline", help="earlier JSON report to compare against")
+    return p.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    report = run_benchmark(args)
+    print_summary(report)
+    if args.baseline:
+        with open(args.baseline) as f:
+            compare(report, json.load(f))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"💾 Wrote {args.output}")
+    return 0 if report["results"]["done"] == report["results"]["tasks"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,27 +1,69 @@
+from src.boot_timer import boot_timer, BootTimer
+
 import os
 import uuid
+import hashlib
+import weakref
+import logging
 import json
-import threading
-from datetime import datetime
-from typing import Optional, Literal
-from fastapi import FastAPI, HTTPException, Request
-from fastapi.responses import HTMLResponse, JSONResponse
-from fastapi.staticfiles import StaticFiles
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Literal, Set
+from fastapi import FastAPI, HTTPException, Query, Request, Response, WebSocket, WebSocketDisconnect
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import HTMLResponse, JSONResponse, PlainTextResponse, StreamingResponse
 from fastapi.templating import Jinja2Templates
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from sqlalchemy import create_engine, Column, Text, DateTime, String
-from sqlalchemy.orm import sessionmaker, declarative_base
+from pydantic import BaseModel, Field
+from sqlalchemy import (
+    Column,
+    Text,
+    DateTime,
+    String,
+    Integer,
+    LargeBinary,
+    ForeignKey,
+    select,
+    or_,
+    and_,
+    update,
+    delete,
+    func,
+    text,
+    inspect,
+)
+from sqlalchemy.orm import declarative_base, deferred, undefer
 from dotenv import load_dotenv
 
-from src.planning_agent import planner_agent, executor_agent_step
+boot_timer.mark("import fastapi/sqlalchemy")
+
+from src.task_events import broker, format_sse, TERMINAL_EVENTS, ReportStream
+from src.workflow_executor import WorkflowExecutor, QueueFullError, run_dag
+from src.arxiv_cache import arxiv_cache
+from src.llm_cache import current_task_id, task_cache_stats
+from src.context_builder import ContextBuilder
+from src.progress_store import build_progress_store, TERMINAL_STATUSES
+from src.text_codec import pack_text, unpack_text
+from src.database import build_database, prepare_schema, schema_mode
+from src.http_responses import CompressionMiddleware, FingerprintedStaticFiles
+from src.metrics import REPORT_SUBMISSIONS, TASK_SECONDS, TaskTimings, current_timings, render_metrics
+from src.cancellation import CancelToken, TaskCancelled, current_cancel_token
 
-import html, textwrap
+boot_timer.mark("import app modules")
 
 # === Load env vars ===
 load_dotenv()
 DATABASE_URL = os.getenv("DATABASE_URL")
 
+# Agent banners (INFO) and full step outputs (DEBUG) are logged; quiet by default
+logging.basicConfig(
+    level=os.getenv("LOG_LEVEL", "WARNING").upper(),
+    format="%(asctime)s %(levelname)s %(name)s: %(message)s",
+)
+logger = logging.getLogger("main")
+
 # Fix for Heroku's postgres:// URL format
 if DATABASE_URL.startswith("postgres://"):
     DATABASE_URL = DATABASE_URL.replace("postgres://", "postgresql://", 1)
@@ -32,48 +74,226 @@ if not DATABASE_URL:
 
 # === DB setup ===
 Base = declarative_base()
-engine = create_engine(DATABASE_URL, echo=False, future=True)
-SessionLocal = sessionmaker(bind=engine)
+# async engine (asyncpg); the pool is tuned through DB_POOL_* env vars
+db = build_database(DATABASE_URL)
 
 
 class Task(Base):
     __tablename__ = "tasks"
     id = Column(String, primary_key=True, index=True)
     prompt = Column(Text)
+    # hash of the normalized prompt, to find identical running / recent reports
+    fingerprint = Column(String(64), index=True)
     status = Column(String)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow)
-    result = Column(Text)
+    # bumped on every change; part of the /task_status ETag
+    version = Column(Integer, default=0, nullable=False)
+    # final report (possibly compressed) and small JSON counters
+    report = deferred(Column(LargeBinary))
+    report_codec = Column(String(8))
+    meta = Column(Text)
+
+
+class TaskStep(Base):
+    __tablename__ = "task_steps"
+    task_id = Column(String, ForeignKey("tasks.id", ondelete="CASCADE"), primary_key=True)
+    idx = Column(Integer, primary_key=True)
+    title = Column(Text)
+    status = Column(String)
+    description = Column(Text)
+    agent = Column(String)
+    depends_on = Column(Text)
+    started_at = Column(String)
+    finished_at = Column(String)
+    updated_at = Column(String)
+    output = deferred(Column(LargeBinary))
+    output_codec = Column(String(8))
+
+
+class TaskSubstep(Base):
+    __tablename__ = "task_substeps"
+    task_id = Column(String, ForeignKey("tasks.id", ondelete="CASCADE"), primary_key=True)
+    step_idx = Column(Integer, primary_key=True)
+    position = Column(Integer, primary_key=True)
+    title = Column(Text)
+    content = Column(LargeBinary)
+    content_codec = Column(String(8))
+
+
+# Schema management only when asked (see src/database.py): "create" creates
+# missing tables and migrates older ones (new columns / indexes, legacy
+# reports), "reset" drops and recreates them (wipes all tasks), "none"
+# leaves the DB as is.
+DB_SCHEMA = schema_mode()
+# Warm DB / HTTP / LLM client pools in the background after start-up
+STARTUP_PREWARM = os.getenv("STARTUP_PREWARM", "1").lower() not in ("0", "false", "no")
+PREWARM_DB_CONNECTIONS = int(os.getenv("STARTUP_PREWARM_DB_CONNECTIONS", "2"))
+
+
+def _migrate_legacy_reports(conn) -> int:
+    """Copies reports of the original `tasks.result` JSON column into `tasks.report`."""
+    if "result" not in {c["name"] for c in inspect(conn).get_columns("tasks")}:
+        return 0
+    rows = conn.execute(
+        text("SELECT id, result FROM tasks WHERE report IS NULL AND result IS NOT NULL")
+    ).all()
+    for row in rows:
+        try:
+            report = (json.loads(row.result) or {}).get("html_report")
+        except (ValueError, AttributeError):
+            report = None
+        blob, codec = pack_text(report or "")
+        conn.execute(
+            update(Task.__table__)
+            .where(Task.__table__.c.id == row.id)
+            .values(report=blob, report_codec=codec)
+        )
+    return len(rows)
+
+
+def _apply_schema(conn) -> list:
+    changes = prepare_schema(conn, Base.metadata, DB_SCHEMA)
+    migrated = _migrate_legacy_reports(conn)
+    if migrated:
+        changes.append(f"{migrated} legacy reports")
+    return changes
+
+
+async def _prepare_schema():
+    if DB_SCHEMA not in ("create", "reset"):
+        return
+    try:
+        async with db.engine.begin() as conn:
+            changes = await conn.run_sync(_apply_schema)
+        if changes:
+            logger.info("🛠️ DB schema migrated: %s", ", ".join(changes))
+    except Exception as e:
+        logger.error("❌ DB creation failed: %s", e)
+
+
+async def _prewarm():
+    """Opens DB connections, tool-host HTTP connections and the LLM client."""
+    # the agent modules are imported here (and by the first workflow), not
+    # at start-up: they pull in requests and the tool clients
+    from src.research_tools import warm_connections
+    from src.agents import client as llm_client
+    import src.planning_agent  # noqa: F401
+
+    timer = BootTimer()
+
+    async def ping():
+        async with db.session("prewarm") as session:
+            await session.execute(text("SELECT 1"))
+
+    try:
+        await asyncio.gather(*(ping() for _ in range(PREWARM_DB_CONNECTIONS)))
+    except Exception as e:
+        logger.warning("⚠️ DB pre-warm failed: %s", e)
+    timer.mark(f"db pool ({PREWARM_DB_CONNECTIONS} connections)")
+
+    def warm_llm_client():
+        llm_client.client
+        llm_client.backend
+
+    for name, fn in (("tool hosts", warm_connections), ("llm client", warm_llm_client)):
+        try:
+            await run_in_threadpool(fn)
+        except Exception as e:
+            logger.warning("⚠️ Pre-warm of %s failed: %s", name, e)
+        timer.mark(name)
+    timer.log("Pre-warm")
 
 
-try:
-    Base.metadata.drop_all(bind=engine)
-except Exception as e:
-    print(f"\u274c DB creation failed: {e}")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # workflow threads run their queries on this loop via db.run()
+    db.bind_loop(asyncio.get_running_loop())
+    boot_timer.mark("server start")
+    await _prepare_schema()
+    boot_timer.mark(f"schema ({DB_SCHEMA})")
+    boot_timer.log()
+    prewarm = asyncio.create_task(_prewarm()) if STARTUP_PREWARM else None
+    try:
+        yield
+    finally:
+        if prewarm is not None and not prewarm.done():
+            prewarm.cancel()
+        await db.dispose()
 
-try:
-    Base.metadata.create_all(bind=engine)
-except Exception as e:
-    print(f"\u274c DB creation failed: {e}")
 
 # === FastAPI ===
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 app.add_middleware(
     CORSMiddleware, allow_origins=["*"], allow_methods=["*"], allow_headers=["*"]
 )
-app.mount("/static", StaticFiles(directory="static"), name="static")
+# gzip (brotli if installed) for JSON / HTML / text bodies of at least
+# COMPRESSION_MIN_BYTES (-1 disables); CPU cost is exported in /metrics
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=int(os.getenv("COMPRESSION_MIN_BYTES", "1024")),
+    gzip_level=int(os.getenv("COMPRESSION_GZIP_LEVEL", "6")),
+    brotli_quality=int(os.getenv("COMPRESSION_BROTLI_QUALITY", "4")),
+)
+# index.html links app.js / app.css through static_url(): fingerprinted URLs
+# served immutable, so the UI code is only downloaded again when it changes
+static_files = FingerprintedStaticFiles(directory="static", mount_path="/static")
+app.mount("/static", static_files, name="static")
 templates = Jinja2Templates(directory="templates")
+templates.env.globals["static_url"] = static_files.url
+
+# Live step progress; PROGRESS_STORE_URL=database shares it across uvicorn workers
+progress_store = build_progress_store(DATABASE_URL)
+# task_id -> ReportStream of the writer/editor step being streamed
+report_streams = {}
+
+# Fixed pool of workflow workers with a bounded admission queue
+executor = WorkflowExecutor(
+    workers=int(os.getenv("WORKFLOW_WORKERS", "4")),
+    max_pending=int(os.getenv("WORKFLOW_MAX_PENDING", "32")),
+)
+
+# Plan steps of one task that may run at the same time (independent research)
+STEP_PARALLELISM = int(os.getenv("WORKFLOW_STEP_PARALLELISM", "3"))
+
+# Idle SSE / WebSocket connections get a keep-alive at this interval
+EVENTS_HEARTBEAT_SECONDS = float(os.getenv("EVENTS_HEARTBEAT_SECONDS", "15"))
+
+# Longest a /task_progress?since= long-poll is held open
+TASK_PROGRESS_WAIT_SECONDS = float(os.getenv("TASK_PROGRESS_WAIT_SECONDS", "25"))
+# A waiting long-poll is woken by this process's progress events; with a
+# shared (SQL) store it also re-reads the store at this interval to catch
+# writes made by other uvicorn workers (event streams of tasks run elsewhere too)
+TASK_PROGRESS_RECHECK_SECONDS = float(os.getenv("TASK_PROGRESS_RECHECK_SECONDS", "5"))
+
+# Default per-task deadline counted from submission (0 = none); a request's
+# `deadline_seconds` overrides it
+TASK_DEADLINE_SECONDS = float(os.getenv("TASK_DEADLINE_SECONDS", "0"))
+# task_id -> CancelToken of every queued or running workflow
+cancel_tokens: Dict[str, CancelToken] = {}
+# task_id -> watch ids of the submissions following it (creator + attached);
+# a task is cancelled only when the last of them leaves
+task_watchers: Dict[str, Set[str]] = {}
 
-task_progress = {}
+# A prompt matching a report finished this recently is answered with it
+# (0 = never); one matching a running report attaches to it
+REPORT_REUSE_SECONDS = float(os.getenv("REPORT_REUSE_SECONDS", "900"))
+# fingerprint -> lock serializing lookup + creation of identical submissions
+_submit_locks = weakref.WeakValueDictionary()
+
+boot_timer.mark("engines, stores, app")
 
 
 class PromptRequest(BaseModel):
     prompt: str
+    deadline_seconds: Optional[float] = Field(None, gt=0)
+    # run the pipeline even if an identical report is running or fresh
+    force_refresh: bool = False
 
 
 @app.get("/", response_class=HTMLResponse)
 def read_index(request: Request):
-    return templates.TemplateResponse("index.html", {"request": request})
+    return templates.TemplateResponse(request, "index.html")
 
 
 @app.get("/api", response_class=JSONResponse)
@@ -81,60 +301,697 @@ def health_check(request: Request):
     return {"status": "ok"}
 
 
+def _prompt_fingerprint(prompt: str) -> str:
+    """Case and whitespace differences do not make a new report."""
+    normalized = " ".join(prompt.lower().split())
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+
+def _attach_watcher(task_id: str) -> str:
+    watch_id = uuid.uuid4().hex
+    task_watchers.setdefault(task_id, set()).add(watch_id)
+    return watch_id
+
+
+async def _find_reusable_task(fingerprint: str) -> Optional[dict]:
+    """Newest in-flight task, or one done within REPORT_REUSE_SECONDS, for the prompt."""
+    matches = [Task.status.in_(("planning", "running"))]
+    if REPORT_REUSE_SECONDS > 0:
+        cutoff = datetime.utcnow() - timedelta(seconds=REPORT_REUSE_SECONDS)
+        matches.append(and_(Task.status == "done", Task.updated_at >= cutoff))
+    async with db.session("find_reusable_task") as session:
+        rows = (
+            await session.execute(
+                select(Task.id, Task.status)
+                .where(Task.fingerprint == fingerprint)
+                .where(or_(*matches))
+                .order_by(Task.created_at.desc())
+                .limit(5)
+            )
+        ).all()
+    for row in rows:
+        if row.status == "done":
+            return {"task_id": row.id, "status": "done", "reused": "completed"}
+        token = cancel_tokens.get(row.id)
+        if token is not None and token.cancelled:
+            continue
+        # rows left running by a restart have no live progress
+        if await run_in_threadpool(progress_store.get, row.id) is not None:
+            return {"task_id": row.id, "status": row.status, "reused": "in_flight"}
+    return None
+
+
 @app.post("/generate_report")
-def generate_report(req: PromptRequest):
+async def generate_report(req: PromptRequest):
+    fingerprint = _prompt_fingerprint(req.prompt)
+    lock = _submit_locks.get(fingerprint)
+    if lock is None:
+        lock = _submit_locks[fingerprint] = asyncio.Lock()
+    # a double-click must not slip in between the lookup and the insert
+    async with lock:
+        if not req.force_refresh:
+            reused = await _find_reusable_task(fingerprint)
+            if reused is not None:
+                REPORT_SUBMISSIONS.inc(1, reused["reused"])
+                task_id = reused["task_id"]
+                token = cancel_tokens.get(task_id)
+                if reused["reused"] == "in_flight" and token is not None:
+                    # the shared run keeps going until the latest deadline asked for
+                    token.extend_deadline(req.deadline_seconds or TASK_DEADLINE_SECONDS or None)
+                    reused["watch_id"] = _attach_watcher(task_id)
+                position = executor.position(task_id)
+                if position is not None:
+                    reused["queue_position"] = position
+                return reused
+        REPORT_SUBMISSIONS.inc(1, "new")
+        return await _create_task(req, fingerprint)
+
+
+async def _create_task(req: PromptRequest, fingerprint: str) -> dict:
     task_id = str(uuid.uuid4())
-    db = SessionLocal()
-    db.add(Task(id=task_id, prompt=req.prompt, status="running"))
-    db.commit()
-    db.close()
-
-    task_progress[task_id] = {"steps": []}
-    initial_plan_steps = planner_agent(req.prompt)
-    for step_title in initial_plan_steps:
-        task_progress[task_id]["steps"].append(
-            {
-                "title": step_title,
-                "status": "pending",
-                "description": "Awaiting execution",
-                "substeps": [],
-            }
+    async with db.session("create_task") as session:
+        session.add(
+            Task(id=task_id, prompt=req.prompt, fingerprint=fingerprint, status="planning")
+        )
+        await session.commit()
+
+    # steps are filled in by the workflow once the planner answers
+    await run_in_threadpool(progress_store.create, task_id, "planning")
+
+    cancel_tokens[task_id] = CancelToken(req.deadline_seconds or TASK_DEADLINE_SECONDS or None)
+    watch_id = _attach_watcher(task_id)
+    try:
+        position = executor.submit(task_id, run_agent_workflow, task_id, req.prompt)
+    except QueueFullError as e:
+        cancel_tokens.pop(task_id, None)
+        task_watchers.pop(task_id, None)
+        await run_in_threadpool(progress_store.delete, task_id)
+        async with db.session("delete_task") as session:
+            await session.execute(delete(Task).where(Task.id == task_id))
+            await session.commit()
+        raise HTTPException(
+            status_code=429,
+            detail="Too many reports in progress, please retry later",
+            headers={"Retry-After": str(e.retry_after)},
         )
+    return {
+        "task_id": task_id,
+        "status": "planning",
+        "queue_position": position,
+        "watch_id": watch_id,
+    }
+
+
+def _progress_snapshot(task_id: str) -> dict:
+    progress = progress_store.get(task_id) or {"steps": []}
+    position = executor.position(task_id)
+    if position is not None:
+        progress["queue_position"] = position
+    return progress
+
 
-    thread = threading.Thread(
-        target=run_agent_workflow, args=(task_id, req.prompt, initial_plan_steps)
+@app.delete("/tasks/{task_id}")
+async def cancel_task(task_id: str, watch_id: Optional[str] = None):
+    """
+    Detaches the submission `watch_id` from a queued or running task and
+    cancels the task once no submission follows it any more. A queued task
+    is dropped at once; a running one stops at its next check point (between
+    steps, tool calls, downloaded chunks or streamed tokens) and frees its
+    worker. Without `watch_id` only an unshared task can be cancelled.
+    """
+    task = await _load_task(task_id)
+    token = cancel_tokens.get(task_id)
+    if task["status"] in TERMINAL_STATUSES:
+        raise HTTPException(
+            status_code=409, detail=f"Task already finished ({task['status']})"
+        )
+    if token is None:
+        # e.g. left behind by a restart; no worker of this process runs it
+        raise HTTPException(status_code=409, detail="Task is not running here")
+    watchers = task_watchers.get(task_id, set())
+    if watch_id is not None:
+        if watch_id not in watchers:
+            raise HTTPException(status_code=404, detail="Unknown watch_id for this task")
+        watchers.discard(watch_id)
+    elif len(watchers) > 1:
+        raise HTTPException(
+            status_code=409,
+            detail=f"Task is shared by {len(watchers)} submissions; pass your watch_id",
+        )
+    else:
+        watchers.clear()
+    if watchers:
+        return JSONResponse(
+            status_code=202,
+            content={"task_id": task_id, "status": "detached", "watchers": len(watchers)},
+        )
+    token.cancel()
+    if executor.cancel(task_id):
+        cancel_tokens.pop(task_id, None)
+        task_watchers.pop(task_id, None)
+        await _set_task_status(task_id, "cancelled")
+        await run_in_threadpool(progress_store.set_status, task_id, "cancelled")
+        broker.publish(task_id, "cancelled", {"status": "cancelled"})
+        TASK_SECONDS.observe(0.0, "cancelled")
+        return {"task_id": task_id, "status": "cancelled"}
+    return JSONResponse(
+        status_code=202, content={"task_id": task_id, "status": "cancelling"}
     )
-    thread.start()
-    return {"task_id": task_id}
+
+
+def _progress_since(task_id: str, since: int) -> Optional[dict]:
+    progress = progress_store.get_since(task_id, since)
+    if progress is not None:
+        position = executor.position(task_id)
+        if position is not None:
+            progress["queue_position"] = position
+    return progress
 
 
 @app.get("/task_progress/{task_id}")
-def get_task_progress(task_id: str):
-    return task_progress.get(task_id, {"steps": []})
+async def get_task_progress(
+    task_id: str,
+    request: Request,
+    since: Optional[int] = Query(None, ge=0),
+    wait: float = Query(TASK_PROGRESS_WAIT_SECONDS, ge=0),
+):
+    """
+    Full progress, or with `since=<version>` only the steps / substeps changed
+    after it (see ProgressStore.get_since). A delta request is held up to
+    `wait` seconds until the version moves past `since` or the task ends.
+    """
+    if since is None:
+        progress = await run_in_threadpool(_progress_snapshot, task_id)
+        if "version" not in progress:
+            return progress
+        # version covers every store write; the queue position is not stored
+        etag = f'"{task_id}-p{progress["version"]}-q{progress.get("queue_position", 0)}"'
+        headers = {"ETag": etag, "Cache-Control": "no-cache"}
+        if _etag_matches(request, etag):
+            return Response(status_code=304, headers=headers)
+        return JSONResponse(progress, headers=headers)
 
+    # subscribe before reading so a change in between still wakes us up
+    queue = broker.subscribe(task_id)
+    try:
+        deadline = time.monotonic() + min(wait, TASK_PROGRESS_WAIT_SECONDS)
+        position = executor.position(task_id)
+        progress = await run_in_threadpool(_progress_since, task_id, since)
+        recheck_at = time.monotonic() + TASK_PROGRESS_RECHECK_SECONDS
+        while True:
+            if (
+                progress is None
+                or progress["version"] != since
+                or progress["status"] in TERMINAL_STATUSES
+                or progress.get("queue_position") != position
+            ):
+                return progress or {"steps": [], "version": 0, "full": True}
+            left = deadline - time.monotonic()
+            if left <= 0:
+                return progress
+            # the store is only read again once something may have changed:
+            # an event of this process, a queue move (checked in memory every
+            # second) or, for a shared store, the re-check interval
+            try:
+                await asyncio.wait_for(queue.get(), timeout=min(left, 1.0))
+            except asyncio.TimeoutError:
+                now = time.monotonic()
+                if executor.position(task_id) == position and not (
+                    progress_store.shared and now >= recheck_at
+                ):
+                    continue
+            recheck_at = time.monotonic() + TASK_PROGRESS_RECHECK_SECONDS
+            progress = await run_in_threadpool(_progress_since, task_id, since)
+    finally:
+        broker.unsubscribe(task_id, queue)
 
-@app.get("/task_status/{task_id}")
-def get_task_status(task_id: str):
-    db = SessionLocal()
-    task = db.query(Task).filter(Task.id == task_id).first()
-    db.close()
-    if not task:
+
+@app.get("/executor_stats")
+def get_executor_stats():
+    return executor.stats()
+
+
+@app.get("/cache_stats")
+def get_cache_stats():
+    from src import agents, research_tools
+
+    return {
+        "arxiv": arxiv_cache.stats(),
+        "tavily": research_tools.tavily_cache_stats(),
+        "wikipedia": research_tools.wikipedia_cache_stats(),
+        "arxiv_lookup": research_tools.arxiv_lookup_cache_stats(),
+        "local_corpus": research_tools.local_corpus_stats(),
+        "llm": agents.client.stats(),
+        "progress": progress_store.stats(),
+    }
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def get_metrics():
+    """Prometheus text format: span histograms, LLM token counters (per process)."""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/db_stats")
+def get_db_stats():
+    return db.stats()
+
+
+@app.get("/task_report/{task_id}")
+async def get_task_report(task_id: str, offset: int = 0):
+    """
+    Report text of the step currently (or last) streamed, from `offset` on;
+    once the task is done, the final report.
+    """
+    stream = report_streams.get(task_id)
+    if stream is not None:
+        return stream.snapshot(max(offset, 0))
+    task = await _load_task(task_id, with_report=True)
+    text = (task["report"] or "") if task["status"] == "done" else ""
+    offset = min(max(offset, 0), len(text))
+    return {
+        "index": None,
+        "title": "",
+        "offset": offset,
+        "length": len(text),
+        "text": text[offset:],
+        "streaming": False,
+    }
+
+
+async def _load_task(task_id: str, with_report: bool = False) -> dict:
+    """Status row of a task (report body only if asked); 404 if missing."""
+    columns = [Task.status, Task.version, Task.updated_at, Task.meta]
+    if with_report:
+        columns += [Task.report, Task.report_codec]
+    async with db.session("load_task") as session:
+        row = (await session.execute(select(*columns).where(Task.id == task_id))).first()
+    if row is None:
         raise HTTPException(status_code=404, detail="Task not found")
+    task = {
+        "status": row.status,
+        "version": row.version or 0,
+        "updated_at": row.updated_at,
+        "meta": json.loads(row.meta) if row.meta else {},
+    }
+    if with_report:
+        task["report"] = unpack_text(row.report, row.report_codec)
+    return task
+
+
+async def _load_history(task_id: str, offset: int = 0, limit: Optional[int] = None,
+                        with_output: bool = False):
+    """Steps of a finished task in plan order, with their substeps."""
+    async with db.session("load_history") as session:
+        total = (
+            await session.execute(
+                select(func.count()).select_from(TaskStep).where(TaskStep.task_id == task_id)
+            )
+        ).scalar()
+        query = (
+            select(TaskStep)
+            .where(TaskStep.task_id == task_id)
+            .order_by(TaskStep.idx)
+            .offset(offset)
+        )
+        if with_output:
+            query = query.options(undefer(TaskStep.output))
+        if limit is not None:
+            query = query.limit(limit)
+        steps = (await session.execute(query)).scalars().all()
+        substeps = {}
+        if steps:
+            rows = (
+                await session.execute(
+                    select(TaskSubstep)
+                    .where(
+                        TaskSubstep.task_id == task_id,
+                        TaskSubstep.step_idx.between(steps[0].idx, steps[-1].idx),
+                    )
+                    .order_by(TaskSubstep.step_idx, TaskSubstep.position)
+                )
+            ).scalars().all()
+            for sub in rows:
+                substeps.setdefault(sub.step_idx, []).append(_substep_from_row(sub))
+    history = []
+    for step in steps:
+        item = {
+            "title": step.title,
+            "status": step.status,
+            "description": step.description,
+            "substeps": substeps.get(step.idx, []),
+            "depends_on": json.loads(step.depends_on) if step.depends_on else [],
+            "started_at": step.started_at,
+            "finished_at": step.finished_at,
+            "updated_at": step.updated_at,
+        }
+        if with_output:
+            item["agent"] = step.agent
+            item["output"] = unpack_text(step.output, step.output_codec)
+        history.append(item)
+    return history, total
+
+
+@app.get("/task_steps/{task_id}/{index}")
+async def get_task_step(task_id: str, index: int, response: Response):
+    """
+    One finished step with its output: what substep records reference. The
+    output does not change once stored, so clients may cache it.
+    """
+    async with db.session("load_step") as session:
+        step = (
+            await session.execute(
+                select(TaskStep)
+                .options(undefer(TaskStep.output))
+                .where(TaskStep.task_id == task_id, TaskStep.idx == index)
+            )
+        ).scalar_one_or_none()
+    if step is None or step.output is None:
+        raise HTTPException(status_code=404, detail="Step output not available")
+    response.headers["Cache-Control"] = "private, max-age=86400"
     return {
-        "status": task.status,
-        "result": json.loads(task.result) if task.result else None,
+        "index": step.idx,
+        "title": step.title,
+        "description": step.description,
+        "agent": step.agent,
+        "output": unpack_text(step.output, step.output_codec),
     }
 
 
-def format_history(history):
-    return "\n\n".join(
-        f"🔹 {title}\n{desc}\n\n📝 Output:\n{output}" for title, desc, output in history
+def _etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    return header.strip() == "*" or etag in (tag.strip() for tag in header.split(","))
+
+
+@app.get("/task_status/{task_id}")
+async def get_task_status(
+    task_id: str,
+    request: Request,
+    response: Response,
+    view: Literal["full", "status", "report", "history"] = "full",
+    offset: int = 0,
+    limit: int = 20,
+):
+    """
+    `view=status` only the status, `view=report` the final report,
+    `view=history` a page of steps (`offset`, `limit`, with step outputs);
+    `full` (default) all of it. Answers 304 when `If-None-Match` matches.
+    """
+    # one round trip; the report body is only read by the views returning it
+    task = await _load_task(task_id, with_report=view in ("full", "report"))
+    offset, limit = max(offset, 0), min(max(limit, 1), 100)
+    etag = f'"{task_id}-{task["version"]}-{view}'
+    etag += f'-{offset}-{limit}"' if view == "history" else '"'
+    if _etag_matches(request, etag):
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "no-cache"})
+    response.headers["ETag"] = etag
+    # let browsers revalidate with If-None-Match on every poll
+    response.headers["Cache-Control"] = "no-cache"
+
+    if view == "status":
+        out = {"status": task["status"], "updated_at": task["updated_at"]}
+        # per-task timing breakdown, once the workflow has finished
+        if "timings" in task["meta"]:
+            out["timings"] = task["meta"]["timings"]
+        return out
+    if view == "history":
+        history, total = await _load_history(task_id, offset, limit, with_output=True)
+        return {
+            "status": task["status"],
+            "history": history,
+            "offset": offset,
+            "limit": limit,
+            "total": total,
+        }
+
+    if task["status"] != "done":
+        return {"status": task["status"], "result": None}
+    result = {"html_report": task["report"], **task["meta"]}
+    if view == "full":
+        result["history"], _ = await _load_history(task_id)
+    return {"status": task["status"], "result": result}
+
+
+async def _load_terminal_event(task_id: str):
+    """Returns (event, data) for a finished task, None while it is running,
+    and raises 404 if the task does not exist."""
+    task = await _load_task(task_id, with_report=True)
+    if task["status"] == "done":
+        # the client already has the steps from the snapshot
+        result = {"html_report": task["report"], **task["meta"]}
+        return "done", json.dumps({"status": "done", "result": result}, default=str)
+    if task["status"] in ("error", "cancelled", "timed_out"):
+        return task["status"], json.dumps({"status": task["status"]})
+    return None
+
+
+def _store_step_events(task_id: str, since: int, steps: list):
+    """
+    Progress written to the store after version `since`, as stream events:
+    one `step` per changed step (merged into `steps`, the client's copy, so
+    each carries the whole step), or a new `snapshot` when the plan changed
+    or `since` is unknown. Returns (events, version, status); status is None
+    once the task is gone from the store.
+    """
+    progress = progress_store.get_since(task_id, since)
+    if progress is not None and not progress["full"] and progress["step_count"] != len(steps):
+        progress = progress_store.get_since(task_id, 0)
+    if progress is None:
+        return [], since, None
+    if progress["full"]:
+        steps[:] = progress["steps"]
+        events = [("snapshot", json.dumps(progress, default=str))]
+        return events, progress["version"], progress["status"]
+    events = []
+    for change in progress["changes"]:
+        index, step = change["index"], change["step"]
+        known = steps[index].get("substeps", [])[: change["substeps_from"]]
+        steps[index] = {**step, "substeps": known + step.get("substeps", [])}
+        events.append(("step", json.dumps({"index": index, "step": steps[index]}, default=str)))
+    return events, progress["version"], progress["status"]
+
+
+async def _task_event_iter(task_id: str):
+    """
+    Yields (event, data_json) for a task: a `snapshot` of the current progress
+    first, then one `step` event per step change and finally a terminal
+    `done` / `error` event. Yields None when idle so callers can send a
+    keep-alive.
+
+    Events come from this process's broker. A task run by another uvicorn
+    worker publishes nothing here, so with a shared (SQL) store its progress
+    is re-read every TASK_PROGRESS_RECHECK_SECONDS (at most the heartbeat)
+    instead; its `report_delta` chunks stay with that worker.
+    """
+    # subscribe before reading state so no event falls in between
+    queue = broker.subscribe(task_id)
+    try:
+        terminal = await _load_terminal_event(task_id)
+        snapshot = await run_in_threadpool(_progress_snapshot, task_id)
+        yield "snapshot", json.dumps(snapshot, default=str)
+        if terminal:
+            yield terminal
+            return
+
+        version, steps = snapshot.get("version", 0), list(snapshot["steps"])
+        idle_since = time.monotonic()
+        while True:
+            # queued or running tasks of this process hold a cancel token
+            remote = progress_store.shared and task_id not in cancel_tokens
+            timeout = EVENTS_HEARTBEAT_SECONDS
+            if remote:
+                timeout = min(timeout, TASK_PROGRESS_RECHECK_SECONDS)
+            try:
+                event, data = await asyncio.wait_for(queue.get(), timeout=timeout)
+            except asyncio.TimeoutError:
+                if remote:
+                    events, version, status = await run_in_threadpool(
+                        _store_step_events, task_id, version, steps
+                    )
+                    for item in events:
+                        yield item
+                    if events:
+                        idle_since = time.monotonic()
+                    if status is None or status in TERMINAL_STATUSES:
+                        terminal = await _load_terminal_event(task_id)
+                        if terminal:
+                            yield terminal
+                            return
+                    # keep-alive once the next re-read would come after it is due
+                    if time.monotonic() - idle_since < EVENTS_HEARTBEAT_SECONDS - timeout:
+                        continue
+                idle_since = time.monotonic()
+                yield None
+                continue
+            idle_since = time.monotonic()
+            yield event, data
+            if event in TERMINAL_EVENTS:
+                return
+    finally:
+        broker.unsubscribe(task_id, queue)
+
+
+@app.get("/task_events/{task_id}")
+async def task_events(task_id: str, request: Request):
+    events = _task_event_iter(task_id)
+    # surface a 404 before the stream starts
+    first = await events.__anext__()
+
+    async def sse_stream():
+        yield format_sse(*first)
+        try:
+            async for item in events:
+                if await request.is_disconnected():
+                    break
+                yield ": keep-alive\n\n" if item is None else format_sse(*item)
+        finally:
+            await events.aclose()
+
+    return StreamingResponse(
+        sse_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.websocket("/ws/task_events/{task_id}")
+async def task_events_ws(websocket: WebSocket, task_id: str):
+    await websocket.accept()
+    events = _task_event_iter(task_id)
+    try:
+        async for item in events:
+            if item is None:
+                await websocket.send_text('{"event": "keep-alive"}')
+                continue
+            event, data = item
+            await websocket.send_text(f'{{"event": "{event}", "data": {data}}}')
+        await websocket.close()
+    except HTTPException:
+        await websocket.close(code=4404)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        await events.aclose()
+
+
+async def _set_task_status(task_id: str, status: str):
+    async with db.session("set_task_status") as session:
+        await session.execute(
+            update(Task)
+            .where(Task.id == task_id)
+            .values(
+                status=status,
+                version=Task.version + 1,
+                updated_at=datetime.utcnow(),
+            )
+        )
+        await session.commit()
+
+
+def _step_row(task_id: str, index: int, step: dict, entry) -> TaskStep:
+    output, output_codec = pack_text(entry[2] if entry else None)
+    return TaskStep(
+        task_id=task_id,
+        idx=index,
+        title=step["title"],
+        status=step["status"],
+        description=step.get("description"),
+        agent=step.get("agent"),
+        depends_on=json.dumps(step.get("depends_on") or []),
+        started_at=step.get("started_at"),
+        finished_at=step.get("finished_at"),
+        updated_at=step.get("updated_at"),
+        output=output,
+        output_codec=output_codec,
     )
 
 
-def run_agent_workflow(task_id: str, prompt: str, initial_plan_steps: list):
-    steps_data = task_progress[task_id]["steps"]
+def _substep_from_row(sub: TaskSubstep) -> dict:
+    """Substep records are stored as JSON; older rows hold rendered HTML."""
+    content = unpack_text(sub.content, sub.content_codec)
+    try:
+        record = json.loads(content) if content else {}
+    except ValueError:
+        record = None
+    if not isinstance(record, dict):
+        record = {"kind": "html", "content": content}
+    return {"title": sub.title, **record}
+
+
+async def _save_step(task_id: str, index: int, step: dict, entry):
+    """Stores a finished step with its output, so substeps can reference it."""
+    async with db.session("save_step") as session:
+        await session.execute(
+            delete(TaskStep).where(TaskStep.task_id == task_id, TaskStep.idx == index)
+        )
+        session.add(_step_row(task_id, index, step, entry))
+        # /task_status?view=history reads these rows; move its ETag on
+        await session.execute(
+            update(Task).where(Task.id == task_id).values(version=Task.version + 1)
+        )
+        await session.commit()
+
+
+async def _save_task_result(task_id, status, steps_data, execution_history, report, meta):
+    """Writes the final status, report and per-step rows in one transaction."""
+    outputs = {i: entry for i, entry in enumerate(execution_history)}
+    report_blob, report_codec = pack_text(report)
+    steps, substeps = [], []
+    for i, step in enumerate(steps_data):
+        steps.append(_step_row(task_id, i, step, outputs.get(i)))
+        for j, sub in enumerate(step["substeps"]):
+            record = {k: v for k, v in sub.items() if k != "title"}
+            content, content_codec = pack_text(json.dumps(record))
+            substeps.append(
+                TaskSubstep(
+                    task_id=task_id,
+                    step_idx=i,
+                    position=j,
+                    title=sub.get("title"),
+                    content=content,
+                    content_codec=content_codec,
+                )
+            )
+
+    async with db.session("save_task_result") as session:
+        await session.execute(
+            update(Task)
+            .where(Task.id == task_id)
+            .values(
+                status=status,
+                version=Task.version + 1,
+                updated_at=datetime.utcnow(),
+                report=report_blob,
+                report_codec=report_codec,
+                meta=json.dumps(meta, default=str),
+            )
+        )
+        await session.execute(delete(TaskSubstep).where(TaskSubstep.task_id == task_id))
+        await session.execute(delete(TaskStep).where(TaskStep.task_id == task_id))
+        session.add_all(steps + substeps)
+        await session.commit()
+
+
+def run_agent_workflow(task_id: str, prompt: str):
+    # the agent stack is imported on first use, keeping server start-up light
+    from src.planning_agent import planner_agent, executor_agent_step
+
+    # working copy for this thread; every change is written through to the store
+    progress = {"status": "planning", "steps": []}
+    steps_data = progress["steps"]
     execution_history = []
+    context_builder = ContextBuilder()
+    # LLM cache hits/misses in this thread are accounted to this task
+    cache_scope = current_task_id.set(task_id)
+    # and so are timing spans (planner, steps, LLM and tool calls, DB)
+    timings = TaskTimings()
+    timings_scope = current_timings.set(timings)
+    # a task cancelled while queued never gets here
+    token = cancel_tokens.get(task_id) or CancelToken()
+    cancel_scope = current_cancel_token.set(token)
+    final_status = "error"
 
     def update_step_status(index, status, description="", substep=None):
         if index < len(steps_data):
@@ -144,69 +1001,140 @@ def run_agent_workflow(task_id: str, prompt: str, initial_plan_steps: list):
             if substep:
                 steps_data[index]["substeps"].append(substep)
             steps_data[index]["updated_at"] = datetime.utcnow().isoformat()
+            progress_store.update_step(task_id, index, steps_data[index])
+            broker.publish(task_id, "step", {"index": index, "step": steps_data[index]})
 
-    try:
-        for i, plan_step_title in enumerate(initial_plan_steps):
-            update_step_status(i, "running", f"Executing: {plan_step_title}")
+    outputs_by_index = {}
 
-            actual_step_description, agent_name, output = executor_agent_step(
-                plan_step_title, execution_history, prompt
+    def _finish_cancelled(status):
+        logger.info("Task %s stopped: %s", task_id, status)
+        reason = "Cancelled" if status == "cancelled" else "Deadline exceeded"
+        for i, step in enumerate(steps_data):
+            if step["status"] == "running":
+                update_step_status(i, status, f"{reason}: {step['title']}")
+        db.run(
+            _save_task_result(
+                task_id,
+                status,
+                steps_data,
+                [outputs_by_index.get(i) for i in range(len(steps_data))],
+                None,
+                {"llm_cache": task_cache_stats(task_id), "timings": timings.report()},
             )
+        )
+        progress["status"] = status
+        progress_store.set_status(task_id, status)
+        broker.publish(task_id, status, {"status": status})
 
-            execution_history.append([plan_step_title, actual_step_description, output])
+    def run_step(index, deps):
+        token.check()
+        step_history = [outputs_by_index[d] for d in deps]
+        title = steps_data[index]["title"]
+        steps_data[index]["started_at"] = datetime.utcnow().isoformat()
+        update_step_status(index, "running", f"Executing: {title}")
 
-            def esc(s: str) -> str:
-                return html.escape(s or "")
+        def on_delta(delta):
+            # created on the first delta: only writer/editor steps stream
+            stream = report_streams.get(task_id)
+            if stream is None or stream.index != index:
+                stream = report_streams[task_id] = ReportStream(task_id, index, title)
+            stream.write(delta)
 
-            def nl2br(s: str) -> str:
-                return esc(s).replace("\n", "<br>")
+        actual_step_description, agent_name, output = executor_agent_step(
+            title, step_history, prompt, context_builder, on_delta, deps
+        )
+        stream = report_streams.get(task_id)
+        if stream is not None and stream.index == index:
+            stream.close()
 
-            # ...
-            update_step_status(
-                i,
-                "done",
-                f"Completed: {plan_step_title}",
+        entry = [title, actual_step_description, output]
+        outputs_by_index[index] = entry
+        steps_data[index]["agent"] = agent_name
+        steps_data[index]["finished_at"] = datetime.utcnow().isoformat()
+        # stored before the substep referencing it is published
+        db.run(_save_step(task_id, index, {**steps_data[index], "status": "done"}, entry))
+        progress["llm_cache"] = task_cache_stats(task_id)
+        progress["context_tokens"] = dict(context_builder.stats)
+        progress_store.set_fields(
+            task_id,
+            llm_cache=progress["llm_cache"],
+            context_tokens=progress["context_tokens"],
+        )
+
+        # a compact record; the client renders it from the stored outputs
+        update_step_status(
+            index,
+            "done",
+            f"Completed: {title}",
+            {
+                "title": f"Called {agent_name}",
+                "kind": "agent_call",
+                "agent": agent_name,
+                "task": actual_step_description,
+                "context_step": deps[-1] if deps else None,
+                "output_step": index,
+            },
+        )
+
+        return entry
+
+    try:
+        # === Planning stage ===
+        token.check()
+        plan = planner_agent(prompt, return_dependencies=True)
+        token.check()
+        for step in plan:
+            steps_data.append(
                 {
-                    "title": f"Called {agent_name}",
-                    "content": f"""
-<div style='border:1px solid #ccc; border-radius:8px; padding:10px; margin:8px 0; background:#fff;'>
-  <div style='font-weight:bold; color:#2563eb;'>📘 User Prompt</div>
-  <div style='white-space:pre-wrap;'>{prompt}</div>
-
-  <div style='font-weight:bold; color:#16a34a; margin-top:8px;'>📜 Previous Step</div>
-  <pre style='white-space:pre-wrap; background:#f9fafb; padding:6px; border-radius:6px; margin:0;'>
-{format_history(execution_history[-2:-1])}
-  </pre>
-
-  <div style='font-weight:bold; color:#f59e0b; margin-top:8px;'>🧹 Your next task</div>
-  <div style='white-space:pre-wrap;'>{actual_step_description}</div>
-
-  <div style='font-weight:bold; color:#10b981; margin-top:8px;'>✅ Output</div>
-  <!-- ⚠️ NO <pre> AQUÍ -->
-  <div style='white-space:pre-wrap;'>
-{output}
-  </div>
-</div>
-""".strip(),
-                },
+                    "title": step["title"],
+                    "status": "pending",
+                    "description": "Awaiting execution",
+                    "substeps": [],
+                    "depends_on": step["depends_on"],
+                }
             )
+        progress["status"] = "running"
+        progress_store.set_steps(task_id, steps_data)
+        progress_store.set_status(task_id, "running")
+        db.run(_set_task_status(task_id, "running"))
+        broker.publish(task_id, "plan", progress)
+
+        # === Execution: independent steps overlap, history stays in plan order ===
+        outputs = run_dag(
+            [step["depends_on"] for step in plan],
+            run_step,
+            parallelism=STEP_PARALLELISM,
+        )
+        execution_history.extend(outputs)
 
         final_report_markdown = (
             execution_history[-1][-1] if execution_history else "No report generated."
         )
 
-        result = {"html_report": final_report_markdown, "history": steps_data}
+        meta = {
+            "llm_cache": task_cache_stats(task_id),
+            "context_tokens": context_builder.stats,
+            "timings": timings.report(),
+        }
+        db.run(
+            _save_task_result(
+                task_id, "done", steps_data, execution_history, final_report_markdown, meta
+            )
+        )
+        result = {"html_report": final_report_markdown, **meta}
 
-        db = SessionLocal()
-        task = db.query(Task).filter(Task.id == task_id).first()
-        task.status = "done"
-        task.result = json.dumps(result)
-        task.updated_at = datetime.utcnow()
-        db.commit()
-        db.close()
+        final_status = "done"
+        progress["status"] = "done"
+        progress_store.set_status(task_id, "done")
+        broker.publish(task_id, "done", {"status": "done", "result": result})
 
-    except Exception as e:
-        print(f"Workflow error for task {task_id}: {e}")
+    except (TaskCancelled, Exception) as e:
+        # an aborted request may also surface as an ordinary error
+        if isinstance(e, TaskCancelled) or token.cancelled:
+            final_status = token.reason or e.reason
+            _finish_cancelled(final_status)
+            return
+        logger.error("Workflow error for task %s: %s", task_id, e)
         if steps_data:
             error_step_index = next(
                 (i for i, s in enumerate(steps_data) if s["status"] == "running"),
@@ -217,12 +1145,36 @@ def run_agent_workflow(task_id: str, prompt: str, initial_plan_steps: list):
                     error_step_index,
                     "error",
                     f"Error during execution: {e}",
-                    {"title": "Error", "content": str(e)},
+                    {"title": "Error", "kind": "error", "content": str(e)},
                 )
 
-        db = SessionLocal()
-        task = db.query(Task).filter(Task.id == task_id).first()
-        task.status = "error"
-        task.updated_at = datetime.utcnow()
-        db.commit()
-        db.close()
+        # keep what was done so far, it can be paged through /task_status
+        db.run(
+            _save_task_result(
+                task_id,
+                "error",
+                steps_data,
+                [outputs_by_index.get(i) for i in range(len(steps_data))],
+                None,
+                {
+                    "llm_cache": task_cache_stats(task_id),
+                    "timings": timings.report(),
+                    "error": str(e),
+                },
+            )
+        )
+
+        progress["status"] = "error"
+        progress_store.set_status(task_id, "error")
+        broker.publish(task_id, "error", {"status": "error", "error": str(e)})
+
+    finally:
+        cancel_tokens.pop(task_id, None)
+        task_watchers.pop(task_id, None)
+        current_cancel_token.reset(cancel_scope)
+        report_streams.pop(task_id, None)
+        progress["llm_cache"] = task_cache_stats(task_id, pop=True)
+        progress_store.set_fields(task_id, llm_cache=progress["llm_cache"])
+        current_task_id.reset(cache_scope)
+        TASK_SECONDS.observe(timings.elapsed(), final_status)
+        current_timings.reset(timings_scope)
@@ -1,22 +1,78 @@
+import logging
 from datetime import datetime
+from typing import Callable, Optional
 from urllib import response
-from aisuite import Client
+from src.cancellation import check_cancelled
+from src.llm_cache import CachedClient, build_response_cache
 from src.research_tools import (
+    arxiv_lookup_tool,
     arxiv_search_tool,
+    local_corpus_search_tool,
     tavily_search_tool,
     wikipedia_search_tool,
 )
 
-client = Client()
+logger = logging.getLogger(__name__)
+
+
+def _new_aisuite_client():
+    # aisuite (and the provider SDK behind it) is imported on first use
+    from aisuite import Client
+
+    return Client()
+
+
+# temperature-0 calls below are served from the response cache when possible;
+# the aisuite client and the cache backend are built on first use
+client = CachedClient(
+    client_factory=_new_aisuite_client, backend_factory=build_response_cache
+)
+
+
+def _complete_text(
+    model: str,
+    messages: list,
+    on_delta: Optional[Callable[[str], None]] = None,
+    **kwargs,
+) -> str:
+    """
+    Returns the completion text. With `on_delta` the completion is streamed
+    and each content delta is passed to it as it arrives; a cancelled task
+    stops reading (and closes) the stream.
+    """
+    if on_delta is None:
+        resp = client.chat.completions.create(model=model, messages=messages, **kwargs)
+        return resp.choices[0].message.content or ""
+
+    parts = []
+    stream = client.chat.completions.create(
+        model=model, messages=messages, stream=True, **kwargs
+    )
+    try:
+        for chunk in stream:
+            check_cancelled()
+            choices = getattr(chunk, "choices", None)
+            if not choices:
+                continue
+            delta = getattr(choices[0].delta, "content", None)
+            if delta:
+                parts.append(delta)
+                on_delta(delta)
+    finally:
+        close = getattr(stream, "close", None)
+        if callable(close):
+            close()
+    return "".join(parts)
 
 
 # === Research Agent ===
 def research_agent(
-    prompt: str, model: str = "openai:gpt-4.1-mini", return_messages: bool = False
+    prompt: str,
+    model: str = "openai:gpt-4.1-mini",
+    return_messages: bool = False,
+    cache: bool = True,
 ):
-    print("==================================")
-    print("🔍 Research Agent")
-    print("==================================")
+    logger.info("🔍 Research Agent (%s)", model)
 
     full_prompt = f"""
 You are an advanced research assistant with expertise in information retrieval and academic research methodology. Your mission is to gather comprehensive, accurate, and relevant information on any topic requested by the user.
@@ -43,6 +99,17 @@ You are an advanced research assistant with expertise in information retrieval a
 3. **`wikipedia_search_tool`**: Encyclopedia resource
    - USE FOR: Background information, definitions, overviews, historical context
    - BEST FOR: Establishing foundational knowledge and understanding basic concepts
+   - TIP: Pass several related topics via `queries` to look them up in a single call
+
+4. **`arxiv_lookup_tool`**: Batch lookup of known papers on arXiv
+   - USE FOR: Checking which of a list of collected items (titles, arXiv ids/URLs, DOIs) have an arXiv version
+   - Pass ALL items in ONE call; it returns the arXiv URL, authors and date of each match
+   - PDFs are only downloaded with `fetch_pdf=true`; leave it off unless the full text is needed
+
+5. **`local_corpus_search_tool`**: Local index of documents retrieved by earlier research
+   - USE FOR: Checking what previous searches (papers, web pages, Wikipedia summaries) already found on the topic
+   - Answers in milliseconds; each result has a `retrieved_at` date and the tool it came from
+   - If it returns nothing relevant, or the topic needs recent information, go to the online tools
 
 ## RESEARCH METHODOLOGY:
 
@@ -55,9 +122,11 @@ You are an advanced research assistant with expertise in information retrieval a
 
 ## TOOL SELECTION GUIDELINES:
 
+- Before searching online → Try `local_corpus_search_tool` first and only search online for what it does not cover
 - For scientific/academic questions in supported domains → Use `arxiv_search_tool`
 - For recent developments, news, or practical information → Use `tavily_search_tool`
 - For fundamental concepts or historical context → Use `wikipedia_search_tool`
+- To find the arXiv versions of items collected in earlier steps → Use `arxiv_lookup_tool` once with all of them, NOT `arxiv_search_tool` per item
 - For comprehensive research → Use multiple tools strategically
 - NEVER use `arxiv_search_tool` for domains outside its supported list
 - ALWAYS verify information across multiple sources when possible
@@ -77,7 +146,13 @@ USER RESEARCH REQUEST:
 """.strip()
 
     messages = [{"role": "user", "content": full_prompt}]
-    tools = [arxiv_search_tool, tavily_search_tool, wikipedia_search_tool]
+    tools = [
+        arxiv_search_tool,
+        tavily_search_tool,
+        wikipedia_search_tool,
+        arxiv_lookup_tool,
+        local_corpus_search_tool,
+    ]
 
     try:
         resp = client.chat.completions.create(
@@ -87,6 +162,7 @@ USER RESEARCH REQUEST:
             tool_choice="auto",
             max_turns=5,
             temperature=0.0,  # Use deterministic output
+            cache=cache,  # False forces a fresh call instead of a cached answer
         )
 
         content = resp.choices[0].message.content or ""
@@ -144,11 +220,11 @@ USER RESEARCH REQUEST:
             )
             content += "\n\n" + tools_html
 
-        print("✅ Output:\n", content)
+        logger.debug("✅ Research output:\n%s", content)
         return content, messages
 
     except Exception as e:
-        print("❌ Error:", e)
+        logger.error("❌ Research agent error: %s", e)
         return f"[Model Error: {str(e)}]", messages
 
 
@@ -159,10 +235,10 @@ def writer_agent(
     min_words_per_section: int = 400,
     max_tokens: int = 15000,
     retries: int = 1,
+    on_delta: Optional[Callable[[str], None]] = None,
+    cache: bool = True,
 ):
-    print("==================================")
-    print("✍️ Writer Agent")
-    print("==================================")
+    logger.info("✍️ Writer Agent (%s)", model)
 
     system_message = """
 You are an expert academic writer with a PhD-level understanding of scholarly communication. Your task is to synthesize research materials into a comprehensive, well-structured academic report.
@@ -226,13 +302,14 @@ INTERNAL CHECKLIST (DO NOT INCLUDE IN OUTPUT):
     ]
 
     def _call(messages_):
-        resp = client.chat.completions.create(
-            model=model,
-            messages=messages_,
+        return _complete_text(
+            model,
+            messages_,
+            on_delta=on_delta,
             temperature=0,
             max_tokens=max_tokens,
+            cache=cache,
         )
-        return resp.choices[0].message.content or ""
 
     def _word_count(md_text: str) -> int:
         import re
@@ -242,7 +319,7 @@ INTERNAL CHECKLIST (DO NOT INCLUDE IN OUTPUT):
 
     content = _call(messages)
 
-    print("✅ Output:\n", content)
+    logger.debug("✅ Writer output:\n%s", content)
     return content, messages
 
 
@@ -250,10 +327,10 @@ def editor_agent(
     prompt: str,
     model: str = "openai:gpt-4.1-mini",
     target_min_words: int = 2400,
+    on_delta: Optional[Callable[[str], None]] = None,
+    cache: bool = True,
 ):
-    print("==================================")
-    print("🧠 Editor Agent")
-    print("==================================")
+    logger.info("🧠 Editor Agent (%s)", model)
 
     system_message = """
 You are a professional academic editor with expertise in improving scholarly writing across disciplines. Your task is to refine and elevate the quality of the academic text provided.
@@ -287,10 +364,8 @@ Return only the revised, polished text in Markdown format without explanatory co
         {"role": "user", "content": prompt},
     ]
 
-    response = client.chat.completions.create(
-        model=model, messages=messages, temperature=0
+    content = _complete_text(
+        model, messages, on_delta=on_delta, temperature=0, cache=cache
     )
-
-    content = response.choices[0].message.content
-    print("✅ Output:\n", content)
+    logger.debug("✅ Editor output:\n%s", content)
     return content, messages
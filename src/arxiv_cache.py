@@ -0,0 +1,227 @@
+import os
+import re
+import tempfile
+import threading
+from contextlib import contextmanager
+from typing import BinaryIO, Callable, Dict, Optional
+
+try:  # cross-process locking is POSIX only; threads share the in-process lock
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+
+
+# "http://arxiv.org/abs/2101.00001v2", ".../pdf/hep-th/9901001v1.pdf"
+_ARXIV_ID_RE = re.compile(r"arxiv\.org/(?:abs|pdf)/(.+?)(?:\.pdf)?/?$", re.IGNORECASE)
+_VERSION_RE = re.compile(r"v\d+$")
+
+
+def arxiv_cache_key(url: str) -> Optional[str]:
+    """
+    Filesystem-safe cache key for a *versioned* arXiv id, e.g. "2101.00001v2".
+    Unversioned ids return None: their content changes with new versions,
+    so they are not content-addressable.
+    """
+    m = _ARXIV_ID_RE.search((url or "").strip())
+    if not m:
+        return None
+    arxiv_id = m.group(1)
+    if not _VERSION_RE.search(arxiv_id):
+        return None
+    return arxiv_id.replace("/", "_")
+
+
+class ArxivCache:
+    """
+    On-disk cache of arXiv PDFs and their extracted text.
+
+    Layout: `<root>/pdf/<key>.pdf` and `<root>/text/<key>.<variant>.txt`, where
+    `variant` names the extraction settings (e.g. "p6" for six pages). Files
+    are written to a temp file and `os.replace`d into place, so concurrent
+    readers (threads or processes) see either the whole entry or nothing.
+    Reads bump the file mtime, and once the total size exceeds `max_bytes` the
+    least recently used files are evicted under an inter-process lock.
+    """
+
+    def __init__(self, root: str, max_bytes: int = 512 * 1024 * 1024):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._pdf_dir = os.path.join(root, "pdf")
+        self._text_dir = os.path.join(root, "text")
+        os.makedirs(self._pdf_dir, exist_ok=True)
+        os.makedirs(self._text_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._approx_bytes = None  # lazily initialised from a directory scan
+        self._stats = {
+            "pdf_hits": 0,
+            "pdf_misses": 0,
+            "text_hits": 0,
+            "text_misses": 0,
+            "writes": 0,
+            "evictions": 0,
+        }
+
+    # ----- paths -----
+    def _pdf_path(self, key: str) -> str:
+        return os.path.join(self._pdf_dir, f"{key}.pdf")
+
+    def _text_path(self, key: str, variant: str) -> str:
+        return os.path.join(self._text_dir, f"{key}.{variant}.txt")
+
+    # ----- public API -----
+    def get_pdf(self, key: str) -> Optional[bytes]:
+        data = self._read(self._pdf_path(key))
+        self._count("pdf_hits" if data is not None else "pdf_misses")
+        return data
+
+    def put_pdf(self, key: str, pdf_bytes: bytes) -> None:
+        self._write(self._pdf_path(key), lambda f: f.write(pdf_bytes))
+
+    def pdf_path(self, key: str) -> Optional[str]:
+        """Path of a cached PDF (for lazy, page-by-page readers) or None."""
+        path = self._pdf_path(key)
+        try:
+            os.utime(path)  # LRU bookkeeping
+        except FileNotFoundError:
+            self._count("pdf_misses")
+            return None
+        self._count("pdf_hits")
+        return path
+
+    def put_pdf_stream(self, key: str, writer: Callable[[BinaryIO], object]) -> str:
+        """
+        Stores a PDF produced by `writer(fileobj)` (e.g. a streamed download)
+        without holding it in memory, and returns its cache path.
+        """
+        path = self._pdf_path(key)
+        self._write(path, writer)
+        return path
+
+    def get_text(self, key: str, variant: str) -> Optional[str]:
+        data = self._read(self._text_path(key, variant))
+        self._count("text_hits" if data is not None else "text_misses")
+        return data.decode("utf-8") if data is not None else None
+
+    def put_text(self, key: str, variant: str, text: str) -> None:
+        data = text.encode("utf-8")
+        self._write(self._text_path(key, variant), lambda f: f.write(data))
+
+    def stats(self) -> Dict:
+        with self._lock:
+            out = dict(self._stats)
+        for kind in ("pdf", "text"):
+            total = out[f"{kind}_hits"] + out[f"{kind}_misses"]
+            out[f"{kind}_hit_ratio"] = (
+                round(out[f"{kind}_hits"] / total, 3) if total else 0.0
+            )
+        out["bytes"], out["entries"] = self._scan_size()
+        out["max_bytes"] = self.max_bytes
+        return out
+
+    # ----- internals -----
+    def _count(self, name: str, n: int = 1) -> None:
+        with self._lock:
+            self._stats[name] += n
+
+    def _read(self, path: str) -> Optional[bytes]:
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            return None
+        try:
+            os.utime(path)  # LRU bookkeeping
+        except OSError:
+            pass
+        return data
+
+    def _write(self, path: str, writer: Callable[[BinaryIO], object]) -> None:
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                writer(f)
+                size = f.tell()
+            os.replace(tmp, path)
+        except BaseException:
+            # TaskCancelled included: a half-written .tmp is never evicted
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+            raise
+
+        with self._lock:
+            self._stats["writes"] += 1
+            if self._approx_bytes is None:
+                self._approx_bytes = self._scan_size()[0]
+            else:
+                self._approx_bytes += size
+            over = self._approx_bytes > self.max_bytes
+        if over:
+            self._evict()
+
+    def _files(self):
+        for d in (self._pdf_dir, self._text_dir):
+            try:
+                with os.scandir(d) as it:
+                    for e in it:
+                        if e.is_file() and not e.name.endswith(".tmp"):
+                            yield e
+            except FileNotFoundError:
+                continue
+
+    def _scan_size(self):
+        total, count = 0, 0
+        for e in self._files():
+            try:
+                total += e.stat().st_size
+                count += 1
+            except FileNotFoundError:
+                pass
+        return total, count
+
+    @contextmanager
+    def _process_lock(self):
+        with self._lock:
+            if fcntl is None:
+                yield
+                return
+            with open(os.path.join(self.root, ".lock"), "a+") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _evict(self) -> None:
+        # evict down to 90% so we don't rescan on every write near the limit
+        target = int(self.max_bytes * 0.9)
+        evicted = 0
+        with self._process_lock():
+            entries = []
+            for e in self._files():
+                try:
+                    st = e.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, e.path))
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in sorted(entries):
+                if total <= target:
+                    break
+                try:
+                    os.remove(path)
+                    total -= size
+                    evicted += 1
+                except FileNotFoundError:
+                    pass
+            self._approx_bytes = total
+            self._stats["evictions"] += evicted
+
+
+arxiv_cache = ArxivCache(
+    root=os.getenv(
+        "ARXIV_CACHE_DIR", os.path.join(tempfile.gettempdir(), "arxiv_cache")
+    ),
+    max_bytes=int(float(os.getenv("ARXIV_CACHE_MAX_MB", "512")) * 1024 * 1024),
+)
@@ -0,0 +1,43 @@
+import time
+import logging
+import threading
+from typing import Dict, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class BootTimer:
+    """Wall-clock breakdown of start-up phases (imports, engines, lifespan)."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self._last = self.started
+        self._phases: List[Tuple[str, float]] = []
+        self._lock = threading.Lock()
+
+    def mark(self, phase: str) -> float:
+        """Closes `phase` (everything since the previous mark); returns seconds."""
+        now = time.perf_counter()
+        with self._lock:
+            elapsed = now - self._last
+            self._last = now
+            self._phases.append((phase, elapsed))
+        return elapsed
+
+    def report(self) -> Dict:
+        with self._lock:
+            phases = list(self._phases)
+        return {
+            "phases_ms": {name: round(sec * 1000, 1) for name, sec in phases},
+            "total_ms": round((self._last - self.started) * 1000, 1),
+        }
+
+    def log(self, title: str = "Boot timing") -> None:
+        report = self.report()
+        lines = [f"⏱️ {title}: {report['total_ms']} ms"]
+        lines += [f"   - {name}: {ms} ms" for name, ms in report["phases_ms"].items()]
+        logger.info("\n".join(lines))
+
+
+# started when this module is first imported, i.e. at the top of main.py
+boot_timer = BootTimer()
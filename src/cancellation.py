@@ -0,0 +1,121 @@
+import time
+import threading
+import contextvars
+from typing import Optional
+
+
+class TaskCancelled(BaseException):
+    """
+    Raised inside a workflow once its task is cancelled or past its deadline.
+
+    A BaseException, like asyncio.CancelledError: the agents and tools have
+    `except Exception` fallbacks that would otherwise turn it into an error
+    string and carry on.
+    """
+
+    def __init__(self, reason: str):
+        super().__init__(reason)
+        self.reason = reason  # "cancelled" or "timed_out"
+
+
+class CancelToken:
+    """
+    Cancellation flag of one task, plus an optional deadline. Workflow code
+    calls `check()` at safe points (between steps, tool calls, downloaded
+    chunks, streamed deltas) and caps network timeouts with `timeout()`.
+    """
+
+    def __init__(self, deadline_seconds: Optional[float] = None):
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self.reason: Optional[str] = None
+        self.deadline = time.monotonic() + deadline_seconds if deadline_seconds else None
+
+    def cancel(self, reason: str = "cancelled") -> bool:
+        """Returns False if the token was already cancelled."""
+        with self._lock:
+            if self.reason is not None:
+                return False
+            self.reason = reason
+        self._event.set()
+        return True
+
+    def extend_deadline(self, deadline_seconds: Optional[float]) -> None:
+        """Moves the deadline to the later of the two; None removes it."""
+        with self._lock:
+            if self.reason is not None or self.deadline is None:
+                return
+            if not deadline_seconds:
+                self.deadline = None
+            else:
+                self.deadline = max(self.deadline, time.monotonic() + deadline_seconds)
+
+    @property
+    def cancelled(self) -> bool:
+        if not self._event.is_set() and self.deadline is not None:
+            if time.monotonic() >= self.deadline:
+                self.cancel("timed_out")
+        return self._event.is_set()
+
+    def check(self) -> None:
+        if self.cancelled:
+            raise TaskCancelled(self.reason)
+
+    def time_left(self) -> Optional[float]:
+        if self.deadline is None:
+            return None
+        return max(self.deadline - time.monotonic(), 0.0)
+
+    def timeout(self, default: float) -> float:
+        """`default` capped to the time left before the deadline."""
+        left = self.time_left()
+        return default if left is None else max(min(default, left), 0.1)
+
+
+# set by the workflow; copied into step threads with their context
+current_cancel_token: contextvars.ContextVar = contextvars.ContextVar(
+    "cancel_token", default=None
+)
+
+
+def check_cancelled() -> None:
+    """Raises TaskCancelled if the current task was cancelled (no-op outside one)."""
+    token = current_cancel_token.get()
+    if token is not None:
+        token.check()
+
+
+def cancellable_timeout(default: float) -> float:
+    token = current_cancel_token.get()
+    return default if token is None else token.timeout(default)
+
+
+def run_cancellable(fn, *args, **kwargs):
+    """
+    Calls `fn` in a helper thread and waits for it while polling the current
+    token, so a blocking call (e.g. a non-streaming LLM request) cannot hold
+    the worker past a cancel or the deadline. On cancellation the call is
+    abandoned: it finishes in the background and its result is dropped.
+    """
+    token = current_cancel_token.get()
+    if token is None:
+        return fn(*args, **kwargs)
+    token.check()
+    ctx = contextvars.copy_context()
+    done = threading.Event()
+    outcome = {}
+
+    def target():
+        try:
+            outcome["value"] = ctx.run(fn, *args, **kwargs)
+        except BaseException as e:
+            outcome["error"] = e
+        finally:
+            done.set()
+
+    threading.Thread(target=target, name="cancellable-call", daemon=True).start()
+    while not done.wait(0.1):
+        token.check()
+    if "error" in outcome:
+        raise outcome["error"]
+    return outcome["value"]
@@ -0,0 +1,189 @@
+import os
+import re
+import hashlib
+import threading
+from typing import Dict, List, Optional
+
+# ----- Token counting -----
+_encoder = None
+_encoder_lock = threading.Lock()
+
+
+def _get_encoder():
+    # tiktoken is optional (and downloads its BPE file on first use);
+    # without it we fall back to the usual ~4 chars/token estimate.
+    global _encoder
+    with _encoder_lock:
+        if _encoder is None:
+            try:
+                import tiktoken
+
+                _encoder = tiktoken.get_encoding("o200k_base")
+            except Exception:
+                _encoder = False
+        return _encoder
+
+
+def count_tokens(text: str) -> int:
+    if not text:
+        return 0
+    enc = _get_encoder()
+    if enc:
+        return len(enc.encode(text, disallowed_special=()))
+    return (len(text) + 3) // 4
+
+
+# Budget for the history part of the prompt, per agent
+DEFAULT_BUDGETS = {
+    "research_agent": int(os.getenv("CONTEXT_BUDGET_RESEARCH", "6000")),
+    "writer_agent": int(os.getenv("CONTEXT_BUDGET_WRITER", "24000")),
+    "editor_agent": int(os.getenv("CONTEXT_BUDGET_EDITOR", "24000")),
+}
+
+_URL_RE = re.compile(r"https?://\S+")
+_WORD_RE = re.compile(r"[a-z0-9]{4,}")
+
+
+def _label(index: int, desc: str, agent: str) -> str:
+    """Heading of a history entry; `index` is the step's 0-based plan index."""
+    if "draft" in desc.lower() or agent == "writer_agent":
+        return f"✍️ Draft (Step {index + 1})"
+    elif "feedback" in desc.lower() or agent == "editor_agent":
+        return f"🧠 Feedback (Step {index + 1})"
+    elif "research" in desc.lower() or agent == "research_agent":
+        return f"🔍 Research (Step {index + 1})"
+    return f"🧩 Other (Step {index + 1}) by {agent}"
+
+
+def compact_output(output: str, max_tokens: int) -> str:
+    """
+    Extractive summary of a step output: headings, lines carrying URLs (the
+    writer needs them for references) and the first line of each paragraph,
+    in document order, until `max_tokens` is used.
+    """
+    kept, used = [], 0
+    paragraphs = [p.strip() for p in re.split(r"\n\s*\n", output.strip()) if p.strip()]
+    for para in paragraphs:
+        lines = para.splitlines()
+        picks = [lines[0]] + [
+            ln for ln in lines[1:] if ln.lstrip().startswith("#") or _URL_RE.search(ln)
+        ]
+        for ln in picks:
+            cost = count_tokens(ln)
+            if used + cost > max_tokens:
+                # keep a (roughly token-sized) head of the line that overflows
+                room = max(max_tokens - used, 0) * 4
+                kept.append(ln[:room].rstrip() + " …" if room else "…")
+                return "\n".join(kept)
+            kept.append(ln)
+            used += cost
+    return "\n".join(kept)
+
+
+class ContextBuilder:
+    """
+    Builds the "history so far" context for one task's executor steps under a
+    token budget per agent type.
+
+    The most recent `keep_recent` steps and the steps most relevant to the
+    next task are kept verbatim while they fit; older ones are replaced by a
+    compact summary that is computed once per step and reused by later
+    steps. `stats` records how many tokens that saved.
+    """
+
+    def __init__(
+        self,
+        budgets: Optional[Dict[str, int]] = None,
+        keep_recent: int = 1,
+        summary_tokens: int = 300,
+    ):
+        self.budgets = {**DEFAULT_BUDGETS, **(budgets or {})}
+        self.keep_recent = keep_recent
+        self.summary_tokens = summary_tokens
+        # keyed by a digest of the step output, so reuse does not depend on
+        # the step's position in whatever history a caller passes
+        self._summaries: Dict[str, str] = {}
+        self._token_counts: Dict[str, int] = {}
+        self.stats = {"builds": 0, "history_tokens": 0, "sent_tokens": 0, "saved_tokens": 0}
+        # steps of one task may build their context concurrently
+        self._stats_lock = threading.Lock()
+
+    @staticmethod
+    def _key(output: str) -> str:
+        return hashlib.sha1(output.encode("utf-8")).hexdigest()
+
+    def _tokens(self, output: str) -> int:
+        key = self._key(output)
+        if key not in self._token_counts:
+            self._token_counts[key] = count_tokens(output)
+        return self._token_counts[key]
+
+    def _summary(self, output: str) -> str:
+        key = self._key(output)
+        if key not in self._summaries:
+            self._summaries[key] = compact_output(output, self.summary_tokens)
+        return self._summaries[key]
+
+    @staticmethod
+    def _relevance(step_title: str, text: str) -> float:
+        wanted = set(_WORD_RE.findall(step_title.lower()))
+        if not wanted:
+            return 0.0
+        have = set(_WORD_RE.findall(text[:4000].lower()))
+        return len(wanted & have) / len(wanted)
+
+    def build(
+        self,
+        history: list,
+        prompt: str,
+        step_title: str,
+        agent: str,
+        step_indices: Optional[List[int]] = None,
+    ) -> str:
+        """
+        `step_indices` are the plan indices of the `history` entries (e.g. a
+        step's ancestors, which may skip steps); by default entry i is step i.
+        """
+        budget = self.budgets.get(agent, max(self.budgets.values()))
+        n = len(history)
+        outputs = [(output or "").strip() for _, _, output in history]
+        full_cost = [self._tokens(outputs[i]) for i in range(n)]
+
+        # priority: most recent first, then by relevance to the next task
+        recent = list(range(n - 1, max(n - 1 - self.keep_recent, -1), -1))
+        rest = sorted(
+            (i for i in range(n) if i not in recent),
+            key=lambda i: (-self._relevance(step_title, history[i][0] + outputs[i]), -i),
+        )
+
+        verbatim, used = set(), 0
+        for i in recent + rest:
+            if used + full_cost[i] <= budget:
+                verbatim.add(i)
+                used += full_cost[i]
+
+        sections, sent = [], 0
+        for i, (desc, agent_name, _) in enumerate(history):
+            if i in verbatim:
+                body = outputs[i]
+                sent += full_cost[i]
+            else:
+                summary = self._summary(outputs[i])
+                cost = count_tokens(summary)
+                if used + cost > budget:
+                    body = "(omitted to fit the context budget)"
+                else:
+                    body = f"(summary)\n{summary}"
+                    used += cost
+                    sent += cost
+            index = step_indices[i] if step_indices is not None else i
+            sections.append(f"\n{_label(index, desc, agent_name)}:\n{body}\n")
+
+        history_tokens = sum(full_cost)
+        with self._stats_lock:
+            self.stats["builds"] += 1
+            self.stats["history_tokens"] += history_tokens
+            self.stats["sent_tokens"] += sent
+            self.stats["saved_tokens"] += max(history_tokens - sent, 0)
+
+        return f"📘 User Prompt:\n{prompt}\n\n📜 History so far:\n" + "".join(sections)
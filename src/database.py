@@ -0,0 +1,230 @@
+import os
+import time
+import asyncio
+import threading
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Dict, Optional
+
+from sqlalchemy import MetaData, event, inspect
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from src.metrics import current_timings, observe
+
+
+def async_url(url: str) -> str:
+    """Maps a sync DATABASE_URL to its async driver (asyncpg / aiosqlite)."""
+    if url.startswith("postgres://"):
+        url = url.replace("postgres://", "postgresql://", 1)
+    if url.startswith("postgresql://") or url.startswith("postgresql+psycopg2://"):
+        return "postgresql+asyncpg://" + url.split("://", 1)[1]
+    if url.startswith("sqlite://") and not url.startswith("sqlite+"):
+        return "sqlite+aiosqlite://" + url.split("://", 1)[1]
+    return url
+
+
+def _percentile(values, pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+class Database:
+    """
+    Async SQLAlchemy engine plus session factory, with pool metrics.
+
+    Handlers use `async with db.session("op") as s`; each session is timed
+    as a `db` span named after its operation. Code running in worker threads
+    (the agent workflow) calls `db.run(coro)`, which executes the coroutine
+    on the app's event loop, so every query goes through the same pool.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        pool_size: int = 10,
+        max_overflow: int = 20,
+        pool_timeout: float = 30,
+        pool_recycle: int = 1800,
+        pool_pre_ping: bool = True,
+    ):
+        url = async_url(url)
+        self.engine = create_async_engine(
+            url,
+            pool_size=pool_size,
+            max_overflow=max_overflow,
+            pool_timeout=pool_timeout,
+            pool_recycle=pool_recycle,
+            pool_pre_ping=pool_pre_ping,
+        )
+        self.sessionmaker = async_sessionmaker(self.engine, expire_on_commit=False)
+        self.pool_size = pool_size
+        self.max_overflow = max_overflow
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+        self._lock = threading.Lock()
+        self._waits: deque = deque(maxlen=1000)
+        self._checkouts = 0
+        self._timeouts = 0
+        self._in_use = 0
+        self._peak_in_use = 0
+        pool_events = self.engine.sync_engine.pool
+        event.listen(pool_events, "checkout", self._on_checkout)
+        event.listen(pool_events, "checkin", self._on_checkin)
+
+    # ----- pool accounting -----
+    def _on_checkout(self, *args):
+        with self._lock:
+            self._checkouts += 1
+            self._in_use += 1
+            self._peak_in_use = max(self._peak_in_use, self._in_use)
+
+    def _on_checkin(self, *args):
+        with self._lock:
+            self._in_use = max(self._in_use - 1, 0)
+
+    def bind_loop(self, loop: asyncio.AbstractEventLoop) -> None:
+        """Event loop that `run()` schedules on (set at app startup)."""
+        self._loop = loop
+
+    @asynccontextmanager
+    async def session(self, name: str = "session") -> AsyncIterator[AsyncSession]:
+        async with self.sessionmaker() as session:
+            started = time.perf_counter()
+            try:
+                # check the connection out now, so the wait is measured
+                await session.connection()
+            except (PoolTimeoutError, asyncio.TimeoutError):
+                with self._lock:
+                    self._timeouts += 1
+                raise
+            with self._lock:
+                self._waits.append(time.perf_counter() - started)
+            try:
+                yield session
+            finally:
+                observe("db", name, time.perf_counter() - started)
+
+    def run(self, coro: Awaitable, timeout: Optional[float] = None) -> Any:
+        """Runs `coro` on the app loop from a worker thread and waits for it."""
+        if self._loop is None or self._loop.is_closed():
+            coro.close()
+            raise RuntimeError("Database.run() needs the app event loop (bind_loop)")
+        timings = current_timings.get()
+        if timings is not None:
+            # the loop runs coro in its own context; carry the caller's task timings
+            coro = _with_timings(coro, timings)
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result(timeout)
+
+    def stats(self) -> Dict:
+        pool = self.engine.sync_engine.pool
+        with self._lock:
+            waits = list(self._waits)
+            in_use, peak = self._in_use, self._peak_in_use
+            checkouts, timeouts = self._checkouts, self._timeouts
+        capacity = self.pool_size + self.max_overflow
+        out = {
+            "pool": type(pool).__name__,
+            "checked_out": in_use,
+            "peak_checked_out": peak,
+            "capacity": capacity,
+            "utilization": round(in_use / capacity, 3) if capacity else 0.0,
+            "checkouts": checkouts,
+            "timeouts": timeouts,
+            "checkout_wait_ms": {
+                "p50": round(_percentile(waits, 50) * 1000, 2),
+                "p99": round(_percentile(waits, 99) * 1000, 2),
+                "max": round(max(waits) * 1000, 2) if waits else 0.0,
+            },
+        }
+        for name in ("size", "checkedin", "overflow"):
+            fn = getattr(pool, name, None)
+            if callable(fn):
+                out[name] = fn()
+        return out
+
+    async def dispose(self) -> None:
+        await self.engine.dispose()
+
+
+async def _with_timings(coro: Awaitable, timings) -> Any:
+    current_timings.set(timings)
+    return await coro
+
+
+def build_database(url: str) -> Database:
+    """Async engine for DATABASE_URL, pool tuned from env."""
+    return Database(
+        url,
+        pool_size=int(os.getenv("DB_POOL_SIZE", "10")),
+        max_overflow=int(os.getenv("DB_MAX_OVERFLOW", "20")),
+        pool_timeout=float(os.getenv("DB_POOL_TIMEOUT", "30")),
+        pool_recycle=int(os.getenv("DB_POOL_RECYCLE", "1800")),
+        pool_pre_ping=os.getenv("DB_POOL_PRE_PING", "1").lower() not in ("0", "false", "no"),
+    )
+
+
+# ----- Schema -----
+# DB_SCHEMA decides who may touch tables, for the app's own tables and for
+# the SQL progress store / an LLM cache kept in DATABASE_URL alike: "create"
+# creates missing tables and adds missing columns and indexes (additive
+# migration), "reset" drops and recreates them (wipes their data), "none"
+# leaves the database as is.
+def schema_mode() -> str:
+    return os.getenv("DB_SCHEMA", "none").lower()
+
+
+def _column_ddl(column, dialect) -> str:
+    ddl = f"{dialect.identifier_preparer.quote(column.name)} {column.type.compile(dialect=dialect)}"
+    default = getattr(column.default, "arg", None)
+    if isinstance(default, (int, float, str)) and not callable(default):
+        ddl += f" DEFAULT {default!r}" if isinstance(default, str) else f" DEFAULT {default}"
+        if not column.nullable:
+            ddl += " NOT NULL"
+    return ddl
+
+
+def migrate_schema(conn, metadata: MetaData) -> list:
+    """
+    Additive migration on a sync connection: creates missing tables, adds
+    missing columns (nullable, or NOT NULL with their scalar default) and
+    missing indexes. Returns a description of each change.
+    """
+    existing = inspect(conn)
+    tables = set(existing.get_table_names())
+    changes = [f"table {t.name}" for t in metadata.sorted_tables if t.name not in tables]
+    metadata.create_all(conn)
+    for table in metadata.sorted_tables:
+        if table.name not in tables:
+            continue
+        columns = {c["name"] for c in existing.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in columns:
+                conn.exec_driver_sql(
+                    f"ALTER TABLE {conn.dialect.identifier_preparer.quote(table.name)}"
+                    f" ADD COLUMN {_column_ddl(column, conn.dialect)}"
+                )
+                changes.append(f"column {table.name}.{column.name}")
+        indexes = {i["name"] for i in existing.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in indexes:
+                index.create(conn)
+                changes.append(f"index {index.name}")
+    return changes
+
+
+def prepare_schema(conn, metadata: MetaData, mode: Optional[str] = None) -> list:
+    """Applies DB_SCHEMA (or `mode`) to the tables of `metadata`."""
+    mode = mode or schema_mode()
+    if mode == "reset":
+        metadata.drop_all(conn)
+    if mode in ("create", "reset"):
+        return migrate_schema(conn, metadata)
+    missing = [t.name for t in metadata.sorted_tables if not inspect(conn).has_table(t.name)]
+    if missing:
+        raise RuntimeError(
+            f"Missing tables {', '.join(missing)}; start once with DB_SCHEMA=create"
+        )
+    return []
@@ -0,0 +1,194 @@
+import os
+import re
+import gzip
+import time
+import hashlib
+from typing import Dict, Optional, Tuple
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.staticfiles import StaticFiles
+
+from src.metrics import COMPRESSION_BYTES, COMPRESSION_SECONDS
+
+try:
+    import brotli  # optional: `pip install brotli` enables `br`
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_TYPES = (
+    "application/json",
+    "text/html",
+    "text/plain",
+    "text/css",
+    "text/javascript",
+    "application/javascript",
+    "image/svg+xml",
+)
+# per-encoding suffix on strong ETags of compressed bodies, e.g. "abc-gzip"
+_ETAG_SUFFIX = re.compile(r'-(?:gzip|br)"')
+
+
+def _accepted_encodings(header: str) -> set:
+    accepted = set()
+    for part in header.split(","):
+        name, _, params = part.strip().partition(";")
+        quality = 1.0
+        if "q=" in params:
+            try:
+                quality = float(params.split("q=", 1)[1])
+            except ValueError:
+                quality = 0.0
+        if name and quality > 0:
+            accepted.add(name.strip().lower())
+    return accepted
+
+
+class CompressionMiddleware:
+    """
+    ASGI middleware compressing single-chunk JSON / HTML / text responses of
+    at least `minimum_size` bytes: brotli when installed and accepted, else
+    gzip. Streaming responses (SSE, large files) pass through untouched.
+
+    Compression time and bytes in / out go to the metrics registry, per
+    encoding, to tune the threshold and levels. Strong ETags get a
+    per-encoding suffix (like Apache's `-gzip`) that is stripped again from
+    `If-None-Match` before the request reaches the app.
+    """
+
+    def __init__(self, app, minimum_size: int = 1024, gzip_level: int = 6, brotli_quality: int = 4):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or self.minimum_size < 0:
+            await self.app(scope, receive, send)
+            return
+        headers = Headers(scope=scope)
+        accepted = _accepted_encodings(headers.get("accept-encoding", ""))
+        encoding = "br" if brotli is not None and "br" in accepted else None
+        encoding = encoding or ("gzip" if "gzip" in accepted else None)
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        if_none_match = headers.get("if-none-match")
+        revalidating = bool(if_none_match and _ETAG_SUFFIX.search(if_none_match))
+        if revalidating:
+            raw = [(k, v) for k, v in scope["headers"] if k != b"if-none-match"]
+            raw.append((b"if-none-match", _ETAG_SUFFIX.sub('"', if_none_match).encode("latin-1")))
+            scope = dict(scope, headers=raw)
+
+        start = None
+
+        async def send_compressed(message):
+            nonlocal start
+            if message["type"] == "http.response.start":
+                # held back until the body shows whether it can be compressed
+                start = message
+                return
+            if start is None or message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            response_start, start = start, None
+            out_headers = MutableHeaders(raw=response_start["headers"])
+            body = message.get("body", b"")
+            if message.get("more_body", False) or not self._compressible(
+                response_start["status"], out_headers, body
+            ):
+                if response_start["status"] == 304 and revalidating:
+                    self._suffix_etag(out_headers, encoding)
+                await send(response_start)
+                await send(message)
+                return
+
+            compressed = self._compress(encoding, body)
+            out_headers.add_vary_header("Accept-Encoding")
+            if len(compressed) < len(body):
+                body = compressed
+                out_headers["Content-Encoding"] = encoding
+                out_headers["Content-Length"] = str(len(body))
+                self._suffix_etag(out_headers, encoding)
+            await send(response_start)
+            await send({"type": "http.response.body", "body": body})
+
+        await self.app(scope, receive, send_compressed)
+
+    def _compressible(self, status: int, headers: MutableHeaders, body: bytes) -> bool:
+        if status < 200 or status in (204, 304) or "content-encoding" in headers:
+            return False
+        content_type = headers.get("content-type", "").split(";")[0].strip().lower()
+        return content_type in COMPRESSIBLE_TYPES and len(body) >= self.minimum_size
+
+    def _compress(self, encoding: str, body: bytes) -> bytes:
+        started = time.perf_counter()
+        if encoding == "br":
+            compressed = brotli.compress(body, quality=self.brotli_quality)
+        else:
+            compressed = gzip.compress(body, compresslevel=self.gzip_level, mtime=0)
+        COMPRESSION_SECONDS.observe(time.perf_counter() - started, encoding)
+        COMPRESSION_BYTES.inc(len(body), encoding, "in")
+        COMPRESSION_BYTES.inc(len(compressed), encoding, "out")
+        return compressed
+
+    @staticmethod
+    def _suffix_etag(headers: MutableHeaders, encoding: str) -> None:
+        etag = headers.get("etag")
+        if etag and not etag.startswith("W/") and etag.endswith('"'):
+            headers["ETag"] = f'{etag[:-1]}-{encoding}"'
+
+
+class FingerprintedStaticFiles(StaticFiles):
+    """
+    StaticFiles whose `url()` embeds a content hash (`logo.3f2a9c01d2.png`).
+    Fingerprinted URLs are served `immutable` for a year; plain and outdated
+    ones are served with `no-cache`, so browsers revalidate them with the
+    ETag / Last-Modified that StaticFiles already answers with 304.
+    """
+
+    _FINGERPRINTED = re.compile(r"^(?P<stem>.+)\.(?P<digest>[0-9a-f]{10})(?P<ext>\.[^./\\]+)$")
+
+    def __init__(self, *, directory: str, mount_path: str = "/static", **kwargs):
+        super().__init__(directory=directory, **kwargs)
+        self.mount_path = mount_path.rstrip("/")
+        # path -> (mtime_ns, size, digest)
+        self._digests: Dict[str, Tuple[int, int, str]] = {}
+
+    def fingerprint(self, path: str) -> Optional[str]:
+        full_path, stat_result = self.lookup_path(path)
+        if stat_result is None or not os.path.isfile(full_path):
+            return None
+        cached = self._digests.get(path)
+        if cached and cached[:2] == (stat_result.st_mtime_ns, stat_result.st_size):
+            return cached[2]
+        with open(full_path, "rb") as f:
+            digest = hashlib.sha256(f.read()).hexdigest()[:10]
+        self._digests[path] = (stat_result.st_mtime_ns, stat_result.st_size, digest)
+        return digest
+
+    def url(self, path: str) -> str:
+        """URL of a static file for templates (`{{ static_url('logo.png') }}`)."""
+        digest = self.fingerprint(path)
+        if digest is None:
+            return f"{self.mount_path}/{path}"
+        stem, ext = os.path.splitext(path)
+        return f"{self.mount_path}/{stem}.{digest}{ext}"
+
+    async def get_response(self, path: str, scope):
+        match = self._FINGERPRINTED.match(path)
+        if match:
+            original = match["stem"] + match["ext"]
+            digest = self.fingerprint(original)
+            if digest is not None:
+                response = await super().get_response(original, scope)
+                response.headers["Cache-Control"] = (
+                    "public, max-age=31536000, immutable"
+                    if digest == match["digest"]
+                    else "no-cache"
+                )
+                return response
+        response = await super().get_response(path, scope)
+        response.headers.setdefault("Cache-Control", "no-cache")
+        return response
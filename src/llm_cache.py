@@ -0,0 +1,483 @@
+import logging
+import os
+import json
+import time
+import hashlib
+import inspect
+import tempfile
+import threading
+import contextvars
+from abc import ABC, abstractmethod
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, Optional
+
+from sqlalchemy import (
+    create_engine,
+    MetaData,
+    Table,
+    Column,
+    String,
+    Text,
+    Float,
+    Integer,
+    select,
+    delete,
+    update,
+    func,
+)
+
+from src.cancellation import current_cancel_token, run_cancellable
+from src.database import prepare_schema
+from src.metrics import observe, record_tokens, tool_seconds
+
+logger = logging.getLogger(__name__)
+
+
+# ----- Request fingerprint -----
+def _tool_fingerprint(tool: Any) -> Any:
+    # callables are described by what the model sees: name, signature, doc
+    if callable(tool):
+        return {
+            "name": getattr(tool, "__name__", repr(tool)),
+            "signature": str(inspect.signature(tool)),
+            "doc": inspect.getdoc(tool) or "",
+        }
+    return tool
+
+
+def request_key(model: str, messages: list, **params) -> str:
+    """Canonical SHA-256 of a chat completion request."""
+    payload = {
+        "model": model,
+        "messages": messages,
+        "tools": [_tool_fingerprint(t) for t in params.pop("tools", None) or []],
+        "params": params,
+    }
+    blob = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+# ----- Response (de)serialization -----
+# Only the fields the agents read are kept: final content, tool calls made
+# along the way and token usage.
+def _tool_calls(message: Any) -> list:
+    out = []
+    for tc in getattr(message, "tool_calls", None) or []:
+        fn = getattr(tc, "function", None)
+        if fn is not None:
+            out.append({"name": fn.name, "arguments": fn.arguments})
+    return out
+
+
+def _usage(resp: Any) -> Optional[Dict]:
+    usage = getattr(resp, "usage", None)
+    if usage is None:
+        return None
+    return {
+        "prompt_tokens": getattr(usage, "prompt_tokens", None),
+        "completion_tokens": getattr(usage, "completion_tokens", None),
+        "total_tokens": getattr(usage, "total_tokens", None),
+    }
+
+
+def serialize_response(resp: Any) -> Dict:
+    message = resp.choices[0].message
+    return {
+        "content": message.content,
+        "tool_calls": _tool_calls(message),
+        "intermediate_tool_calls": [
+            _tool_calls(ir.choices[0].message)
+            for ir in getattr(resp, "intermediate_responses", None) or []
+        ],
+        "usage": _usage(resp),
+    }
+
+
+def _ns_tool_calls(calls: list) -> list:
+    return [
+        SimpleNamespace(
+            function=SimpleNamespace(name=c["name"], arguments=c["arguments"])
+        )
+        for c in calls
+    ]
+
+
+def deserialize_response(data: Dict) -> Any:
+    """Rebuilds an object with the attribute layout of an aisuite response."""
+    intermediate = [
+        SimpleNamespace(
+            choices=[
+                SimpleNamespace(
+                    message=SimpleNamespace(content=None, tool_calls=_ns_tool_calls(c))
+                )
+            ]
+        )
+        for c in data.get("intermediate_tool_calls", [])
+    ]
+    message = SimpleNamespace(
+        content=data.get("content"),
+        tool_calls=_ns_tool_calls(data.get("tool_calls", [])) or None,
+        intermediate_messages=[],
+    )
+    usage = data.get("usage")
+    return SimpleNamespace(
+        choices=[SimpleNamespace(message=message)],
+        intermediate_responses=intermediate,
+        usage=SimpleNamespace(**usage) if usage else None,
+        cached=True,
+    )
+
+
+# ----- Backends -----
+class ResponseCache(ABC):
+    """Backend interface: `get(key)` -> dict or None, `set(key, value, ...)`."""
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[Dict]:
+        ...
+
+    @abstractmethod
+    def set(self, key: str, value: Dict, model: str = "", elapsed: float = 0.0):
+        ...
+
+    def stats(self) -> Dict:
+        return {}
+
+
+class SQLResponseCache(ResponseCache):
+    """
+    SQLAlchemy-backed cache, so the same code serves SQLite (default, a local
+    file) and Postgres (e.g. the app's DATABASE_URL, shared by all workers).
+    Entries expire after `ttl_seconds`; above `max_entries` the least
+    recently used rows are deleted. `schema` is the DB_SCHEMA mode applied
+    to its table ("create" for a database of its own).
+    """
+
+    def __init__(
+        self, url: str, ttl_seconds: float, max_entries: int, schema: Optional[str] = None
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        connect_args = {"check_same_thread": False} if url.startswith("sqlite") else {}
+        self.engine = create_engine(url, future=True, connect_args=connect_args)
+        if url.startswith("sqlite"):
+            with self.engine.begin() as conn:
+                conn.exec_driver_sql("PRAGMA journal_mode=WAL")
+        metadata = MetaData()
+        self.table = Table(
+            "llm_response_cache",
+            metadata,
+            Column("key", String(64), primary_key=True),
+            Column("model", String),
+            Column("response", Text),
+            Column("elapsed", Float),
+            Column("created_at", Float, index=True),
+            Column("last_used_at", Float, index=True),
+            Column("hits", Integer, default=0),
+        )
+        with self.engine.begin() as conn:
+            prepare_schema(conn, metadata, schema)
+        self._writes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Dict]:
+        t = self.table
+        now = time.time()
+        with self.engine.begin() as conn:
+            row = conn.execute(
+                select(t.c.response, t.c.elapsed, t.c.created_at).where(t.c.key == key)
+            ).first()
+            if row is None:
+                return None
+            if row.created_at + self.ttl_seconds < now:
+                conn.execute(delete(t).where(t.c.key == key))
+                return None
+            conn.execute(
+                update(t)
+                .where(t.c.key == key)
+                .values(last_used_at=now, hits=t.c.hits + 1)
+            )
+        value = json.loads(row.response)
+        value["_elapsed"] = row.elapsed or 0.0
+        return value
+
+    def set(self, key: str, value: Dict, model: str = "", elapsed: float = 0.0):
+        t = self.table
+        now = time.time()
+        values = dict(
+            model=model,
+            response=json.dumps(value),
+            elapsed=elapsed,
+            created_at=now,
+            last_used_at=now,
+            hits=0,
+        )
+        with self.engine.begin() as conn:
+            # portable upsert: racing writers store identical values anyway
+            conn.execute(delete(t).where(t.c.key == key))
+            conn.execute(t.insert().values(key=key, **values))
+        with self._lock:
+            self._writes += 1
+            check = self._writes % 50 == 1
+        if check:
+            self._evict()
+
+    def _evict(self):
+        t = self.table
+        with self.engine.begin() as conn:
+            conn.execute(delete(t).where(t.c.created_at < time.time() - self.ttl_seconds))
+            count = conn.execute(select(func.count()).select_from(t)).scalar() or 0
+            excess = count - self.max_entries
+            if excess > 0:
+                oldest = (
+                    select(t.c.key).order_by(t.c.last_used_at.asc()).limit(excess)
+                ).scalar_subquery()
+                conn.execute(delete(t).where(t.c.key.in_(oldest)))
+
+    def stats(self) -> Dict:
+        with self.engine.connect() as conn:
+            entries = conn.execute(select(func.count()).select_from(self.table)).scalar()
+        return {
+            "backend": self.engine.dialect.name,
+            "entries": entries,
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+        }
+
+
+# ----- Per-task accounting -----
+# The workflow sets the current task id; hits and misses are counted under it.
+current_task_id: contextvars.ContextVar = contextvars.ContextVar(
+    "llm_cache_task_id", default=None
+)
+_task_stats: Dict[str, Dict] = {}
+_global_stats = {"hits": 0, "misses": 0, "bypassed": 0, "saved_seconds": 0.0}
+_stats_lock = threading.Lock()
+
+
+def _record(outcome: str, saved: float = 0.0):
+    task_id = current_task_id.get()
+    with _stats_lock:
+        targets = [_global_stats]
+        if task_id is not None:
+            targets.append(
+                _task_stats.setdefault(
+                    task_id,
+                    {"hits": 0, "misses": 0, "bypassed": 0, "saved_seconds": 0.0},
+                )
+            )
+        for s in targets:
+            s[outcome] += 1
+            s["saved_seconds"] = round(s["saved_seconds"] + saved, 3)
+
+
+def task_cache_stats(task_id: str, pop: bool = False) -> Dict:
+    with _stats_lock:
+        stats = _task_stats.pop(task_id, None) if pop else _task_stats.get(task_id)
+        return dict(stats or {"hits": 0, "misses": 0, "bypassed": 0, "saved_seconds": 0.0})
+
+
+# ----- Client wrapper -----
+class _CachedCompletions:
+    def __init__(self, owner: "CachedClient"):
+        self._owner = owner
+
+    def create(self, model: str, messages: list, cache: bool = True, **kwargs):
+        """
+        Same as aisuite's `chat.completions.create`. Deterministic requests
+        (temperature 0) are served from the cache, streamed or not; pass
+        `cache=False` to force a fresh call.
+        """
+        owner = self._owner
+        inner = owner.client.chat.completions
+        cacheable = owner.backend is not None and kwargs.get("temperature") in (0, 0.0)
+        if not cacheable:
+            return self._call(inner, model, messages, **kwargs)
+        if not cache:
+            _record("bypassed")
+            return self._call(inner, model, messages, **kwargs)
+
+        stream = bool(kwargs.get("stream"))
+        # streamed and non-streamed variants of a request share one entry
+        key = request_key(
+            model, messages, **{k: v for k, v in kwargs.items() if k != "stream"}
+        )
+        try:
+            hit = owner.backend.get(key)
+        except Exception as e:
+            logger.warning("⚠️ LLM cache read failed: %s", e)
+            hit = None
+        if hit is not None:
+            _record("hits", saved=hit.pop("_elapsed", 0.0))
+            if stream:
+                return iter([_content_chunk(hit.get("content") or "")])
+            return deserialize_response(hit)
+
+        _record("misses")
+        started = time.monotonic()
+        resp = self._call(inner, model, messages, **kwargs)
+        if stream:
+            return self._store_stream(key, model, resp, started)
+        self._store(key, model, serialize_response(resp), started)
+        return resp
+
+    def _call(self, inner, model: str, messages: list, **kwargs):
+        """
+        Upstream call, timed into the `llm` span with its token usage. Within
+        a task it runs in a helper thread the workflow abandons on cancel.
+        """
+        token = current_cancel_token.get()
+        if token is not None and token.deadline is not None and model.startswith("openai:"):
+            # the OpenAI SDK takes a per-request timeout: stop at the deadline
+            kwargs.setdefault("timeout", token.timeout(600))
+        return run_cancellable(self._call_upstream, inner, model, messages, **kwargs)
+
+    def _call_upstream(self, inner, model: str, messages: list, **kwargs):
+        started = time.perf_counter()
+        tools_before = tool_seconds()
+        resp = inner.create(model=model, messages=messages, **kwargs)
+        if kwargs.get("stream"):
+            return _timed_stream(model, resp, started)
+        # aisuite runs the tools of a tool loop in this thread; leave them out
+        elapsed = time.perf_counter() - started - (tool_seconds() - tools_before)
+        observe("llm", model, elapsed)
+        for r in [*(getattr(resp, "intermediate_responses", None) or []), resp]:
+            record_tokens(model, getattr(r, "usage", None))
+        return resp
+
+    def _store(self, key: str, model: str, value: Dict, started: float):
+        try:
+            self._owner.backend.set(
+                key, value, model=model, elapsed=time.monotonic() - started
+            )
+        except Exception as e:
+            logger.warning("⚠️ LLM cache write failed: %s", e)
+
+    def _store_stream(self, key: str, model: str, stream, started: float):
+        # pass chunks through; only a fully consumed stream is cached
+        parts = []
+        for chunk in stream:
+            choices = getattr(chunk, "choices", None)
+            if choices:
+                delta = getattr(choices[0].delta, "content", None)
+                if delta:
+                    parts.append(delta)
+            yield chunk
+        self._store(
+            key,
+            model,
+            {
+                "content": "".join(parts),
+                "tool_calls": [],
+                "intermediate_tool_calls": [],
+                "usage": None,
+            },
+            started,
+        )
+
+
+def _timed_stream(model: str, stream, started: float):
+    usage = None
+    try:
+        for chunk in stream:
+            usage = getattr(chunk, "usage", None) or usage
+            yield chunk
+    finally:
+        # an abandoned stream (e.g. a cancelled task) closes its connection
+        close = getattr(stream, "close", None)
+        if callable(close):
+            close()
+        observe("llm", model, time.perf_counter() - started)
+        record_tokens(model, usage)
+
+
+def _content_chunk(content: str) -> Any:
+    """A single stream chunk carrying a whole cached completion."""
+    return SimpleNamespace(
+        choices=[SimpleNamespace(delta=SimpleNamespace(content=content), finish_reason="stop")],
+        usage=None,
+    )
+
+
+class CachedClient:
+    """
+    Drop-in wrapper around an aisuite `Client` that caches deterministic chat
+    completions in a `ResponseCache` backend. With `backend=None` every call
+    goes straight through.
+
+    `client_factory` / `backend_factory` defer building either one (and the
+    imports behind them) to the first call that needs it.
+    """
+
+    def __init__(
+        self,
+        client: Any = None,
+        backend: Optional[ResponseCache] = None,
+        client_factory: Optional[Callable[[], Any]] = None,
+        backend_factory: Optional[Callable[[], Optional[ResponseCache]]] = None,
+    ):
+        self._client = client
+        self._client_factory = client_factory
+        self._backend = backend
+        self._backend_factory = None if backend is not None else backend_factory
+        self._init_lock = threading.Lock()
+        self.chat = SimpleNamespace(completions=_CachedCompletions(self))
+
+    @property
+    def client(self) -> Any:
+        if self._client is None:
+            with self._init_lock:
+                if self._client is None:
+                    self._client = self._client_factory()
+        return self._client
+
+    @property
+    def backend(self) -> Optional[ResponseCache]:
+        if self._backend_factory is not None:
+            with self._init_lock:
+                if self._backend_factory is not None:
+                    self._backend = self._backend_factory()
+                    self._backend_factory = None
+        return self._backend
+
+    def stats(self) -> Dict:
+        with _stats_lock:
+            out = dict(_global_stats)
+        if self.backend is not None:
+            try:
+                out.update(self.backend.stats())
+            except Exception as e:
+                out["backend_error"] = str(e)
+        return out
+
+
+def _normalized_url(url: str) -> str:
+    if url.startswith("postgres://"):
+        return url.replace("postgres://", "postgresql://", 1)
+    return url
+
+
+def build_response_cache() -> Optional[ResponseCache]:
+    """
+    Backend from env: LLM_CACHE_URL (SQLAlchemy URL), "off" disables. In the
+    app's DATABASE_URL the table is managed as DB_SCHEMA says; anywhere else
+    (the default private SQLite file) the cache creates it itself.
+    """
+    url = os.getenv(
+        "LLM_CACHE_URL",
+        "sqlite:///" + os.path.join(tempfile.gettempdir(), "llm_cache.sqlite3"),
+    )
+    if url.lower() in ("", "off", "none", "0"):
+        return None
+    url = _normalized_url(url)
+    shared = url == _normalized_url(os.getenv("DATABASE_URL") or "")
+    try:
+        return SQLResponseCache(
+            url,
+            ttl_seconds=float(os.getenv("LLM_CACHE_TTL_SECONDS", str(7 * 24 * 3600))),
+            max_entries=int(os.getenv("LLM_CACHE_MAX_ENTRIES", "5000")),
+            schema=None if shared else "create",
+        )
+    except Exception as e:
+        logger.warning("⚠️ LLM cache disabled: %s", e)
+        return None
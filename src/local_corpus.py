@@ -0,0 +1,304 @@
+import logging
+import os
+import re
+import time
+import sqlite3
+import hashlib
+import tempfile
+import threading
+from typing import Dict, Iterable, List, Optional
+from urllib.parse import urlsplit
+
+from src.metrics import span
+
+logger = logging.getLogger(__name__)
+
+
+# "10.1145/3292500.3330701", also inside doi.org URLs
+_DOI_RE = re.compile(r"\b(10\.\d{4,9}/[^\s?#]+)", re.IGNORECASE)
+# ".../abs/2101.00001v2", ".../pdf/hep-th/9901001v1.pdf", arXiv DOIs
+_ARXIV_RE = re.compile(
+    r"(?:arxiv\.org/(?:abs|pdf)/|10\.48550/arxiv\.)([a-z\-]+/\d{7}|\d{4}\.\d{4,5})",
+    re.IGNORECASE,
+)
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    id INTEGER PRIMARY KEY,
+    key TEXT NOT NULL UNIQUE,
+    source TEXT NOT NULL,
+    title TEXT NOT NULL DEFAULT '',
+    url TEXT NOT NULL DEFAULT '',
+    doi TEXT,
+    published TEXT,
+    authors TEXT,
+    body TEXT NOT NULL DEFAULT '',
+    body_hash TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    last_used REAL NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS ix_documents_last_used ON documents (last_used);
+CREATE VIRTUAL TABLE IF NOT EXISTS documents_fts USING fts5(
+    title, body, content='documents', content_rowid='id',
+    tokenize='porter unicode61 remove_diacritics 2'
+);
+CREATE TRIGGER IF NOT EXISTS documents_ai AFTER INSERT ON documents BEGIN
+    INSERT INTO documents_fts (rowid, title, body) VALUES (new.id, new.title, new.body);
+END;
+CREATE TRIGGER IF NOT EXISTS documents_ad AFTER DELETE ON documents BEGIN
+    INSERT INTO documents_fts (documents_fts, rowid, title, body)
+    VALUES ('delete', old.id, old.title, old.body);
+END;
+CREATE TRIGGER IF NOT EXISTS documents_au AFTER UPDATE OF title, body ON documents BEGIN
+    INSERT INTO documents_fts (documents_fts, rowid, title, body)
+    VALUES ('delete', old.id, old.title, old.body);
+    INSERT INTO documents_fts (rowid, title, body) VALUES (new.id, new.title, new.body);
+END;
+"""
+
+
+def document_key(url: str = "", doi: Optional[str] = None) -> Optional[str]:
+    """
+    Deduplication key of a retrieved document: its arXiv id (unversioned),
+    else its DOI, else its normalized URL (no scheme, `www.`, fragment or
+    trailing slash). None when there is nothing to key on.
+    """
+    for value in (doi or "", url or ""):
+        m = _ARXIV_RE.search(value)
+        if m:
+            return "arxiv:" + m.group(1).lower()
+    for value in (doi or "", url or ""):
+        m = _DOI_RE.search(value)
+        if m:
+            return "doi:" + m.group(1).rstrip(".").lower()
+    if not url:
+        return None
+    parts = urlsplit(url.strip())
+    host = parts.netloc.lower()
+    if host.startswith("www."):
+        host = host[4:]
+    path = parts.path.rstrip("/") or "/"
+    query = f"?{parts.query}" if parts.query else ""
+    return f"url:{host}{path}{query}" if host else None
+
+
+def match_query(text: str) -> Optional[str]:
+    """FTS5 MATCH expression OR-ing the quoted words of free text."""
+    words = []
+    for w in _WORD_RE.findall(text or ""):
+        w = w.lower()
+        if (len(w) > 1 or w.isdigit()) and w not in words:
+            words.append(w)
+    return " OR ".join(f'"{w}"' for w in words[:32]) or None
+
+
+class LocalCorpus:
+    """
+    SQLite FTS5 index of everything the research tools have retrieved.
+
+    Documents are deduplicated by arXiv id / DOI / normalized URL
+    (`document_key`). Re-ingesting a known document only refreshes its
+    metadata and recency; its text is rewritten (and re-indexed) when the
+    new body is longer, e.g. PDF text replacing an abstract. Search ranks
+    with BM25, title matches weighted above body matches. Once the stored
+    text exceeds `max_bytes`, the least recently ingested or returned
+    documents are evicted.
+    """
+
+    def __init__(self, path: str, max_bytes: int = 256 * 1024 * 1024, result_chars: int = 2000):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.result_chars = result_chars
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=10, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+        self._stats = {
+            "inserted": 0,
+            "updated": 0,
+            "unchanged": 0,
+            "skipped": 0,
+            "evictions": 0,
+            "searches": 0,
+            "search_hits": 0,
+        }
+
+    # ----- public API -----
+    def ingest(self, source: str, items: Iterable[Dict]) -> int:
+        """Adds tool results (dicts with title / url / text fields); returns new documents."""
+        items = list(items or [])
+        docs = [d for d in (self._document(source, item) for item in items) if d]
+        if not docs:
+            return 0
+
+        inserted = 0
+        now = time.time()
+        with span("corpus", "ingest"), self._lock, self._conn:
+            self._stats["skipped"] += len(items) - len(docs)
+            for doc in docs:
+                row = self._conn.execute(
+                    "SELECT id, body_hash, size FROM documents WHERE key = ?", (doc["key"],)
+                ).fetchone()
+                if row is None:
+                    self._conn.execute(
+                        "INSERT INTO documents (key, source, title, url, doi, published, authors,"
+                        " body, body_hash, size, created_at, last_used)"
+                        " VALUES (:key, :source, :title, :url, :doi, :published, :authors,"
+                        " :body, :body_hash, :size, :now, :now)",
+                        {**doc, "now": now},
+                    )
+                    inserted += 1
+                    self._stats["inserted"] += 1
+                elif row["body_hash"] != doc["body_hash"] and doc["size"] > row["size"]:
+                    self._conn.execute(
+                        "UPDATE documents SET source = :source, title = :title, url = :url,"
+                        " doi = COALESCE(:doi, doi), published = COALESCE(:published, published),"
+                        " authors = COALESCE(:authors, authors), body = :body,"
+                        " body_hash = :body_hash, size = :size, last_used = :now WHERE id = :id",
+                        {**doc, "now": now, "id": row["id"]},
+                    )
+                    self._stats["updated"] += 1
+                else:
+                    # same or shorter text: keep the indexed body, fill metadata gaps
+                    self._conn.execute(
+                        "UPDATE documents SET doi = COALESCE(doi, :doi),"
+                        " published = COALESCE(published, :published),"
+                        " authors = COALESCE(authors, :authors), last_used = :now WHERE id = :id",
+                        {**doc, "now": now, "id": row["id"]},
+                    )
+                    self._stats["unchanged"] += 1
+            self._evict_locked()
+        return inserted
+
+    def search(self, query: str, max_results: int = 5, source: Optional[str] = None) -> List[Dict]:
+        """BM25-ranked documents matching any word of `query`, best first."""
+        expression = match_query(query)
+        if expression is None:
+            return []
+        sql = (
+            "SELECT d.id, d.source, d.title, d.url, d.doi, d.published, d.authors, d.body,"
+            " d.created_at, bm25(documents_fts, 10.0, 1.0) AS rank,"
+            " snippet(documents_fts, 1, '', '', ' … ', 40) AS snippet"
+            " FROM documents_fts JOIN documents d ON d.id = documents_fts.rowid"
+            " WHERE documents_fts MATCH ?"
+        )
+        params: list = [expression]
+        if source:
+            sql += " AND d.source = ?"
+            params.append(source)
+        sql += " ORDER BY rank LIMIT ?"
+        params.append(max(1, min(int(max_results), 50)))
+
+        with span("corpus", "search"), self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+            if rows:
+                with self._conn:
+                    self._conn.executemany(
+                        "UPDATE documents SET last_used = ?, hits = hits + 1 WHERE id = ?",
+                        [(time.time(), r["id"]) for r in rows],
+                    )
+            self._stats["searches"] += 1
+            self._stats["search_hits"] += bool(rows)
+
+        out = []
+        for r in rows:
+            result = {
+                "title": r["title"],
+                "url": r["url"],
+                "source": r["source"],
+                "score": round(-r["rank"], 3),
+                "snippet": r["snippet"],
+                "content": r["body"][: self.result_chars],
+                "retrieved_at": time.strftime("%Y-%m-%d", time.gmtime(r["created_at"])),
+            }
+            for field in ("doi", "published", "authors"):
+                if r[field]:
+                    result[field] = r[field]
+            out.append(result)
+        return out
+
+    def stats(self) -> Dict:
+        with self._lock:
+            documents, size = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM documents"
+            ).fetchone()
+            return {
+                **self._stats,
+                "documents": documents,
+                "bytes": size,
+                "max_bytes": self.max_bytes,
+            }
+
+    # ----- internals -----
+    @staticmethod
+    def _document(source: str, item: Dict) -> Optional[Dict]:
+        if not isinstance(item, dict) or item.get("error") or item.get("found") is False:
+            return None
+        title = str(item.get("title") or "").strip()
+        url = str(item.get("url") or "").strip()
+        # the longest text field wins: PDF text, page content or abstract
+        body = max(
+            (str(item.get(f) or "") for f in ("text", "content", "summary")),
+            key=len,
+        ).strip()
+        key = document_key(url, item.get("doi"))
+        if key is None or not (title or body):
+            return None
+        authors = item.get("authors")
+        if isinstance(authors, (list, tuple)):
+            authors = ", ".join(str(a) for a in authors)
+        return {
+            "key": key,
+            "source": source,
+            "title": title,
+            "url": url,
+            "doi": item.get("doi") or None,
+            "published": item.get("published") or None,
+            "authors": authors or None,
+            "body": body,
+            "body_hash": hashlib.sha1(body.encode("utf-8")).hexdigest(),
+            "size": len(title.encode("utf-8")) + len(body.encode("utf-8")),
+        }
+
+    def _evict_locked(self) -> None:
+        (total,) = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM documents").fetchone()
+        if total <= self.max_bytes:
+            return
+        # evict down to 90% so a full index does not evict on every ingest
+        target = int(self.max_bytes * 0.9)
+        victims = []
+        for row in self._conn.execute("SELECT id, size FROM documents ORDER BY last_used, id"):
+            if total <= target:
+                break
+            victims.append((row["id"],))
+            total -= row["size"]
+        self._conn.executemany("DELETE FROM documents WHERE id = ?", victims)
+        self._stats["evictions"] += len(victims)
+
+
+def build_local_corpus() -> Optional[LocalCorpus]:
+    """Index from env: LOCAL_CORPUS_PATH (SQLite file), "off" disables."""
+    path = os.getenv(
+        "LOCAL_CORPUS_PATH", os.path.join(tempfile.gettempdir(), "local_corpus.sqlite3")
+    )
+    if path.lower() in ("", "off", "none", "0"):
+        return None
+    try:
+        return LocalCorpus(
+            path,
+            max_bytes=int(float(os.getenv("LOCAL_CORPUS_MAX_MB", "256")) * 1024 * 1024),
+            result_chars=int(os.getenv("LOCAL_CORPUS_RESULT_CHARS", "2000")),
+        )
+    except sqlite3.Error as e:  # e.g. SQLite built without FTS5
+        logger.warning("⚠️ Local corpus disabled: %s", e)
+        return None
+
+
+local_corpus = build_local_corpus()
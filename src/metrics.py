@@ -0,0 +1,278 @@
+import time
+import threading
+import contextvars
+from contextlib import contextmanager
+from functools import wraps
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Seconds; tuned for anything from a DB query to a full report
+DEFAULT_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0,
+)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Iterable[str], values: Iterable[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus text format."""
+
+    def __init__(self, name: str, help: str, labelnames: Tuple[str, ...] = (), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[Tuple[str, ...], List] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labelvalues: str) -> None:
+        with self._lock:
+            series = self._series.get(labelvalues)
+            if series is None:
+                # per-bucket counts, sum, count
+                series = self._series[labelvalues] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][i] += 1
+                    break
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = [(k, list(v[0]), v[1], v[2]) for k, v in sorted(self._series.items())]
+        for labelvalues, counts, total, count in items:
+            running = 0
+            for bound, n in zip(self.buckets, counts):
+                running += n
+                le = _labels(self.labelnames, labelvalues, f'le="{_number(bound)}"')
+                lines.append(f"{self.name}_bucket{le} {running}")
+            le = _labels(self.labelnames, labelvalues, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{le} {count}")
+            lbl = _labels(self.labelnames, labelvalues)
+            lines.append(f"{self.name}_sum{lbl} {_number(total)}")
+            lines.append(f"{self.name}_count{lbl} {count}")
+        return lines
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, *labelvalues: str) -> None:
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for labelvalues, value in items:
+            lines.append(f"{self.name}{_labels(self.labelnames, labelvalues)} {_number(value)}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines += metric.render()
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+# one histogram per span kind; the span name is its single label
+SPAN_HISTOGRAMS = {
+    "planner": REGISTRY.register(
+        Histogram("research_planner_seconds", "Planner agent duration.", ("model",))
+    ),
+    "step": REGISTRY.register(
+        Histogram("research_step_seconds", "Executor step duration by agent.", ("agent",))
+    ),
+    "llm": REGISTRY.register(
+        Histogram(
+            "research_llm_call_seconds",
+            "Model time of one completion request (tool-loop turns combined, tool execution excluded).",
+            ("model",),
+        )
+    ),
+    "tool": REGISTRY.register(
+        Histogram("research_tool_call_seconds", "Research tool call duration.", ("tool",))
+    ),
+    "arxiv": REGISTRY.register(
+        Histogram("research_arxiv_phase_seconds", "arXiv tool phases (api, download, extract).", ("phase",))
+    ),
+    "corpus": REGISTRY.register(
+        Histogram("research_corpus_seconds", "Local corpus index operations (ingest, search).", ("op",))
+    ),
+    "db": REGISTRY.register(
+        Histogram("research_db_operation_seconds", "DB session duration by operation.", ("op",))
+    ),
+}
+LLM_TOKENS = REGISTRY.register(
+    Counter("research_llm_tokens_total", "LLM tokens reported in response usage.", ("model", "type"))
+)
+REPORT_SUBMISSIONS = REGISTRY.register(
+    Counter(
+        "research_report_submissions_total",
+        "Report submissions: new run, attached in flight or served completed.",
+        ("outcome",),
+    )
+)
+COMPRESSION_SECONDS = REGISTRY.register(
+    Histogram(
+        "research_compression_seconds",
+        "CPU time compressing one response body.",
+        ("encoding",),
+        buckets=(0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1),
+    )
+)
+COMPRESSION_BYTES = REGISTRY.register(
+    Counter(
+        "research_compression_bytes_total",
+        "Response bytes before (in) and after (out) compression.",
+        ("encoding", "direction"),
+    )
+)
+TASK_SECONDS = REGISTRY.register(
+    Histogram("research_task_seconds", "End-to-end workflow duration by final status.", ("status",))
+)
+
+
+# ----- per-task breakdown -----
+class TaskTimings:
+    """Per-task aggregate of spans ({kind: {name: count/total/max}}) and tokens."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self._spans: Dict[str, Dict[str, List[float]]] = {}
+        self._tokens: Dict[str, Dict[str, int]] = {}
+        self._lock = threading.Lock()
+
+    def add(self, kind: str, name: str, seconds: float) -> None:
+        with self._lock:
+            entry = self._spans.setdefault(kind, {}).setdefault(name, [0, 0.0, 0.0])
+            entry[0] += 1
+            entry[1] += seconds
+            entry[2] = max(entry[2], seconds)
+
+    def add_tokens(self, model: str, prompt: int, completion: int) -> None:
+        with self._lock:
+            entry = self._tokens.setdefault(model, {"prompt": 0, "completion": 0})
+            entry["prompt"] += prompt
+            entry["completion"] += completion
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    def report(self) -> Dict:
+        with self._lock:
+            spans = {
+                kind: {
+                    name: {
+                        "count": count,
+                        "total_ms": round(total * 1000, 1),
+                        "max_ms": round(peak * 1000, 1),
+                    }
+                    for name, (count, total, peak) in names.items()
+                }
+                for kind, names in self._spans.items()
+            }
+            tokens = {m: dict(t) for m, t in self._tokens.items()}
+        return {
+            "total_ms": round(self.elapsed() * 1000, 1),
+            "spans": spans,
+            "tokens": tokens,
+        }
+
+
+# set by the workflow; copied into step threads with their context
+current_timings: contextvars.ContextVar = contextvars.ContextVar(
+    "task_timings", default=None
+)
+# tool time spent in this thread, so LLM spans can leave it out
+_local = threading.local()
+
+
+def tool_seconds() -> float:
+    return getattr(_local, "tool_seconds", 0.0)
+
+
+def observe(kind: str, name: str, seconds: float) -> None:
+    SPAN_HISTOGRAMS[kind].observe(seconds, name)
+    timings = current_timings.get()
+    if timings is not None:
+        timings.add(kind, name, seconds)
+    if kind == "tool":
+        _local.tool_seconds = tool_seconds() + seconds
+
+
+@contextmanager
+def span(kind: str, name: str):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(kind, name, time.perf_counter() - started)
+
+
+def timed(kind: str, name: Optional[str] = None):
+    """Decorator form of `span`; the name defaults to the function name."""
+
+    def decorator(fn):
+        label = name or fn.__name__
+
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(kind, label):
+                return fn(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def record_tokens(model: str, usage) -> None:
+    """Counts prompt / completion tokens from an OpenAI-style `usage`."""
+    if usage is None:
+        return
+    get = usage.get if isinstance(usage, dict) else lambda k: getattr(usage, k, None)
+    prompt, completion = get("prompt_tokens") or 0, get("completion_tokens") or 0
+    if prompt:
+        LLM_TOKENS.inc(prompt, model, "prompt")
+    if completion:
+        LLM_TOKENS.inc(completion, model, "completion")
+    timings = current_timings.get()
+    if timings is not None and (prompt or completion):
+        timings.add_tokens(model, prompt, completion)
+
+
+def render_metrics() -> str:
+    return REGISTRY.render()
@@ -0,0 +1,114 @@
+import re
+import sys
+from io import BytesIO
+from typing import Iterator, Optional, Union
+
+# Kept free of heavy imports: this module is what the PDF extraction
+# process pool imports in its worker processes.
+
+# A PDF source is either a file path (opened lazily, pages are read on
+# demand) or the raw bytes.
+PdfSource = Union[str, bytes]
+
+
+#when doing web pages scraping
+def clean_text(s: str) -> str:
+    #remove soft hyphens and line breaks
+    s = re.sub(r"-\n", "", s)  # "transfor-\nmers" -> "transformers"
+
+    s = re.sub(r"\r\n|\r", "\n", s)  # normaliza saltos
+    s = re.sub(r"[ \t]+", " ", s)  # colapsa espacios
+    # limit vertical white spaces
+    s = re.sub(r"\n{3,}", "\n\n", s)  # no más de 1 línea en blanco seguida
+    return s.strip()
+
+
+def _iter_pages_pymupdf(source: PdfSource, max_pages: Optional[int]) -> Iterator[str]:
+    import fitz  # PyMuPDF
+
+    if isinstance(source, str):
+        doc = fitz.open(source)
+    else:
+        doc = fitz.open(stream=source, filetype="pdf")
+    with doc:
+        n = len(doc)
+        limit = n if max_pages is None else min(max_pages, n)
+        for i in range(limit):
+            yield doc.load_page(i).get_text("text")
+
+
+def _iter_pages_pdfminer(
+    source: PdfSource, max_pages: Optional[int], start: int = 0
+) -> Iterator[str]:
+    from pdfminer.high_level import extract_pages
+    from pdfminer.layout import LTTextContainer
+
+    # pages before `start` are skipped without being parsed
+    page_numbers = range(start, max_pages or sys.maxsize) if start else None
+    fp = open(source, "rb") if isinstance(source, str) else BytesIO(source)
+    with fp:
+        # extract_pages parses lazily, one LTPage at a time
+        for page in extract_pages(fp, page_numbers=page_numbers, maxpages=max_pages or 0):
+            yield "".join(
+                el.get_text() for el in page if isinstance(el, LTTextContainer)
+            )
+
+
+def iter_pdf_pages(source: PdfSource, max_pages: Optional[int] = None) -> Iterator[str]:
+    """
+    Yields the raw text of each page, up to `max_pages`. Uses PyMuPDF and
+    falls back to pdfminer.six if PyMuPDF is missing or fails, also partway
+    through a document: pdfminer then reads the pages PyMuPDF did not.
+    """
+    done = 0
+    try:
+        for page in _iter_pages_pymupdf(source, max_pages):
+            yield page
+            done += 1
+        return
+    except Exception:
+        pass
+
+    if max_pages is not None and done >= max_pages:
+        return
+    try:
+        yield from _iter_pages_pdfminer(source, max_pages, start=done)
+    except Exception as e:
+        raise RuntimeError(f"PDF text extraction failed: {e}")
+
+
+def iter_pdf_text(
+    source: PdfSource,
+    max_pages: Optional[int] = None,
+    max_chars: Optional[int] = None,
+) -> Iterator[str]:
+    """
+    Yields cleaned text page by page and stops as soon as `max_chars`
+    (counting one separator per page) have been produced, so pages past the
+    budget are never parsed.
+    """
+    emitted = 0
+    for raw in iter_pdf_pages(source, max_pages):
+        page = clean_text(raw)
+        if not page:
+            continue
+        if max_chars is not None and emitted + len(page) >= max_chars:
+            # the budget may already be spent by the previous page's separator
+            if max_chars > emitted:
+                yield page[: max_chars - emitted]
+            return
+        emitted += len(page) + 1
+        yield page
+
+
+def pdf_bytes_to_text(pdf_bytes: bytes, max_pages: Optional[int] = None) -> str:
+    return "\n".join(iter_pdf_pages(pdf_bytes, max_pages=max_pages))
+
+
+def extract_clean_text(
+    source: PdfSource,
+    max_pages: Optional[int] = None,
+    max_chars: Optional[int] = None,
+) -> str:
+    """Extraction + cleanup in one call, so a pool worker returns final text."""
+    return "\n".join(iter_pdf_text(source, max_pages=max_pages, max_chars=max_chars))
@@ -1,15 +1,18 @@
 import json
 import re
-from typing import List
+import logging
+from typing import Callable, Dict, List, Optional, Tuple, Union
 from datetime import datetime
-from aisuite import Client
 from src.agents import (
+    client,  # shared, lazily built aisuite client (temperature 1 bypasses the cache)
     research_agent,
     writer_agent,
     editor_agent,
 )
+from src.context_builder import ContextBuilder
+from src.metrics import span
 
-client = Client()
+logger = logging.getLogger(__name__)
 
 
 def clean_json_block(raw: str) -> str:
@@ -24,7 +27,21 @@ from typing import List
 import json, ast
 
 
-def planner_agent(topic: str, model: str = "openai:o4-mini") -> List[str]:
+def planner_agent(
+    topic: str, model: str = "openai:o4-mini", return_dependencies: bool = False
+) -> Union[List[str], List[Dict]]:
+    """
+    Returns the plan as a list of step strings, or with `return_dependencies`
+    as `{"title", "depends_on"}` dicts where `depends_on` lists the indices of
+    earlier steps that must finish first (see `_ensure_dependencies`).
+    """
+    # one output contract, matching what the caller asked for
+    if return_dependencies:
+        output_format = """🎯 Produce a clear step-by-step research plan **as a valid JSON list of objects** {"step": "<step text>", "depends_on": [<0-based indices of EARLIER steps whose output this step needs>]} (no markdown, no explanations).
+Steps that do not need each other's output can run in parallel: independent research steps (e.g., a background Wikipedia search) should only depend on what they actually use."""
+    else:
+        output_format = "🎯 Produce a clear step-by-step research plan **as a valid Python list of strings** (no markdown, no explanations)."
+
     prompt = f"""
 You are a planning agent responsible for organizing a research workflow using multiple intelligent agents.
 
@@ -34,7 +51,7 @@ You are a planning agent responsible for organizing a research workflow using mu
 - Writer agent: drafts based on research findings.
 - Editor agent: reviews, reflects on, and improves drafts.
 
-🎯 Produce a clear step-by-step research plan **as a valid Python list of strings** (no markdown, no explanations). 
+{output_format}
 Each step must be atomic, actionable, and assigned to one of the agents.
 Maximum of 7 steps.
 
@@ -55,42 +72,63 @@ Maximum of 7 steps.
 Topic: "{topic}"
 """
 
-    response = client.chat.completions.create(
-        model=model,
-        messages=[{"role": "user", "content": prompt}],
-        temperature=1,
-    )
+    with span("planner", model):
+        response = client.chat.completions.create(
+            model=model,
+            messages=[{"role": "user", "content": prompt}],
+            temperature=1,
+        )
 
     raw = response.choices[0].message.content.strip()
 
     # --- robust parsing: JSON -> ast -> fallback ---
-    def _coerce_to_list(s: str) -> List[str]:
+    # items are plain strings or {"step": ..., "depends_on": [...]} objects
+    def _as_items(obj) -> List[Tuple[str, Optional[List[int]]]]:
+        if not isinstance(obj, list):
+            return []
+        items = []
+        for x in obj:
+            if isinstance(x, str):
+                items.append((x, None))
+            elif isinstance(x, dict) and isinstance(x.get("step"), str):
+                deps = x.get("depends_on")
+                if not isinstance(deps, list):
+                    deps = None
+                items.append((x["step"], deps))
+            else:
+                return []
+        return items[:7]
+
+    def _coerce_to_list(s: str) -> List[Tuple[str, Optional[List[int]]]]:
         # try strict JSON
         try:
-            obj = json.loads(s)
-            if isinstance(obj, list) and all(isinstance(x, str) for x in obj):
-                return obj[:7]
+            items = _as_items(json.loads(s))
+            if items:
+                return items
         except json.JSONDecodeError:
             pass
         # try Python literal list
         try:
-            obj = ast.literal_eval(s)
-            if isinstance(obj, list) and all(isinstance(x, str) for x in obj):
-                return obj[:7]
+            items = _as_items(ast.literal_eval(s))
+            if items:
+                return items
         except Exception:
             pass
         # try to extract code fence if present
         if s.startswith("```") and s.endswith("```"):
-            inner = s.strip("`")
+            inner = clean_json_block(s)
+            try:
+                return _as_items(json.loads(inner))
+            except Exception:
+                pass
             try:
-                obj = ast.literal_eval(inner)
-                if isinstance(obj, list) and all(isinstance(x, str) for x in obj):
-                    return obj[:7]
+                return _as_items(ast.literal_eval(inner))
             except Exception:
                 pass
         return []
 
-    steps = _coerce_to_list(raw)
+    items = _coerce_to_list(raw)
+    steps = [title for title, _ in items]
 
     # enforce ordering & minimal contract
     required_first = "Research agent: Use Tavily to perform a broad web search and collect top relevant items (title, authors, year, venue/source, URL, DOI if available)."
@@ -129,30 +167,105 @@ Topic: "{topic}"
         return steps_list[:7]
 
     steps = _ensure_contract(steps)
+    if not return_dependencies:
+        return steps
+
+    # declared dependencies follow their step titles through the contract fixes
+    declared = {}
+    for title, deps in items:
+        if deps is not None and title not in declared:
+            declared[title] = {
+                items[d][0] for d in deps if isinstance(d, int) and 0 <= d < len(items)
+            }
+    positions = {}
+    for i, title in enumerate(steps):
+        positions.setdefault(title, i)
+    depends_on = [
+        None
+        if title not in declared
+        else [positions[t] for t in declared[title] if t in positions]
+        for title in steps
+    ]
+    return [
+        {"title": title, "depends_on": deps}
+        for title, deps in zip(steps, _ensure_dependencies(steps, depends_on))
+    ]
+
+
+def _ensure_dependencies(
+    steps: List[str], depends_on: List[Optional[List[int]]]
+) -> List[List[int]]:
+    """
+    Turns declared dependencies into a valid DAG that honours the plan contract:
+    - the first (Tavily) step has no dependencies;
+    - the second (arXiv) step depends on the first, whose items it looks up;
+    - writer/editor steps, and the final step, depend on every earlier step;
+    - research steps keep their declared dependencies on earlier steps, or
+      depend on the previous step when none were declared.
+    Only earlier steps can be dependencies, so the graph is acyclic.
+    """
+    result = []
+    for i, title in enumerate(steps):
+        if i == 0:
+            deps = []
+        elif i == 1:
+            deps = [0]
+        elif i == len(steps) - 1 or _agent_for_step_or_none(title) != "research_agent":
+            deps = list(range(i))
+        elif depends_on[i] is None:
+            deps = [i - 1]
+        else:
+            deps = sorted({d for d in depends_on[i] if 0 <= d < i})
+        result.append(deps)
+    return result
+
 
-    return steps
+def _agent_for_step_or_none(step_title: str) -> Optional[str]:
+    try:
+        return _agent_for_step(step_title)
+    except ValueError:
+        return None
 
 
-def executor_agent_step(step_title: str, history: list, prompt: str):
+def _agent_for_step(step_title: str) -> str:
+    step_lower = step_title.lower()
+    if "research" in step_lower:
+        return "research_agent"
+    elif "draft" in step_lower or "write" in step_lower:
+        return "writer_agent"
+    elif "revise" in step_lower or "edit" in step_lower or "feedback" in step_lower:
+        return "editor_agent"
+    raise ValueError(f"Unknown step type: {step_title}")
+
+
+def executor_agent_step(
+    step_title: str,
+    history: list,
+    prompt: str,
+    context_builder: Optional[ContextBuilder] = None,
+    on_delta: Optional[Callable[[str], None]] = None,
+    history_indices: Optional[List[int]] = None,
+):
     """
     Executes a step of the executor agent.
+    Pass the task's `context_builder` so step summaries are reused across
+    steps and its token savings are accumulated. With `on_delta`, writer and
+    editor steps stream their output to it as it is generated.
+    `history_indices` are the plan indices of the `history` entries, so the
+    context labels them "Step N" as in the plan.
     Returns:
         - step_title (str)
         - agent_name (str)
         - output (str)
     """
 
-    # Construir contexto enriquecido estructurado
-    context = f"📘 User Prompt:\n{prompt}\n\n📜 History so far:\n"
-    for i, (desc, agent, output) in enumerate(history):
-        if "draft" in desc.lower() or agent == "writer_agent":
-            context += f"\n✍️ Draft (Step {i + 1}):\n{output.strip()}\n"
-        elif "feedback" in desc.lower() or agent == "editor_agent":
-            context += f"\n🧠 Feedback (Step {i + 1}):\n{output.strip()}\n"
-        elif "research" in desc.lower() or agent == "research_agent":
-            context += f"\n🔍 Research (Step {i + 1}):\n{output.strip()}\n"
-        else:
-            context += f"\n🧩 Other (Step {i + 1}) by {agent}:\n{output.strip()}\n"
+    # Seleccionar agente basado en el paso
+    agent_name = _agent_for_step(step_title)
+
+    # Construir contexto enriquecido estructurado, dentro del presupuesto de tokens
+    if context_builder is None:
+        context_builder = ContextBuilder()
+    context = context_builder.build(history, prompt, step_title, agent_name, history_indices)
 
     enriched_task = f"""{context}
 
@@ -160,17 +273,12 @@ def executor_agent_step(step_title: str, history: list, prompt: str):
 {step_title}
 """
 
-    # Seleccionar agente basado en el paso
-    step_lower = step_title.lower()
-    if "research" in step_lower:
-        content, _ = research_agent(prompt=enriched_task)
-        print("🔍 Research Agent Output:", content)
-        return step_title, "research_agent", content
-    elif "draft" in step_lower or "write" in step_lower:
-        content, _ = writer_agent(prompt=enriched_task)
-        return step_title, "writer_agent", content
-    elif "revise" in step_lower or "edit" in step_lower or "feedback" in step_lower:
-        content, _ = editor_agent(prompt=enriched_task)
-        return step_title, "editor_agent", content
-    else:
-        raise ValueError(f"Unknown step type: {step_title}")
+    with span("step", agent_name):
+        if agent_name == "research_agent":
+            content, _ = research_agent(prompt=enriched_task)
+            logger.debug("🔍 Research Agent Output: %s", content)
+        elif agent_name == "writer_agent":
+            content, _ = writer_agent(prompt=enriched_task, on_delta=on_delta)
+        else:
+            content, _ = editor_agent(prompt=enriched_task, on_delta=on_delta)
+    return step_title, agent_name, content
@@ -0,0 +1,489 @@
+import os
+import json
+import time
+import threading
+from abc import ABC, abstractmethod
+from bisect import bisect_right
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+from sqlalchemy import (
+    create_engine,
+    MetaData,
+    Table,
+    Column,
+    String,
+    Text,
+    Float,
+    Integer,
+    select,
+    delete,
+    update,
+    func,
+    inspect,
+)
+
+from src.database import prepare_schema, schema_mode
+
+TERMINAL_STATUSES = ("done", "error", "cancelled", "timed_out")
+
+
+def _substep_versions(previous: List[int], count: int, version: int) -> List[int]:
+    """Substeps are append-only: new ones get `version`, older keep theirs."""
+    if count < len(previous):
+        return [version] * count
+    return previous + [version] * (count - len(previous))
+
+
+def _step_change(index: int, blob: str, substep_versions: List[int], since: int) -> Dict:
+    """A changed step carrying only the substeps added after `since`."""
+    step = json.loads(blob)
+    known = bisect_right(substep_versions, since)
+    step["substeps"] = step.get("substeps", [])[known:]
+    return {"index": index, "step": step, "substeps_from": known}
+
+
+class ProgressStore(ABC):
+    """
+    Live progress of tasks: a status, the list of plan steps and a few extra
+    fields (cache / token counters). Writers update one step at a time;
+    `get()` returns a detached `{"status", "steps", "version", ...}` dict.
+
+    Every write bumps the task's `version`; steps and substeps remember the
+    version that last changed them, so `get_since(task_id, v)` returns only
+    what a client holding version `v` is missing.
+
+    Running tasks expire after `ttl_seconds` (a crashed worker never
+    finishes them); finished ones after `finished_ttl_seconds`, since the
+    final result lives in the tasks table.
+    """
+
+    # True when other processes write to the same store, so waiting readers
+    # cannot rely on this process's events alone
+    shared = False
+
+    def __init__(self, ttl_seconds: float = 6 * 3600, finished_ttl_seconds: float = 600):
+        self.ttl_seconds = ttl_seconds
+        self.finished_ttl_seconds = finished_ttl_seconds
+
+    @abstractmethod
+    def create(self, task_id: str, status: str = "planning") -> None:
+        ...
+
+    @abstractmethod
+    def set_status(self, task_id: str, status: str) -> None:
+        ...
+
+    @abstractmethod
+    def set_fields(self, task_id: str, **fields) -> None:
+        ...
+
+    @abstractmethod
+    def set_steps(self, task_id: str, steps: List[Dict]) -> None:
+        ...
+
+    @abstractmethod
+    def update_step(self, task_id: str, index: int, step: Dict) -> None:
+        ...
+
+    @abstractmethod
+    def get(self, task_id: str) -> Optional[Dict]:
+        ...
+
+    @abstractmethod
+    def get_since(self, task_id: str, since: int) -> Optional[Dict]:
+        """
+        Status, fields, `version` and `step_count`, plus `changes`: the steps
+        changed after version `since` as `{index, step, substeps_from}`, where
+        `step["substeps"]` holds only the substeps from `substeps_from` on.
+        Unknown versions (0, or newer than the task's) get a full snapshot
+        with `full: true` instead.
+        """
+
+    @abstractmethod
+    def delete(self, task_id: str) -> None:
+        ...
+
+    def stats(self) -> Dict:
+        return {}
+
+    def _expiry(self, status: str) -> float:
+        ttl = self.finished_ttl_seconds if status in TERMINAL_STATUSES else self.ttl_seconds
+        return time.time() + ttl
+
+
+class MemoryProgressStore(ProgressStore):
+    """Per-process store: LRU-capped at `max_tasks`, entries expire by TTL."""
+
+    def __init__(self, max_tasks: int = 1000, **kwargs):
+        super().__init__(**kwargs)
+        self.max_tasks = max_tasks
+        self._data: "OrderedDict[str, Dict]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._evictions = 0
+
+    def _entry(self, task_id: str) -> Optional[Dict]:
+        entry = self._data.get(task_id)
+        if entry is None:
+            return None
+        if entry["expires_at"] <= time.time():
+            del self._data[task_id]
+            self._evictions += 1
+            return None
+        self._data.move_to_end(task_id)
+        return entry
+
+    def create(self, task_id: str, status: str = "planning") -> None:
+        with self._lock:
+            self._data[task_id] = {
+                "status": status,
+                "steps": [],
+                "fields": {},
+                "version": 1,
+                "step_versions": [],
+                "substep_versions": [],
+                "expires_at": self._expiry(status),
+            }
+            self._data.move_to_end(task_id)
+            while len(self._data) > self.max_tasks:
+                self._data.popitem(last=False)
+                self._evictions += 1
+
+    def set_status(self, task_id: str, status: str) -> None:
+        with self._lock:
+            entry = self._entry(task_id)
+            if entry is not None:
+                entry["status"] = status
+                entry["expires_at"] = self._expiry(status)
+                entry["version"] += 1
+
+    def set_fields(self, task_id: str, **fields) -> None:
+        # values are stored serialized, like the SQL backend, so later
+        # mutations by the caller do not leak into readers
+        with self._lock:
+            entry = self._entry(task_id)
+            if entry is not None:
+                for k, v in fields.items():
+                    entry["fields"][k] = json.dumps(v, default=str)
+                entry["version"] += 1
+
+    def set_steps(self, task_id: str, steps: List[Dict]) -> None:
+        with self._lock:
+            entry = self._entry(task_id)
+            if entry is not None:
+                entry["version"] += 1
+                version = entry["version"]
+                entry["steps"] = [json.dumps(s, default=str) for s in steps]
+                entry["step_versions"] = [version] * len(steps)
+                entry["substep_versions"] = [
+                    [version] * len(s.get("substeps", [])) for s in steps
+                ]
+
+    def update_step(self, task_id: str, index: int, step: Dict) -> None:
+        blob = json.dumps(step, default=str)
+        with self._lock:
+            entry = self._entry(task_id)
+            if entry is not None and 0 <= index < len(entry["steps"]):
+                entry["version"] += 1
+                version = entry["version"]
+                entry["steps"][index] = blob
+                entry["step_versions"][index] = version
+                entry["substep_versions"][index] = _substep_versions(
+                    entry["substep_versions"][index], len(step.get("substeps", [])), version
+                )
+
+    def get(self, task_id: str) -> Optional[Dict]:
+        with self._lock:
+            entry = self._entry(task_id)
+            if entry is None:
+                return None
+            status, steps, fields = entry["status"], list(entry["steps"]), dict(entry["fields"])
+            version = entry["version"]
+        out = {k: json.loads(v) for k, v in fields.items()}
+        out.update(status=status, version=version, steps=[json.loads(s) for s in steps])
+        return out
+
+    def get_since(self, task_id: str, since: int) -> Optional[Dict]:
+        with self._lock:
+            entry = self._entry(task_id)
+            if entry is None:
+                return None
+            version = entry["version"]
+            if since <= 0 or since > version:
+                changed = None
+            else:
+                changed = [
+                    (i, blob, list(entry["substep_versions"][i]))
+                    for i, blob in enumerate(entry["steps"])
+                    if entry["step_versions"][i] > since
+                ]
+            status, fields, step_count = entry["status"], dict(entry["fields"]), len(entry["steps"])
+        if changed is None:
+            out = self.get(task_id)
+            if out is not None:
+                out.update(full=True, step_count=len(out["steps"]))
+            return out
+        out = {k: json.loads(v) for k, v in fields.items()}
+        out.update(
+            status=status,
+            version=version,
+            step_count=step_count,
+            full=False,
+            changes=[_step_change(i, blob, sv, since) for i, blob, sv in changed],
+        )
+        return out
+
+    def delete(self, task_id: str) -> None:
+        with self._lock:
+            self._data.pop(task_id, None)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "backend": "memory",
+                "tasks": len(self._data),
+                "max_tasks": self.max_tasks,
+                "evictions": self._evictions,
+            }
+
+
+class SQLProgressStore(ProgressStore):
+    """
+    SQLAlchemy-backed store (Postgres in production) shared by every uvicorn
+    worker. One row per task plus one row per step, so a step update writes
+    only that step; expired rows are purged every `purge_every` writes.
+    """
+
+    shared = True
+
+    def __init__(self, url: str, purge_every: int = 100, **kwargs):
+        super().__init__(**kwargs)
+        connect_args = {"check_same_thread": False} if url.startswith("sqlite") else {}
+        self.engine = create_engine(
+            url, future=True, pool_pre_ping=True, connect_args=connect_args
+        )
+        metadata = MetaData()
+        self.tasks = Table(
+            "task_progress",
+            metadata,
+            Column("task_id", String, primary_key=True),
+            Column("status", String),
+            Column("fields", Text, default="{}"),
+            Column("step_count", Integer, default=0),
+            Column("version", Integer, default=1),
+            Column("expires_at", Float, index=True),
+        )
+        self.steps = Table(
+            "task_progress_steps",
+            metadata,
+            Column("task_id", String, primary_key=True),
+            Column("idx", Integer, primary_key=True),
+            Column("data", Text),
+            Column("version", Integer, default=0),
+            Column("substep_versions", Text, default="[]"),
+        )
+        # tables are created / migrated only as DB_SCHEMA allows; live
+        # progress from before versioning is just rebuilt
+        mode = schema_mode()
+        existing = inspect(self.engine)
+        if mode == "create" and existing.has_table("task_progress") and "version" not in {
+            c["name"] for c in existing.get_columns("task_progress")
+        }:
+            mode = "reset"
+        with self.engine.begin() as conn:
+            prepare_schema(conn, metadata, mode)
+        self.purge_every = purge_every
+        self._writes = 0
+        self._lock = threading.Lock()
+
+    def _wrote(self):
+        with self._lock:
+            self._writes += 1
+            purge = self._writes % self.purge_every == 0
+        if purge:
+            self.purge()
+
+    def purge(self) -> int:
+        t, s = self.tasks, self.steps
+        with self.engine.begin() as conn:
+            expired = select(t.c.task_id).where(t.c.expires_at < time.time())
+            conn.execute(delete(s).where(s.c.task_id.in_(expired.scalar_subquery())))
+            return conn.execute(delete(t).where(t.c.expires_at < time.time())).rowcount
+
+    def create(self, task_id: str, status: str = "planning") -> None:
+        t = self.tasks
+        with self.engine.begin() as conn:
+            conn.execute(delete(self.steps).where(self.steps.c.task_id == task_id))
+            conn.execute(delete(t).where(t.c.task_id == task_id))
+            conn.execute(
+                t.insert().values(
+                    task_id=task_id,
+                    status=status,
+                    fields="{}",
+                    step_count=0,
+                    version=1,
+                    expires_at=self._expiry(status),
+                )
+            )
+        self._wrote()
+
+    def set_status(self, task_id: str, status: str) -> None:
+        t = self.tasks
+        with self.engine.begin() as conn:
+            conn.execute(
+                update(t)
+                .where(t.c.task_id == task_id)
+                .values(
+                    status=status,
+                    expires_at=self._expiry(status),
+                    version=t.c.version + 1,
+                )
+            )
+
+    def set_fields(self, task_id: str, **fields) -> None:
+        t = self.tasks
+        with self.engine.begin() as conn:
+            # the row lock keeps concurrent writers of one task from losing keys
+            query = select(t.c.fields).where(t.c.task_id == task_id)
+            if conn.dialect.name != "sqlite":
+                query = query.with_for_update()
+            current = conn.execute(query).scalar()
+            if current is None:
+                return
+            merged = {**json.loads(current), **fields}
+            conn.execute(
+                update(t)
+                .where(t.c.task_id == task_id)
+                .values(fields=json.dumps(merged, default=str), version=t.c.version + 1)
+            )
+
+    def _bump(self, conn, task_id: str, **values) -> Optional[int]:
+        """Increments the task version (row-locking it) and returns the new one."""
+        t = self.tasks
+        conn.execute(
+            update(t).where(t.c.task_id == task_id).values(version=t.c.version + 1, **values)
+        )
+        return conn.execute(select(t.c.version).where(t.c.task_id == task_id)).scalar()
+
+    def set_steps(self, task_id: str, steps: List[Dict]) -> None:
+        s = self.steps
+        with self.engine.begin() as conn:
+            version = self._bump(conn, task_id, step_count=len(steps))
+            conn.execute(delete(s).where(s.c.task_id == task_id))
+            if steps and version is not None:
+                conn.execute(
+                    s.insert(),
+                    [
+                        {
+                            "task_id": task_id,
+                            "idx": i,
+                            "data": json.dumps(step, default=str),
+                            "version": version,
+                            "substep_versions": json.dumps(
+                                [version] * len(step.get("substeps", []))
+                            ),
+                        }
+                        for i, step in enumerate(steps)
+                    ],
+                )
+        self._wrote()
+
+    def update_step(self, task_id: str, index: int, step: Dict) -> None:
+        s = self.steps
+        blob = json.dumps(step, default=str)
+        with self.engine.begin() as conn:
+            version = self._bump(conn, task_id)
+            previous = conn.execute(
+                select(s.c.substep_versions).where(s.c.task_id == task_id, s.c.idx == index)
+            ).scalar()
+            if version is not None and previous is not None:
+                substep_versions = _substep_versions(
+                    json.loads(previous), len(step.get("substeps", [])), version
+                )
+                conn.execute(
+                    update(s)
+                    .where(s.c.task_id == task_id, s.c.idx == index)
+                    .values(
+                        data=blob,
+                        version=version,
+                        substep_versions=json.dumps(substep_versions),
+                    )
+                )
+        self._wrote()
+
+    def get(self, task_id: str) -> Optional[Dict]:
+        t, s = self.tasks, self.steps
+        # one transaction, so the status and the steps are read together
+        with self.engine.begin() as conn:
+            row = conn.execute(
+                select(t.c.status, t.c.fields, t.c.version, t.c.expires_at).where(
+                    t.c.task_id == task_id
+                )
+            ).first()
+            if row is None or row.expires_at < time.time():
+                return None
+            steps = conn.execute(
+                select(s.c.data).where(s.c.task_id == task_id).order_by(s.c.idx)
+            ).scalars().all()
+        out = json.loads(row.fields or "{}")
+        out.update(status=row.status, version=row.version, steps=[json.loads(d) for d in steps])
+        return out
+
+    def get_since(self, task_id: str, since: int) -> Optional[Dict]:
+        t, s = self.tasks, self.steps
+        with self.engine.begin() as conn:
+            row = conn.execute(
+                select(
+                    t.c.status, t.c.fields, t.c.version, t.c.step_count, t.c.expires_at
+                ).where(t.c.task_id == task_id)
+            ).first()
+            if row is None or row.expires_at < time.time():
+                return None
+            full = since <= 0 or since > row.version
+            query = select(s.c.idx, s.c.data, s.c.substep_versions).where(
+                s.c.task_id == task_id
+            )
+            if not full:
+                query = query.where(s.c.version > since)
+            steps = conn.execute(query.order_by(s.c.idx)).all()
+        out = json.loads(row.fields or "{}")
+        out.update(status=row.status, version=row.version, step_count=row.step_count, full=full)
+        if full:
+            out["steps"] = [json.loads(r.data) for r in steps]
+        else:
+            out["changes"] = [
+                _step_change(r.idx, r.data, json.loads(r.substep_versions or "[]"), since)
+                for r in steps
+            ]
+        return out
+
+    def delete(self, task_id: str) -> None:
+        with self.engine.begin() as conn:
+            conn.execute(delete(self.steps).where(self.steps.c.task_id == task_id))
+            conn.execute(delete(self.tasks).where(self.tasks.c.task_id == task_id))
+
+    def stats(self) -> Dict:
+        with self.engine.connect() as conn:
+            tasks = conn.execute(select(func.count()).select_from(self.tasks)).scalar()
+        return {"backend": self.engine.dialect.name, "tasks": tasks}
+
+
+def build_progress_store(database_url: Optional[str] = None) -> ProgressStore:
+    """
+    Backend from env: PROGRESS_STORE_URL is "memory" (default, one process),
+    "database" (the app's DATABASE_URL) or any SQLAlchemy URL.
+    """
+    url = os.getenv("PROGRESS_STORE_URL", "memory")
+    ttls = dict(
+        ttl_seconds=float(os.getenv("PROGRESS_TTL_SECONDS", str(6 * 3600))),
+        finished_ttl_seconds=float(os.getenv("PROGRESS_FINISHED_TTL_SECONDS", "600")),
+    )
+    if url.lower() in ("", "memory"):
+        return MemoryProgressStore(
+            max_tasks=int(os.getenv("PROGRESS_MAX_TASKS", "1000")), **ttls
+        )
+    if url.lower() == "database":
+        url = database_url or os.getenv("DATABASE_URL", "")
+    if url.startswith("postgres://"):
+        url = url.replace("postgres://", "postgresql://", 1)
+    return SQLProgressStore(url, **ttls)
@@ -1,45 +1,37 @@
-from typing import List, Dict
-import requests
+import logging
+import os
+import re
+import time
+import tempfile
+import threading
+import contextvars
+import multiprocessing
 import xml.etree.ElementTree as ET
-from typing import List, Dict, Optional
-import os, re, tempfile
-import requests
-from pdfminer.high_level import extract_text
-
-session = requests.Session()
-session.headers.update(
-    {"User-Agent": "LF-ADP-Agent/1.0 (mailto:your.email@example.com)"}
-)
-
-## -----
+from difflib import SequenceMatcher
+from typing import List, Dict, Optional, Tuple
+from urllib.parse import urlparse
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 
-from typing import List, Dict, Optional
-import os, re, time, tempfile
 import requests
-import xml.etree.ElementTree as ET
-
-# ----- Session with retries & headers -----
+from dotenv import load_dotenv
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
 
-from typing import List, Dict, Optional
-import os, re, time
-import requests
-import xml.etree.ElementTree as ET
-from io import BytesIO
+from src.arxiv_cache import arxiv_cache, arxiv_cache_key
+from src.cache_utils import TTLCache, SingleFlight
+from src.cancellation import cancellable_timeout, check_cancelled
+from src.local_corpus import local_corpus
+from src.metrics import span, timed
+from src.pdf_extract import clean_text, pdf_bytes_to_text, extract_clean_text
 
+logger = logging.getLogger(__name__)
 
-from typing import List, Dict, Optional
-import os, re, time
-import requests
-import xml.etree.ElementTree as ET
-from io import BytesIO
+# Heavy tool SDKs (tavily) and PDF parsers (PyMuPDF / pdfminer, in
+# src.pdf_extract) are imported on first use, so importing this module
+# stays cheap for the web server.
 
 # ----- Session with retries & headers -----
-from requests.adapters import HTTPAdapter
-from urllib3.util.retry import Retry
-
-
 def _build_session(
     user_agent: str = "LF-ADP-Agent/1.0 (mailto:your.email@example.com)",
 ) -> requests.Session:
@@ -72,6 +64,36 @@ def _build_session(
 session = _build_session()
 
 
+ARXIV_API_URL = os.getenv("ARXIV_API_URL", "https://export.arxiv.org/api/query")
+
+# Hosts the tools talk to; warm_connections() opens pooled connections to them
+WARM_URLS = {
+    "arxiv": ARXIV_API_URL,
+    "wikipedia": os.getenv("WIKIPEDIA_API_URL", "https://en.wikipedia.org/w/api.php"),
+}
+
+
+def warm_connections(timeout: float = 3.0) -> Dict[str, str]:
+    """
+    Establishes (TLS) keep-alive connections of the shared `session` to the
+    tool hosts and builds the Tavily client, so the first research step does
+    not pay for them. Returns the outcome per target.
+    """
+    out = {}
+    for name, url in WARM_URLS.items():
+        try:
+            session.head(url, timeout=timeout, allow_redirects=False)
+            out[name] = "ok"
+        except requests.RequestException as e:
+            out[name] = f"failed: {e.__class__.__name__}"
+    try:
+        _get_tavily_client()
+        out["tavily"] = "ok"
+    except Exception as e:
+        out["tavily"] = f"skipped: {e}"
+    return out
+
+
 # ----- Utilities -----
 # just to make sure that it is of pdf url
 def ensure_pdf_url(abs_or_pdf_url: str) -> str:
@@ -85,56 +107,32 @@ def ensure_pdf_url(abs_or_pdf_url: str) -> str:
 
 # extension
 def _safe_filename(name: str) -> str:
-    import re
-
     name = re.sub(r"[^A-Za-z0-9._-]+", "_", name)
     if not name.lower().endswith(".pdf"):
         name += ".pdf"
     return name
 
-#when doing web pages scraping
-def clean_text(s: str) -> str:
-    #remove soft hyphens and line breaks
-    s = re.sub(r"-\n", "", s)  # "transfor-\nmers" -> "transformers"
-    
-    s = re.sub(r"\r\n|\r", "\n", s)  # normaliza saltos
-    s = re.sub(r"[ \t]+", " ", s)  # colapsa espacios
-    # limit vertical white spaces
-    s = re.sub(r"\n{3,}", "\n\n", s)  # no más de 1 línea en blanco seguida
-    return s.strip()
-
-# 
 def fetch_pdf_bytes(pdf_url: str, timeout: int = 90) -> bytes:
-    r = session.get(pdf_url, timeout=timeout, allow_redirects=True)
+    r = session.get(pdf_url, timeout=cancellable_timeout(timeout), allow_redirects=True)
     r.raise_for_status()
     return r.content
 
 
-def pdf_bytes_to_text(pdf_bytes: bytes, max_pages: Optional[int] = None) -> str:
-    # 1) PyMuPDF
-    try:
-        import fitz  # PyMuPDF
-
-        out = []
-        with fitz.open(stream=pdf_bytes, filetype="pdf") as doc:
-            n = len(doc)
-            limit = n if max_pages is None else min(max_pages, n)
-            for i in range(limit):
-                out.append(doc.load_page(i).get_text("text"))
-        return "\n".join(out)
-    except Exception:
-        pass
-
-    # 2) pdfminer.six
-    try:
-        from pdfminer.high_level import extract_text_to_fp
-
-        buf_in = BytesIO(pdf_bytes)
-        buf_out = BytesIO()
-        extract_text_to_fp(buf_in, buf_out)
-        return buf_out.getvalue().decode("utf-8", errors="ignore")
-    except Exception as e:
-        raise RuntimeError(f"PDF text extraction failed: {e}")
+def fetch_pdf_to_file(pdf_url: str, fp, timeout: int = 90, chunk_size: int = 1 << 16) -> int:
+    """
+    Streams a PDF into the open binary file `fp`; returns the byte count.
+    A cancelled task stops the download between chunks.
+    """
+    written = 0
+    with session.get(
+        pdf_url, timeout=cancellable_timeout(timeout), allow_redirects=True, stream=True
+    ) as r:
+        r.raise_for_status()
+        for chunk in r.iter_content(chunk_size=chunk_size):
+            check_cancelled()
+            fp.write(chunk)
+            written += len(chunk)
+    return written
 
 
 def maybe_save_pdf(pdf_bytes: bytes, dest_dir: str, filename: str) -> str:
@@ -146,14 +144,236 @@ def maybe_save_pdf(pdf_bytes: bytes, dest_dir: str, filename: str) -> str:
 
 
 # ----- arXiv search -----
-from typing import List, Dict
-import time, requests, xml.etree.ElementTree as ET
-from io import BytesIO
-
 # session = _build_session()
 # ensure_pdf_url(), clean_text(), fetch_pdf_bytes(), pdf_bytes_to_text(), maybe_save_pdf()
 
 
+class _HostRateLimiter:
+    """
+    Polite per-host limiter: at most `max_concurrent` requests in flight per
+    host, and request starts spaced at least `min_interval` seconds apart.
+    The defaults follow arXiv's API guidance (one request at a time, 3 s
+    apart). Waiting for a slot stops as soon as the task is cancelled.
+    """
+
+    def __init__(self, min_interval: float = 3.0, max_concurrent: int = 1):
+        self.min_interval = min_interval
+        self.max_concurrent = max_concurrent
+        self._lock = threading.Lock()
+        self._next_slot = {}
+        self._semaphores = {}
+
+    def _semaphore(self, host: str) -> threading.BoundedSemaphore:
+        with self._lock:
+            if host not in self._semaphores:
+                self._semaphores[host] = threading.BoundedSemaphore(
+                    self.max_concurrent
+                )
+            return self._semaphores[host]
+
+    def acquire(self, url: str) -> str:
+        host = urlparse(url).netloc
+        semaphore = self._semaphore(host)
+        while not semaphore.acquire(timeout=0.1):
+            check_cancelled()
+        try:
+            # reserve the next start slot for this host, then sleep until it
+            with self._lock:
+                now = time.monotonic()
+                slot = max(now, self._next_slot.get(host, now))
+                self._next_slot[host] = slot + self.min_interval
+            while True:
+                check_cancelled()
+                delay = slot - time.monotonic()
+                if delay <= 0:
+                    break
+                time.sleep(min(delay, 0.1))
+        except BaseException:
+            semaphore.release()
+            raise
+        return host
+
+    def release(self, host: str) -> None:
+        self._semaphore(host).release()
+
+
+# API queries (export.arxiv.org) follow arXiv's API guidance; PDF downloads
+# (arxiv.org) of one search may overlap, lightly spaced
+_api_limiter = _HostRateLimiter(
+    min_interval=float(os.getenv("ARXIV_API_MIN_INTERVAL_SECONDS", "3")),
+    max_concurrent=int(os.getenv("ARXIV_API_MAX_CONCURRENT", "1")),
+)
+_pdf_limiter = _HostRateLimiter(
+    min_interval=float(os.getenv("ARXIV_PDF_MIN_INTERVAL_SECONDS", "0.5")),
+    max_concurrent=int(os.getenv("ARXIV_PDF_MAX_CONCURRENT", "3")),
+)
+
+# I/O-bound per-entry pipelines (download -> extract) run on threads ...
+_arxiv_fetch_pool = ThreadPoolExecutor(
+    max_workers=int(os.getenv("ARXIV_FETCH_WORKERS", "8")),
+    thread_name_prefix="arxiv-fetch",
+)
+
+# ... while CPU-bound PDF extraction goes to worker processes, off the GIL.
+# "spawn" because the server is multi-threaded; 0 workers extracts inline.
+_EXTRACT_WORKERS = int(os.getenv("ARXIV_EXTRACT_WORKERS", str(min(4, os.cpu_count() or 1))))
+_extract_pool = None
+_extract_pool_lock = threading.Lock()
+
+
+def _get_extract_pool():
+    global _extract_pool
+    if _EXTRACT_WORKERS <= 0:
+        return None
+    with _extract_pool_lock:
+        if _extract_pool is None:
+            _extract_pool = ProcessPoolExecutor(
+                max_workers=_EXTRACT_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _extract_pool
+
+
+@timed("arxiv", "extract")
+def _extract_text(pdf_path: str, max_pages: int, max_chars: Optional[int]) -> str:
+    # workers get the file path, not the bytes: nothing large is pickled
+    global _extract_pool
+    pool = _get_extract_pool()
+    if pool is None:
+        return extract_clean_text(pdf_path, max_pages, max_chars)
+    try:
+        return pool.submit(extract_clean_text, pdf_path, max_pages, max_chars).result()
+    except BrokenProcessPool:
+        # a worker died (e.g. OOM on a huge PDF): rebuild next time, do this one inline
+        with _extract_pool_lock:
+            _extract_pool = None
+        return extract_clean_text(pdf_path, max_pages, max_chars)
+
+
+def _fetch_pdf_limited(pdf_url: str, fp, timeout: int = 90) -> int:
+    host = _pdf_limiter.acquire(pdf_url)
+    try:
+        # the rate-limit wait may have outlived the task
+        check_cancelled()
+        with span("arxiv", "download"):
+            return fetch_pdf_to_file(pdf_url, fp, timeout=timeout)
+    finally:
+        _pdf_limiter.release(host)
+
+
+def _arxiv_entry_text(
+    item: Dict,
+    fetch_pdf: bool,
+    extract: bool,
+    max_pages: int,
+    max_chars: Optional[int],
+) -> Optional[str]:
+    """
+    Download + extraction pipeline for one Atom entry (runs on the fetch
+    pool). The PDF is streamed to disk (the cache, or a temp file) and
+    extracted page by page from there until `max_chars` is reached.
+    Returns the cleaned text, or None; errors are recorded on `item`.
+    """
+    check_cancelled()
+    link_pdf = item.get("link_pdf")
+    # Cached text skips both the download and the extraction
+    cache_key = arxiv_cache_key(item.get("url", ""))
+    text_variant = f"p{max_pages}" + (f"c{max_chars}" if max_chars else "")
+    if extract and cache_key:
+        text = arxiv_cache.get_text(cache_key, text_variant)
+        if text is not None:
+            return text
+
+    pdf_path = None
+    tmp_path = None
+    # the finally below also removes the temp file when a cancel
+    # (TaskCancelled, a BaseException) interrupts the download
+    try:
+        if (fetch_pdf or extract) and link_pdf:
+            if cache_key:
+                pdf_path = arxiv_cache.pdf_path(cache_key)
+            if pdf_path is None:
+                try:
+                    if cache_key:
+                        pdf_path = arxiv_cache.put_pdf_stream(
+                            cache_key, lambda f: _fetch_pdf_limited(link_pdf, f, timeout=90)
+                        )
+                    else:
+                        with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as f:
+                            tmp_path = f.name
+                            _fetch_pdf_limited(link_pdf, f, timeout=90)
+                        pdf_path = tmp_path
+                except Exception as e:
+                    pdf_path = None
+                    item["pdf_error"] = f"PDF fetch failed: {e}"
+
+        if not (extract and pdf_path):
+            return None
+        check_cancelled()
+        text = _extract_text(pdf_path, max_pages, max_chars)
+        if cache_key:
+            arxiv_cache.put_text(cache_key, text_variant, text)
+        return text
+    except Exception as e:
+        item["text_error"] = f"Text extraction failed: {e}"
+        return None
+    finally:
+        if tmp_path:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+
+
+_ATOM_NS = {"atom": "http://www.w3.org/2005/Atom", "arxiv": "http://arxiv.org/schemas/atom"}
+
+
+def _parse_atom_entries(content: bytes) -> List[Tuple[Dict, Optional[str]]]:
+    """(item, doi) per Atom entry of an arXiv API response, in ranking order."""
+    root = ET.fromstring(content)
+    ns = _ATOM_NS
+    out = []
+    for entry in root.findall("atom:entry", ns):
+        title = (
+            entry.findtext("atom:title", default="", namespaces=ns) or ""
+        ).strip()
+        published = (
+            entry.findtext("atom:published", default="", namespaces=ns) or ""
+        )[:10]
+        url_abs = entry.findtext("atom:id", default="", namespaces=ns) or ""
+        # original abstract
+        abstract_summary = (
+            entry.findtext("atom:summary", default="", namespaces=ns) or ""
+        ).strip()
+
+        authors = []
+        for a in entry.findall("atom:author", ns):
+            nm = a.findtext("atom:name", default="", namespaces=ns)
+            if nm:
+                authors.append(nm)
+
+        link_pdf = None
+        for link in entry.findall("atom:link", ns):
+            if link.attrib.get("title") == "pdf":
+                link_pdf = link.attrib.get("href")
+                break
+        if not link_pdf and url_abs:
+            link_pdf = ensure_pdf_url(url_abs)
+
+        item = {
+            "title": title,
+            "authors": authors,
+            "published": published,
+            "url": url_abs,
+            "summary": abstract_summary,
+            "link_pdf": link_pdf,
+        }
+        doi = (entry.findtext("arxiv:doi", default="", namespaces=ns) or "").strip()
+        out.append((item, doi or None))
+    return out
+
+
+@timed("tool")
 def arxiv_search_tool(
     query: str,
     max_results: int = 3,
@@ -168,85 +388,45 @@ def arxiv_search_tool(
     _MAX_PAGES = 6
     _TEXT_CHARS = 5000
     _SAVE_FULL_TEXT = False
-    _SLEEP_SECONDS = 1.0
     # ==========================
 
-    api_url = (
-        "https://export.arxiv.org/api/query"
-        f"?search_query=all:{requests.utils.quote(query)}&start=0&max_results={max_results}"
-    )
-
-    out: List[Dict] = []
+    check_cancelled()
+    params = {"search_query": f"all:{query}", "start": 0, "max_results": max_results}
     try:
-        resp = session.get(api_url, timeout=60)
-        resp.raise_for_status()
+        # rate-limited like every other arXiv API call
+        entries = _arxiv_api(params)
     except requests.exceptions.RequestException as e:
         return [{"error": f"arXiv API request failed: {e}"}]
+    except ET.ParseError as e:
+        return [{"error": f"arXiv API XML parse failed: {e}"}]
 
     try:
-        root = ET.fromstring(resp.content)
-        ns = {"atom": "http://www.w3.org/2005/Atom"}
-
-        for entry in root.findall("atom:entry", ns):
-            title = (
-                entry.findtext("atom:title", default="", namespaces=ns) or ""
-            ).strip()
-            published = (
-                entry.findtext("atom:published", default="", namespaces=ns) or ""
-            )[:10]
-            url_abs = entry.findtext("atom:id", default="", namespaces=ns) or ""
-            # original abstract
-            abstract_summary = (
-                entry.findtext("atom:summary", default="", namespaces=ns) or ""
-            ).strip()
-
-            authors = []
-            for a in entry.findall("atom:author", ns):
-                nm = a.findtext("atom:name", default="", namespaces=ns)
-                if nm:
-                    authors.append(nm)
-
-            link_pdf = None
-            for link in entry.findall("atom:link", ns):
-                if link.attrib.get("title") == "pdf":
-                    link_pdf = link.attrib.get("href")
-                    break
-            if not link_pdf and url_abs:
-                link_pdf = ensure_pdf_url(url_abs)
-
-            item = {
-                "title": title,
-                "authors": authors,
-                "published": published,
-                "url": url_abs,
-                "summary": abstract_summary,
-                "link_pdf": link_pdf,
-            }
-
-            pdf_bytes = None
-            if (_INCLUDE_PDF or _EXTRACT_TEXT) and link_pdf:
-                try:
-                    pdf_bytes = fetch_pdf_bytes(link_pdf, timeout=90)
-                    time.sleep(_SLEEP_SECONDS)
-                except Exception as e:
-                    item["pdf_error"] = f"PDF fetch failed: {e}"
-
-            if _EXTRACT_TEXT and pdf_bytes:
-                try:
-                    text = pdf_bytes_to_text(pdf_bytes, max_pages=_MAX_PAGES)
-                    text = clean_text(text) if text else ""
-                    if text:
-                        if _SAVE_FULL_TEXT:
-                            item["summary"] = text
-                        else:
-                            item["summary"] = text[:_TEXT_CHARS]
-                except Exception as e:
-                    item["text_error"] = f"Text extraction failed: {e}"
-
-            out.append(item)
+        out = [item for item, _ in entries]
+
+        # Per-entry download/extraction runs concurrently; results are
+        # collected in the original ranking order.
+        # Extraction stops at the character budget unless full text is kept.
+        max_chars = None if _SAVE_FULL_TEXT else _TEXT_CHARS
+        # each entry runs in a copy of this context, so its spans count
+        # towards the calling task
+        futures = [
+            _arxiv_fetch_pool.submit(
+                contextvars.copy_context().run,
+                _arxiv_entry_text,
+                item,
+                _INCLUDE_PDF,
+                _EXTRACT_TEXT,
+                _MAX_PAGES,
+                max_chars,
+            )
+            for item in out
+        ]
+        for item, fut in zip(out, futures):
+            text = fut.result()
+            if text:
+                item["summary"] = text
+        _remember("arxiv", out)
         return out
-    except ET.ParseError as e:
-        return [{"error": f"arXiv API XML parse failed: {e}"}]
     except Exception as e:
         return [{"error": f"Unexpected error: {e}"}]
 
@@ -268,17 +448,307 @@ arxiv_tool_def = {
     },
 }
 
+# ----- arXiv batch lookup -----
+# Resolves known papers (titles, arXiv ids / URLs, DOIs) in as few API
+# requests as possible: one `id_list` request for the ids, OR-combined
+# `ti:` queries for the titles, then fuzzy title matching back to inputs.
+_ARXIV_ID = re.compile(
+    r"(?:arxiv[:/ ]\s*|abs/|pdf/)?(\d{4}\.\d{4,5}(?:v\d+)?|[a-z][a-z\-]+(?:\.[A-Z]{2})?/\d{7}(?:v\d+)?)",
+    re.IGNORECASE,
+)
+_DOI = re.compile(r"\b(10\.\d{4,9}/\S+)", re.IGNORECASE)
+_TITLE_STOPWORDS = frozenset(
+    "a an and are as at be by for from in into is of on or the to via with without "
+    "its using towards toward based".split()
+)
+_LOOKUP_TITLES_PER_QUERY = int(os.getenv("ARXIV_LOOKUP_TITLES_PER_QUERY", "8"))
+_LOOKUP_RESULTS_PER_TITLE = int(os.getenv("ARXIV_LOOKUP_RESULTS_PER_TITLE", "3"))
+_LOOKUP_MIN_SCORE = float(os.getenv("ARXIV_LOOKUP_MIN_SCORE", "0.8"))
+_arxiv_lookup_cache = TTLCache(
+    ttl_seconds=float(os.getenv("ARXIV_LOOKUP_CACHE_TTL_SECONDS", "3600")),
+    max_entries=int(os.getenv("ARXIV_LOOKUP_CACHE_MAX_ENTRIES", "2048")),
+)
 
-## -----
 
+def _title_key(title: str) -> str:
+    return " ".join(re.findall(r"[a-z0-9]+", (title or "").lower()))
+
+
+def _title_score(a: str, b: str) -> float:
+    """Similarity of two titles in [0, 1]: edit ratio or word overlap."""
+    ka, kb = _title_key(a), _title_key(b)
+    if not ka or not kb:
+        return 0.0
+    wa, wb = set(ka.split()), set(kb.split())
+    overlap = len(wa & wb) / len(wa | wb)
+    return max(SequenceMatcher(None, ka, kb).ratio(), overlap)
+
+
+def _arxiv_base_id(value: str) -> str:
+    return re.sub(r"v\d+$", "", value.lower())
+
+
+def _classify_lookup(value: str) -> Tuple[str, str]:
+    """("arxiv_id" | "doi" | "title", normalized value); arXiv DOIs become ids."""
+    value = " ".join((value or "").split())
+    doi = _DOI.search(value)
+    if doi:
+        arxiv_doi = re.match(r"10\.48550/arxiv\.(.+)$", doi.group(1), re.IGNORECASE)
+        if arxiv_doi:
+            return "arxiv_id", arxiv_doi.group(1)
+        return "doi", doi.group(1).rstrip(".,;").lower()
+    looks_like_id = len(value.split()) == 1 or value.lower().startswith(("arxiv", "http"))
+    match = _ARXIV_ID.search(value) if looks_like_id else None
+    if match:
+        return "arxiv_id", match.group(1)
+    return "title", value
+
+
+def _title_query(title: str) -> str:
+    words = [w for w in _title_key(title).split() if w not in _TITLE_STOPWORDS and len(w) > 1]
+    return "(" + " AND ".join(f"ti:{w}" for w in words[:8]) + ")" if words else ""
+
+
+def _arxiv_api(params: Dict) -> List[Tuple[Dict, Optional[str]]]:
+    host = _api_limiter.acquire(ARXIV_API_URL)
+    try:
+        check_cancelled()
+        with span("arxiv", "api"):
+            resp = session.get(ARXIV_API_URL, params=params, timeout=cancellable_timeout(60))
+            resp.raise_for_status()
+    finally:
+        _api_limiter.release(host)
+    return _parse_atom_entries(resp.content)
+
+
+def _lookup_ids(ids: List[str]) -> Dict[str, Tuple[Dict, Optional[str]]]:
+    """base id -> (item, doi) for one `id_list` request."""
+    found = {}
+    for item, doi in _arxiv_api({"id_list": ",".join(ids), "max_results": len(ids)}):
+        match = _ARXIV_ID.search(item.get("url", ""))
+        if match:
+            found[_arxiv_base_id(match.group(1))] = (item, doi)
+    return found
+
+
+def _lookup_titles(titles: List[str]) -> List[Tuple[Dict, Optional[str]]]:
+    """Candidates for several titles from one OR-combined `ti:` query."""
+    clauses = [q for q in (_title_query(t) for t in titles) if q]
+    if not clauses:
+        return []
+    return _arxiv_api(
+        {
+            "search_query": " OR ".join(clauses),
+            "start": 0,
+            "max_results": min(len(clauses) * _LOOKUP_RESULTS_PER_TITLE, 100),
+        }
+    )
+
+
+def arxiv_lookup_cache_stats() -> dict:
+    return _arxiv_lookup_cache.stats()
+
+
+@timed("tool")
+def arxiv_lookup_tool(items: List[str], fetch_pdf: bool = False) -> List[Dict]:
+    """
+    Looks up many known papers on arXiv at once, e.g. every item collected by
+    a web search. Use this instead of calling arxiv_search_tool per item.
+
+    Args:
+        items (List[str]): Paper titles, arXiv ids / URLs or DOIs, one per paper.
+        fetch_pdf (bool): Also download matched PDFs and add their text (slow).
+
+    Returns:
+        List[Dict]: One dictionary per item: `found`, and for matches the arXiv
+        title, authors, published date, URL, PDF link, abstract and match score.
+    """
+    check_cancelled()
+    wanted: List[Tuple[str, str, str]] = []  # (input, kind, value)
+    seen = set()
+    for raw in items or []:
+        kind, value = _classify_lookup(str(raw))
+        key = (kind, value.lower())
+        if value and key not in seen:
+            seen.add(key)
+            wanted.append((str(raw), kind, value))
+
+    results: Dict[Tuple[str, str], Dict] = {}
+    misses = []
+    for raw, kind, value in wanted:
+        cached = _arxiv_lookup_cache.get((kind, value.lower()))
+        if cached is not None:
+            results[(kind, value.lower())] = dict(cached)
+        else:
+            misses.append((raw, kind, value))
+
+    errors = []
+    # ids: a single id_list request
+    ids = [value for _, kind, value in misses if kind == "arxiv_id"]
+    by_id: Dict[str, Tuple[Dict, Optional[str]]] = {}
+    if ids:
+        try:
+            by_id = _lookup_ids(ids)
+        except (requests.exceptions.RequestException, ET.ParseError) as e:
+            errors.append(f"arXiv id lookup failed: {e}")
+    for value in ids:
+        hit = by_id.get(_arxiv_base_id(value))
+        if hit:
+            results[("arxiv_id", value.lower())] = {**hit[0], "doi": hit[1], "score": 1.0}
+
+    # titles: OR-combined queries, then the best candidate per title
+    titles = [value for _, kind, value in misses if kind == "title"]
+    candidates: List[Tuple[Dict, Optional[str]]] = []
+    for start in range(0, len(titles), max(1, _LOOKUP_TITLES_PER_QUERY)):
+        try:
+            candidates += _lookup_titles(titles[start : start + _LOOKUP_TITLES_PER_QUERY])
+        except (requests.exceptions.RequestException, ET.ParseError) as e:
+            errors.append(f"arXiv title lookup failed: {e}")
+    scored = sorted(
+        (
+            (_title_score(title, item["title"]), title, i)
+            for title in titles
+            for i, (item, _) in enumerate(candidates)
+        ),
+        reverse=True,
+    )
+    used = set()
+    for score, title, i in scored:
+        key = ("title", title.lower())
+        if score < _LOOKUP_MIN_SCORE or key in results or i in used:
+            continue
+        used.add(i)
+        item, doi = candidates[i]
+        results[key] = {**item, "doi": doi, "score": round(score, 3)}
+
+    # DOIs: only papers that list their journal DOI on arXiv can be matched
+    for _, kind, value in misses:
+        if kind == "doi":
+            hit = next((c for c in candidates if (c[1] or "").lower() == value), None)
+            if hit:
+                results[("doi", value.lower())] = {**hit[0], "doi": hit[1], "score": 1.0}
+
+    for raw, kind, value in misses:
+        key = (kind, value.lower())
+        if key in results:
+            results[key]["found"] = True
+            _arxiv_lookup_cache.set(key, dict(results[key]))
+        elif not errors:
+            # a definite miss is worth remembering too
+            results[key] = {"found": False}
+            _arxiv_lookup_cache.set(key, dict(results[key]))
+
+    out = []
+    for raw, kind, value in wanted:
+        result = results.get((kind, value.lower()))
+        if result is None:
+            result = {"found": False, "error": "; ".join(errors)}
+        elif kind == "doi" and not result["found"]:
+            result = {**result, "note": "DOI not listed on arXiv; retry with the title"}
+        out.append({"input": raw, "kind": kind, **result})
+
+    if fetch_pdf:
+        matched = [r for r in out if r.get("found")]
+        futures = [
+            _arxiv_fetch_pool.submit(
+                contextvars.copy_context().run, _arxiv_entry_text, r, True, True, 6, 5000
+            )
+            for r in matched
+        ]
+        for r, fut in zip(matched, futures):
+            text = fut.result()
+            if text:
+                r["text"] = text
+    _remember("arxiv", out)
+    return out
+
+
+arxiv_lookup_tool_def = {
+    "type": "function",
+    "function": {
+        "name": "arxiv_lookup_tool",
+        "description": "Looks up many known papers (titles, arXiv ids or DOIs) on arXiv in one call.",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "items": {
+                    "type": "array",
+                    "items": {"type": "string"},
+                    "description": "Paper titles, arXiv ids / URLs or DOIs, one per paper.",
+                },
+                "fetch_pdf": {
+                    "type": "boolean",
+                    "description": "Also download matched PDFs and add their text.",
+                    "default": False,
+                },
+            },
+            "required": ["items"],
+        },
+    },
+}
+
+
+## -----
 
-import os
-from dotenv import load_dotenv
-from tavily import TavilyClient
 
 load_dotenv()  # Loads environment variables from a .env file
 
+# One pooled client (it keeps its own keep-alive session), a TTL cache of
+# normalized searches and single-flight coalescing of identical queries.
+_tavily_client = None
+_tavily_client_lock = threading.Lock()
+_tavily_cache = TTLCache(
+    ttl_seconds=float(os.getenv("TAVILY_CACHE_TTL_SECONDS", "900")),
+    max_entries=int(os.getenv("TAVILY_CACHE_MAX_ENTRIES", "1024")),
+)
+_tavily_flight = SingleFlight()
+
+
+def _get_tavily_client() -> "TavilyClient":
+    global _tavily_client
+    with _tavily_client_lock:
+        if _tavily_client is None:
+            from tavily import TavilyClient
+
+            api_key = os.getenv("TAVILY_API_KEY")
+            if not api_key:
+                raise ValueError("TAVILY_API_KEY not found in environment variables.")
+            _tavily_client = TavilyClient(
+                api_key, api_base_url=os.getenv("DLAI_TAVILY_BASE_URL")
+            )
+        return _tavily_client
+
+
+def _tavily_search(query: str, max_results: int, include_images: bool) -> list[dict]:
+    response = _get_tavily_client().search(
+        query=query,
+        max_results=max_results,
+        include_images=include_images,
+        timeout=cancellable_timeout(60),
+    )
+
+    results = []
+    for r in response.get("results", []):
+        results.append(
+            {
+                "title": r.get("title", ""),
+                "content": r.get("content", ""),
+                "url": r.get("url", ""),
+            }
+        )
+
+    if include_images:
+        for img_url in response.get("images", []):
+            results.append({"image_url": img_url})
+
+    return results
+
 
+def tavily_cache_stats() -> dict:
+    return {**_tavily_cache.stats(), **_tavily_flight.stats()}
+
+
+@timed("tool")
 def tavily_search_tool(
     query: str, max_results: int = 5, include_images: bool = False
 ) -> list[dict]:
@@ -293,32 +763,23 @@ def tavily_search_tool(
     Returns:
         List[dict]: A list of dictionaries with keys like 'title', 'content', and 'url'.
     """
-    api_key = os.getenv("TAVILY_API_KEY")
-    if not api_key:
-        raise ValueError("TAVILY_API_KEY not found in environment variables.")
-
-    client = TavilyClient(api_key, api_base_url=os.getenv("DLAI_TAVILY_BASE_URL"))
+    check_cancelled()
+    # case / whitespace differences should not cost another paid search
+    key = (" ".join(query.lower().split()), int(max_results), bool(include_images))
 
     try:
-        response = client.search(
-            query=query, max_results=max_results, include_images=include_images
-        )
-
-        results = []
-        for r in response.get("results", []):
-            results.append(
-                {
-                    "title": r.get("title", ""),
-                    "content": r.get("content", ""),
-                    "url": r.get("url", ""),
-                }
-            )
+        results = _tavily_cache.get(key)
+        if results is None:
 
-        if include_images:
-            for img_url in response.get("images", []):
-                results.append({"image_url": img_url})
+            def _fetch():
+                fresh = _tavily_search(query, int(max_results), bool(include_images))
+                _tavily_cache.set(key, fresh)
+                _remember("tavily", fresh)
+                return fresh
 
-        return results
+            results = _tavily_flight.do(key, _fetch)
+        # callers get their own copies; the cached list stays pristine
+        return [dict(r) for r in results]
 
     except Exception as e:
         return [{"error": str(e)}]  # For LLM-friendly agents
@@ -354,29 +815,148 @@ tavily_tool_def = {
 
 ## Wikipedia search tool
 
-from typing import List, Dict
-import wikipedia
+# MediaWiki Action API: title, intro extract and canonical URL come back in a
+# single request through the shared pooled `session`.
+WIKIPEDIA_API_URL = os.getenv("WIKIPEDIA_API_URL", "https://en.wikipedia.org/w/api.php")
+
+_wikipedia_cache = TTLCache(
+    ttl_seconds=float(os.getenv("WIKIPEDIA_CACHE_TTL_SECONDS", "3600")),
+    max_entries=int(os.getenv("WIKIPEDIA_CACHE_MAX_ENTRIES", "1024")),
+)
+_wikipedia_flight = SingleFlight()
+
+
+def _wikipedia_query(params: Dict, sentences: int) -> Dict:
+    base = {
+        "action": "query",
+        "format": "json",
+        "formatversion": 2,
+        "redirects": 1,
+        "prop": "extracts|info|pageprops",
+        "exintro": 1,
+        "explaintext": 1,
+        "exsentences": sentences,
+        "exlimit": 20,
+        "inprop": "url",
+        "ppprop": "disambiguation",
+    }
+    r = session.get(
+        WIKIPEDIA_API_URL, params={**base, **params}, timeout=cancellable_timeout(30)
+    )
+    r.raise_for_status()
+    data = r.json()
+    if "error" in data:
+        raise RuntimeError(data["error"].get("info", "Wikipedia API error"))
+    return data.get("query") or {}
 
 
-def wikipedia_search_tool(query: str, sentences: int = 5) -> List[Dict]:
+def _page_result(page: Dict) -> Dict:
+    return {
+        "title": page.get("title", ""),
+        "summary": page.get("extract", ""),
+        "url": page.get("canonicalurl") or page.get("fullurl", ""),
+    }
+
+
+def _is_article(page: Dict) -> bool:
+    return not page.get("missing") and "disambiguation" not in (
+        page.get("pageprops") or {}
+    )
+
+
+def _wikipedia_search_one(query: str, sentences: int) -> Dict:
+    pages = _wikipedia_query(
+        {"generator": "search", "gsrsearch": query, "gsrlimit": 1}, sentences
+    ).get("pages", [])
+    if not pages:
+        raise LookupError(f'No Wikipedia article found for "{query}"')
+    return _page_result(min(pages, key=lambda p: p.get("index", 0)))
+
+
+def _wikipedia_lookup_many(queries: List[str], sentences: int) -> Dict[str, Dict]:
+    """
+    Resolves several queries: one batched exact-title request (following
+    redirects) for all of them, then a search request only for the misses.
+    """
+    found: Dict[str, Dict] = {}
+    result = _wikipedia_query({"titles": "|".join(queries)}, sentences)
+    by_title = {p.get("title", ""): p for p in result.get("pages", [])}
+    # follow title normalization and redirects back to the asking query
+    normalized = {n["from"]: n["to"] for n in result.get("normalized", [])}
+    redirects = {r["from"]: r["to"] for r in result.get("redirects", [])}
+    for q in queries:
+        title = normalized.get(q, q)
+        page = by_title.get(redirects.get(title, title))
+        if page and _is_article(page):
+            found[q] = _page_result(page)
+
+    for q in queries:
+        if q not in found:
+            try:
+                found[q] = _wikipedia_search_one(q, sentences)
+            except Exception as e:
+                found[q] = {"query": q, "error": str(e)}
+    return found
+
+
+def wikipedia_cache_stats() -> dict:
+    return {**_wikipedia_cache.stats(), **_wikipedia_flight.stats()}
+
+
+@timed("tool")
+def wikipedia_search_tool(
+    query: str, sentences: int = 5, queries: Optional[List[str]] = None
+) -> List[Dict]:
     """
     Searches Wikipedia for a summary of the given query.
 
     Args:
         query (str): Search query for Wikipedia.
         sentences (int): Number of sentences to include in the summary.
+        queries (List[str]): Optional extra queries to look up in the same call.
 
     Returns:
-        List[Dict]: A list with a single dictionary containing title, summary, and URL.
+        List[Dict]: One dictionary per query containing title, summary, and URL.
     """
-    try:
-        page_title = wikipedia.search(query)[0]
-        page = wikipedia.page(page_title)
-        summary = wikipedia.summary(page_title, sentences=sentences)
+    check_cancelled()
+    sentences = max(1, min(int(sentences), 10))
+    wanted = []
+    for q in [query] + list(queries or []):
+        q = " ".join((q or "").split())
+        if q and q not in wanted:
+            wanted.append(q)
+
+    results: Dict[str, Dict] = {}
+    misses = []
+    for q in wanted:
+        cached = _wikipedia_cache.get((q.lower(), sentences))
+        if cached is not None:
+            results[q] = dict(cached)
+        else:
+            misses.append(q)
 
-        return [{"title": page.title, "summary": summary, "url": page.url}]
+    try:
+        if len(misses) == 1:
+            q = misses[0]
+            results[q] = _wikipedia_flight.do(
+                (q.lower(), sentences), lambda: _wikipedia_search_one(q, sentences)
+            )
+        elif misses:
+            results.update(_wikipedia_lookup_many(misses, sentences))
     except Exception as e:
-        return [{"error": str(e)}]
+        for q in misses:
+            results.setdefault(q, {"query": q, "error": str(e)})
+
+    for q in misses:
+        if "error" not in results[q]:
+            _wikipedia_cache.set((q.lower(), sentences), dict(results[q]))
+    _remember("wikipedia", [results[q] for q in misses])
+
+    out = [results[q] for q in wanted]
+    # single-query calls keep the historical shape (errors without "query")
+    if len(out) == 1 and "error" in out[0]:
+        return [{"error": out[0]["error"]}]
+    return out
 
 
 # Tool definition
@@ -397,6 +977,76 @@ wikipedia_tool_def = {
                     "description": "Number of sentences in the summary.",
                     "default": 5,
                 },
+                "queries": {
+                    "type": "array",
+                    "items": {"type": "string"},
+                    "description": "Optional extra queries to look up in the same call.",
+                },
+            },
+            "required": ["query"],
+        },
+    },
+}
+
+
+# ----- Local corpus -----
+# Every tool result is indexed (SQLite FTS5) so later tasks can search what
+# earlier ones already retrieved without going to the network.
+def _remember(source: str, results: List[Dict]) -> None:
+    if local_corpus is None:
+        return
+    try:
+        local_corpus.ingest(source, results)
+    except Exception:
+        logger.exception("⚠️ Local corpus ingest failed")
+
+
+def local_corpus_stats() -> dict:
+    return local_corpus.stats() if local_corpus is not None else {"enabled": False}
+
+
+@timed("tool")
+def local_corpus_search_tool(
+    query: str, max_results: int = 5, source: Optional[str] = None
+) -> List[Dict]:
+    """
+    Searches the papers, web pages and Wikipedia summaries retrieved by
+    earlier research (a local full-text index, answers in milliseconds).
+
+    Args:
+        query (str): Search keywords.
+        max_results (int): Number of documents to return (default 5).
+        source (str): Optional filter: "arxiv", "tavily" or "wikipedia".
+
+    Returns:
+        List[Dict]: Best matches first, with title, url, source, score, snippet,
+        content and the date the document was retrieved.
+    """
+    check_cancelled()
+    if local_corpus is None:
+        return [{"error": "Local corpus is disabled"}]
+    try:
+        results = local_corpus.search(query, max_results, source or None)
+    except Exception as e:
+        return [{"error": f"Local corpus search failed: {e}"}]
+    return results or [{"note": "No local matches; use the online search tools"}]
+
+
+local_corpus_tool_def = {
+    "type": "function",
+    "function": {
+        "name": "local_corpus_search_tool",
+        "description": "Searches documents already retrieved by earlier research (local full-text index).",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "query": {"type": "string", "description": "Search keywords."},
+                "max_results": {"type": "integer", "default": 5},
+                "source": {
+                    "type": "string",
+                    "enum": ["arxiv", "tavily", "wikipedia"],
+                    "description": "Only return documents retrieved by this tool.",
+                },
             },
             "required": ["query"],
         },
@@ -409,4 +1059,6 @@ tool_mapping = {
     "tavily_search_tool": tavily_search_tool,
     "arxiv_search_tool": arxiv_search_tool,
     "wikipedia_search_tool": wikipedia_search_tool,
+    "arxiv_lookup_tool": arxiv_lookup_tool,
+    "local_corpus_search_tool": local_corpus_search_tool,
 }
@@ -0,0 +1,169 @@
+import json
+import time
+import asyncio
+import threading
+from typing import Dict, List, Optional, Tuple
+
+# Events that end a task's stream; subscribers stop after receiving one.
+TERMINAL_EVENTS = ("done", "error", "cancelled", "timed_out")
+
+
+class TaskEventBroker:
+    """
+    In-process fan-out of task progress events.
+
+    Workflow threads call `publish()`; SSE / WebSocket handlers running on the
+    event loop call `subscribe()` and read `(event, data_json)` tuples from the
+    returned asyncio.Queue. Payloads are serialized once, in the publishing
+    thread, so subscribers never touch the live (mutating) progress dicts.
+    """
+
+    def __init__(self, max_queue: int = 256):
+        self._lock = threading.Lock()
+        self._subscribers: Dict[
+            str, List[Tuple[asyncio.AbstractEventLoop, asyncio.Queue]]
+        ] = {}
+        self._max_queue = max_queue
+
+    def subscribe(self, task_id: str) -> asyncio.Queue:
+        # must be called from inside the running event loop
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self._max_queue)
+        with self._lock:
+            self._subscribers.setdefault(task_id, []).append((loop, queue))
+        return queue
+
+    def unsubscribe(self, task_id: str, queue: asyncio.Queue) -> None:
+        with self._lock:
+            subs = self._subscribers.get(task_id, [])
+            self._subscribers[task_id] = [s for s in subs if s[1] is not queue]
+            if not self._subscribers[task_id]:
+                del self._subscribers[task_id]
+
+    def subscriber_count(self, task_id: Optional[str] = None) -> int:
+        with self._lock:
+            if task_id is not None:
+                return len(self._subscribers.get(task_id, []))
+            return sum(len(s) for s in self._subscribers.values())
+
+    def publish(self, task_id: str, event: str, data: dict) -> None:
+        with self._lock:
+            subs = list(self._subscribers.get(task_id, []))
+        if not subs:
+            return
+        payload = json.dumps(data, default=str)
+        for loop, queue in subs:
+            try:
+                loop.call_soon_threadsafe(_offer, queue, (event, payload))
+            except RuntimeError:
+                # loop already closed; the handler will unsubscribe itself
+                pass
+
+
+def _offer(queue: asyncio.Queue, item: Tuple[str, str]) -> None:
+    # A slow consumer should not block the workflow: when its queue is full
+    # the oldest non-terminal event is dropped (a later `step` event carries
+    # the whole step again, a gap in `report_delta` offsets makes the client
+    # resync). Terminal events are never evicted: they end the stream.
+    if queue.full():
+        items = [queue.get_nowait() for _ in range(queue.qsize())]
+        dropped = next(
+            (i for i, (event, _) in enumerate(items) if event not in TERMINAL_EVENTS), None
+        )
+        if dropped is not None:
+            del items[dropped]
+        for queued in items:
+            queue.put_nowait(queued)
+        if dropped is None:
+            # nothing but terminal events queued: the stream ends with them
+            return
+    queue.put_nowait(item)
+
+
+class ReportStream:
+    """
+    Text of a step whose completion is being streamed. `write()` is passed as
+    the agent's delta callback; deltas are batched (every `flush_seconds` or
+    `flush_chars`) into `report_delta` events carrying their `offset` in the
+    text, so a client that missed one can resync from `/task_report`.
+    """
+
+    def __init__(
+        self,
+        task_id: str,
+        index: int,
+        title: str = "",
+        flush_seconds: float = 0.1,
+        flush_chars: int = 512,
+    ):
+        self.task_id = task_id
+        self.index = index
+        self.title = title
+        self.flush_seconds = flush_seconds
+        self.flush_chars = flush_chars
+        self._parts: List[str] = []
+        self._length = 0
+        self._pending: List[str] = []
+        self._pending_chars = 0
+        self._last_flush = time.monotonic()
+        self._lock = threading.Lock()
+        self.streaming = True
+
+    def write(self, delta: str) -> None:
+        if not delta:
+            return
+        with self._lock:
+            self._parts.append(delta)
+            self._pending.append(delta)
+            self._pending_chars += len(delta)
+            due = (
+                self._pending_chars >= self.flush_chars
+                or time.monotonic() - self._last_flush >= self.flush_seconds
+            )
+        if due:
+            self.flush()
+
+    def flush(self) -> None:
+        with self._lock:
+            if not self._pending:
+                return
+            delta = "".join(self._pending)
+            offset = self._length
+            self._length += len(delta)
+            self._pending, self._pending_chars = [], 0
+            self._last_flush = time.monotonic()
+        broker.publish(
+            self.task_id,
+            "report_delta",
+            {"index": self.index, "offset": offset, "delta": delta},
+        )
+
+    def close(self) -> None:
+        self.flush()
+        self.streaming = False
+
+    def text(self, offset: int = 0) -> str:
+        with self._lock:
+            if len(self._parts) > 1:
+                # compact as we go so repeated reads stay cheap
+                self._parts = ["".join(self._parts)]
+            full = self._parts[0] if self._parts else ""
+        return full[offset:]
+
+    def snapshot(self, offset: int = 0) -> dict:
+        text = self.text(offset)
+        return {
+            "index": self.index,
+            "title": self.title,
+            "offset": offset,
+            "length": offset + len(text),
+            "text": text,
+            "streaming": self.streaming,
+        }
+
+
+def format_sse(event: str, data: str) -> str:
+    return f"event: {event}\ndata: {data}\n\n"
+
+
+broker = TaskEventBroker()
@@ -0,0 +1,27 @@
+import os
+import zlib
+from typing import Optional, Tuple
+
+# Bodies at least this large are stored zlib-compressed
+COMPRESS_MIN_BYTES = int(os.getenv("STORAGE_COMPRESS_MIN_BYTES", "2048"))
+COMPRESS_LEVEL = int(os.getenv("STORAGE_COMPRESS_LEVEL", "6"))
+
+
+def pack_text(text: Optional[str]) -> Tuple[Optional[bytes], str]:
+    """Returns (blob, codec) for a text column pair; codec is "zlib" or "plain"."""
+    if text is None:
+        return None, "plain"
+    raw = text.encode("utf-8")
+    if COMPRESS_MIN_BYTES >= 0 and len(raw) >= COMPRESS_MIN_BYTES:
+        packed = zlib.compress(raw, COMPRESS_LEVEL)
+        if len(packed) < len(raw):
+            return packed, "zlib"
+    return raw, "plain"
+
+
+def unpack_text(blob: Optional[bytes], codec: Optional[str]) -> Optional[str]:
+    if blob is None:
+        return None
+    if codec == "zlib":
+        blob = zlib.decompress(blob)
+    return bytes(blob).decode("utf-8")
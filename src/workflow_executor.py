@@ -0,0 +1,231 @@
+import logging
+import math
+import time
+import threading
+import contextvars
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Deque, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class QueueFullError(Exception):
+    """Raised by `WorkflowExecutor.submit` when the pending queue is full."""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"Workflow queue is full, retry in {retry_after}s")
+        self.retry_after = retry_after
+
+
+class _Job:
+    __slots__ = ("task_id", "fn", "args", "enqueued_at")
+
+    def __init__(self, task_id: str, fn: Callable, args: tuple):
+        self.task_id = task_id
+        self.fn = fn
+        self.args = args
+        self.enqueued_at = time.monotonic()
+
+
+class WorkflowExecutor:
+    """
+    Fixed pool of workflow worker threads fed by a bounded FIFO queue.
+
+    `submit()` either admits a job (returning its 1-based queue position, 0
+    when an idle worker starts it right away) or raises QueueFullError with
+    a Retry-After estimate derived from recent run times. Workers are
+    started lazily on the first submission.
+    """
+
+    def __init__(self, workers: int = 4, max_pending: int = 32):
+        self.workers = max(1, workers)
+        self.max_pending = max(0, max_pending)
+        self._cond = threading.Condition()
+        self._pending: Deque[_Job] = deque()
+        self._threads = []
+        self._busy = 0
+        # counters
+        self._submitted = 0
+        self._rejected = 0
+        self._cancelled = 0
+        self._completed = 0
+        self._failed = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._run_total = 0.0
+        self._recent_runs: Deque[float] = deque(maxlen=50)
+
+    # ----- public API -----
+    def submit(self, task_id: str, fn: Callable, *args) -> int:
+        with self._cond:
+            # idle workers absorb jobs beyond the pending limit
+            capacity = self.max_pending + (self.workers - self._busy)
+            if len(self._pending) >= capacity:
+                self._rejected += 1
+                raise QueueFullError(self._retry_after_locked())
+            self._pending.append(_Job(task_id, fn, args))
+            self._submitted += 1
+            position = self._waiting_position_locked(len(self._pending) - 1)
+            self._ensure_workers_locked()
+            self._cond.notify()
+            return position or 0
+
+    def position(self, task_id: str) -> Optional[int]:
+        """1-based position among jobs waiting for a worker, or None if not waiting."""
+        with self._cond:
+            for i, job in enumerate(self._pending):
+                if job.task_id == task_id:
+                    return self._waiting_position_locked(i)
+        return None
+
+    def cancel(self, task_id: str) -> bool:
+        """Drops a job that has not started yet; False if it is not queued."""
+        with self._cond:
+            for job in self._pending:
+                if job.task_id == task_id:
+                    self._pending.remove(job)
+                    self._cancelled += 1
+                    return True
+        return False
+
+    def stats(self) -> Dict:
+        with self._cond:
+            started = self._completed + self._failed + self._busy
+            return {
+                "workers": self.workers,
+                "busy_workers": self._busy,
+                "queue_depth": len(self._pending),
+                "max_pending": self.max_pending,
+                "submitted": self._submitted,
+                "rejected": self._rejected,
+                "cancelled_in_queue": self._cancelled,
+                "completed": self._completed,
+                "failed": self._failed,
+                "avg_wait_seconds": round(self._wait_total / started, 3)
+                if started
+                else 0.0,
+                "max_wait_seconds": round(self._wait_max, 3),
+                "oldest_wait_seconds": round(
+                    time.monotonic() - self._pending[0].enqueued_at, 3
+                )
+                if self._pending
+                else 0.0,
+                "avg_run_seconds": round(
+                    self._run_total / (self._completed + self._failed), 3
+                )
+                if self._completed + self._failed
+                else 0.0,
+            }
+
+    # ----- internals -----
+    def _waiting_position_locked(self, index: int) -> Optional[int]:
+        # the first pending jobs go to idle workers that have not picked
+        # them up yet; only the ones behind them really wait
+        idle = max(self.workers - self._busy, 0)
+        return index + 1 - idle if index >= idle else None
+
+    def _retry_after_locked(self) -> int:
+        recent = list(self._recent_runs)
+        avg_run = sum(recent) / len(recent) if recent else 60.0
+        # time until enough workers free up to drain one queue slot
+        estimate = avg_run * (len(self._pending) + 1) / self.workers
+        return int(min(max(math.ceil(estimate), 1), 600))
+
+    def _ensure_workers_locked(self) -> None:
+        while len(self._threads) < self.workers:
+            t = threading.Thread(
+                target=self._worker_loop,
+                name=f"workflow-worker-{len(self._threads)}",
+                daemon=True,
+            )
+            self._threads.append(t)
+            t.start()
+
+    def _worker_loop(self) -> None:
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+                job = self._pending.popleft()
+                self._busy += 1
+                waited = time.monotonic() - job.enqueued_at
+                self._wait_total += waited
+                self._wait_max = max(self._wait_max, waited)
+
+            started = time.monotonic()
+            ok = True
+            try:
+                job.fn(*job.args)
+            except Exception:
+                ok = False
+                logger.exception("Workflow worker error for task %s", job.task_id)
+            elapsed = time.monotonic() - started
+
+            with self._cond:
+                self._busy -= 1
+                self._run_total += elapsed
+                self._recent_runs.append(elapsed)
+                if ok:
+                    self._completed += 1
+                else:
+                    self._failed += 1
+
+
+def ancestors(depends_on: List[List[int]], index: int) -> List[int]:
+    """Transitive dependencies of step `index`, in plan order."""
+    seen, stack = set(), list(depends_on[index])
+    while stack:
+        d = stack.pop()
+        if d not in seen:
+            seen.add(d)
+            stack.extend(depends_on[d])
+    return sorted(seen)
+
+
+def run_dag(
+    depends_on: List[List[int]],
+    fn: Callable[[int, List[int]], Any],
+    parallelism: int = 1,
+) -> List[Any]:
+    """
+    Runs `fn(index, ancestors)` for every step once all its dependencies have
+    finished, at most `parallelism` at a time; ready steps start in plan
+    order. Returns the results in plan order.
+
+    Each call runs in a copy of the caller's context, so context variables
+    (e.g. the task id used for cache accounting) carry over. On the first
+    failure no new step is started; running ones are awaited and the error
+    is re-raised.
+    """
+    n = len(depends_on)
+    results: Dict[int, Any] = {}
+    pending = list(range(n))
+    running: Dict[Any, int] = {}
+    error: Optional[BaseException] = None
+
+    with ThreadPoolExecutor(
+        max_workers=max(1, parallelism), thread_name_prefix="plan-step"
+    ) as pool:
+        while pending or running:
+            if error is None:
+                ready = [i for i in pending if all(d in results for d in depends_on[i])]
+                for i in ready[: max(1, parallelism) - len(running)]:
+                    pending.remove(i)
+                    ctx = contextvars.copy_context()
+                    running[pool.submit(ctx.run, fn, i, ancestors(depends_on, i))] = i
+            if not running:
+                break
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                i = running.pop(future)
+                try:
+                    results[i] = future.result()
+                except BaseException as e:
+                    error = error or e
+
+    if error is not None:
+        raise error
+    if len(results) < n:
+        raise ValueError("Plan dependencies contain a cycle")
+    return [results[i] for i in range(n)]
@@ -0,0 +1,455 @@
+let currentTaskId = null;
+// identifies this page among the submissions following a (shared) task
+let currentWatchId = null;
+let currentTopic = null;
+// fallback when SSE is unavailable: long-poll of /task_progress deltas
+let longPolling = false;
+let progressVersion = 0;
+let eventSource = null;
+let currentSteps = [];
+let finalReportMarkdown = "";
+const renderedSteps = new Map();
+// in-progress text of the writer/editor step being streamed
+let liveReport = { index: null, title: '', text: '' };
+let liveRenderTimer = null;
+
+function setTaskInfoGenerating(topic){
+  document.getElementById('taskInfo').innerHTML = `
+    <h5 class="d-flex align-items-center">
+      <span class="me-2">⚙️ Generating steps for the search: <code>${topic}</code></span>
+      <span id="stepsIcon"><span class='spinner-border spinner-border-sm text-primary'></span></span>
+      <button id="cancelBtn" class="btn btn-outline-danger btn-sm ms-3" onclick="cancelTask()">⏹️ Cancel</button>
+    </h5>
+    <div id="queueInfo" class="text-muted small"></div>
+    <div id="reuseInfo" class="text-muted small"></div>
+  `;
+}
+
+function setStepsGenerated(){
+  const stepsIcon = document.getElementById('stepsIcon');
+  if (stepsIcon) stepsIcon.textContent = '✅';
+}
+
+// Leaves the running task; the server cancels it (freeing its worker) once
+// no other submission of the same prompt follows it
+function cancelTask() {
+  if (!currentTaskId) return;
+  const cancelBtn = document.getElementById('cancelBtn');
+  if (cancelBtn) cancelBtn.disabled = true;
+  const query = currentWatchId ? `?watch_id=${encodeURIComponent(currentWatchId)}` : '';
+  fetch(`/tasks/${currentTaskId}${query}`, { method: 'DELETE' })
+    .then(res => res.json())
+    .then(data => {
+      if (data.status !== 'detached') return;
+      // others still follow the report: stop following it here only
+      stopProgressUpdates();
+      const queueInfo = document.getElementById('queueInfo');
+      if (queueInfo) queueInfo.textContent = '⏹️ Stopped following this report (still running for others)';
+      disableUI(false);
+    })
+    .catch(() => {});
+}
+
+function disableUI(disabled){
+  const btn = document.querySelector('button.btn.btn-primary');
+  const input = document.getElementById('promptInput');
+  if (btn) btn.disabled = disabled;
+  if (input) input.disabled = disabled;
+  const cancelBtn = document.getElementById('cancelBtn');
+  if (cancelBtn) cancelBtn.style.display = disabled ? '' : 'none';
+}
+
+function submitPrompt() {
+  const prompt = document.getElementById('promptInput').value;
+  if (!prompt) return;
+
+  currentTopic = prompt;
+  setTaskInfoGenerating(currentTopic);
+  disableUI(true);
+
+  fetch('/generate_report', {
+    method: 'POST',
+    headers: { 'Content-Type': 'application/json' },
+    body: JSON.stringify({ prompt })
+  })
+  .then(res => {
+    if (res.status === 429) {
+      const retry = res.headers.get('Retry-After');
+      throw new Error(`Server is busy, please retry in ${retry || 'a few'} seconds.`);
+    }
+    return res.json();
+  })
+  .then(data => {
+    currentTaskId = data.task_id;
+    currentWatchId = data.watch_id || null;
+    const reuseInfo = document.getElementById('reuseInfo');
+    if (reuseInfo && data.reused) {
+      reuseInfo.textContent = data.reused === 'completed'
+        ? '♻️ Same prompt was researched recently, showing that report'
+        : '♻️ Same prompt is already being researched, following that run';
+    }
+
+    document.getElementById('stepStatusList').innerHTML = '';
+    document.getElementById('stepDetails').innerHTML = '';
+    document.getElementById('finalOutput').innerHTML = '';
+    renderedSteps.clear();
+    liveReport = { index: null, title: '', text: '' };
+    finalReportMarkdown = "";
+
+    startProgressUpdates();
+  })
+  .catch(err => {
+    const statusIcon = document.getElementById('statusIcon');
+    if (statusIcon) statusIcon.textContent = '❌';
+    const queueInfo = document.getElementById('queueInfo');
+    if (queueInfo && err && err.message) queueInfo.textContent = err.message;
+    disableUI(false);
+  });
+}
+
+function startProgressUpdates() {
+  stopProgressUpdates();
+  // Prefer the push stream; fall back to polling when SSE is unavailable
+  if (!window.EventSource) {
+    startLongPoll();
+    return;
+  }
+  eventSource = new EventSource(`/task_events/${currentTaskId}`);
+  eventSource.addEventListener('snapshot', e => renderProgress(JSON.parse(e.data)));
+  eventSource.addEventListener('plan', e => renderProgress(JSON.parse(e.data)));
+  eventSource.addEventListener('step', e => {
+    const { index, step } = JSON.parse(e.data);
+    currentSteps[index] = step;
+    renderProgress({ steps: currentSteps });
+  });
+  eventSource.addEventListener('report_delta', e => applyReportDelta(JSON.parse(e.data)));
+  ['done', 'cancelled', 'timed_out'].forEach(name =>
+    eventSource.addEventListener(name, e => { stopProgressUpdates(); renderTaskStatus(JSON.parse(e.data)); }));
+  eventSource.addEventListener('error', e => {
+    if (e.data) {
+      // terminal task error sent by the server
+      stopProgressUpdates();
+      renderTaskStatus(JSON.parse(e.data));
+    } else if (eventSource.readyState === EventSource.CLOSED) {
+      // stream could not be (re)established
+      stopProgressUpdates();
+      startLongPoll();
+    }
+  });
+}
+
+function stopProgressUpdates() {
+  if (eventSource) { eventSource.close(); eventSource = null; }
+  longPolling = false;
+}
+
+function startLongPoll() {
+  longPolling = true;
+  progressVersion = 0;
+  fetchProgress();
+}
+
+// Each request returns as soon as the task moves past `progressVersion`
+// (or after ~25 s) with only the changed steps and new substeps.
+function fetchProgress() {
+  if (!longPolling || !currentTaskId) return;
+  const taskId = currentTaskId;
+
+  fetch(`/task_progress/${taskId}?since=${progressVersion}`)
+    .then(res => res.json())
+    .then(data => {
+      if (!longPolling || taskId !== currentTaskId) return;
+      applyProgressDelta(data);
+      // no status: progress already expired, the final state is in /task_status
+      if (!data.status || ['done', 'error', 'cancelled', 'timed_out'].includes(data.status)) {
+        longPolling = false;
+        fetchTaskStatus();
+      } else {
+        fetchProgress();
+      }
+    })
+    .catch(() => {
+      // retry after a pause
+      setTimeout(fetchProgress, 2000);
+    });
+}
+
+function applyProgressDelta(data) {
+  progressVersion = data.version || 0;
+  if (data.full) {
+    renderProgress(data);
+    return;
+  }
+  const steps = currentSteps.slice(0, data.step_count);
+  (data.changes || []).forEach(({ index, step, substeps_from }) => {
+    const known = (steps[index]?.substeps || []).slice(0, substeps_from);
+    steps[index] = { ...step, substeps: known.concat(step.substeps) };
+  });
+  renderProgress({ ...data, steps });
+}
+
+function renderProgress(data) {
+  const { steps } = data;
+  currentSteps = steps.slice();
+
+  const queueInfo = document.getElementById('queueInfo');
+  if (queueInfo) {
+    queueInfo.textContent = data.queue_position ? `⏳ Queued — position ${data.queue_position}` : '';
+  }
+
+  if (Array.isArray(steps) && steps.length > 0) {
+    setStepsGenerated();
+  }
+
+  steps.forEach((step, index) => {
+    const stepKey = `${step.title}-${step.status}-${step.substeps.length}`;
+    if (renderedSteps.get(index) === stepKey) return;
+
+    renderedSteps.set(index, stepKey);
+
+    const icon = step.status === 'done' ? '✅' :
+                 step.status === 'running' ? '<span class="spinner-border spinner-border-sm text-warning"></span>' :
+                 step.status === 'error' ? '❌' :
+                 step.status === 'cancelled' ? '⏹️' :
+                 step.status === 'timed_out' ? '⌛' : '🕓';
+
+    const rowId = `step-row-${index}`;
+    let row = document.getElementById(rowId);
+    if (!row) {
+      row = document.createElement('div');
+      row.id = rowId;
+      row.className = `step-header ${getStatusClass(step.status)}`;
+      row.innerHTML = `${icon} ${step.title}`;
+      document.getElementById('stepStatusList').appendChild(row);
+    } else {
+      row.className = `step-header ${getStatusClass(step.status)}`;
+      row.innerHTML = `${icon} ${step.title}`;
+    }
+
+    const cardId = `step-card-${index}`;
+    let card = document.getElementById(cardId);
+    const substepsHTML = step.substeps.map((sub, j) => `
+      <div class="substep">
+        <div class="substep-header" data-bs-toggle="collapse" data-bs-target="#substep-${index}-${j}" aria-expanded="false" aria-controls="substep-${index}-${j}">
+          ➕ ${sub.title}
+        </div>
+        <div id="substep-${index}-${j}" class="collapse" data-step="${index}" data-substep="${j}">
+          ${sub.kind === 'agent_call'
+            ? '<div class="substep-body text-muted small">Loading…</div>'
+            : `<div class="bg-light p-2 rounded" style="white-space:pre-wrap;">${marked.parse(sub.content || '')}</div>`}
+        </div>
+      </div>
+    `).join('');
+
+    if (!card) {
+      card = document.createElement('div');
+      card.id = cardId;
+      card.className = `card mb-3 ${getStepClass(step.status)}`;
+      card.innerHTML = `
+        <div class="card-header">${step.title} — ${step.status.toUpperCase()}</div>
+        <div class="card-body">
+          <p>${step.description}</p>
+          ${substepsHTML}
+        </div>
+      `;
+      document.getElementById('stepDetails').appendChild(card);
+    } else {
+      card.className = `card mb-3 ${getStepClass(step.status)}`;
+      card.querySelector('.card-header').textContent = `${step.title} — ${step.status.toUpperCase()}`;
+      card.querySelector('.card-body').innerHTML = `
+        <p>${step.description}</p>
+        ${substepsHTML}
+      `;
+    }
+  });
+}
+
+// ----- substep records, rendered on first expand -----
+// "taskId:index" -> promise of /task_steps (a step's output never changes)
+const stepOutputs = new Map();
+
+function escapeHtml(s) {
+  const div = document.createElement('div');
+  div.textContent = s || '';
+  return div.innerHTML;
+}
+
+function fetchStepOutput(index) {
+  const key = `${currentTaskId}:${index}`;
+  if (!stepOutputs.has(key)) {
+    stepOutputs.set(key, fetch(`/task_steps/${currentTaskId}/${index}`).then(res => {
+      if (!res.ok) { stepOutputs.delete(key); throw new Error(`step ${index} output unavailable`); }
+      return res.json();
+    }));
+  }
+  return stepOutputs.get(key);
+}
+
+// what the step at `index` was asked to do (kept in its agent_call record)
+function stepTask(index) {
+  const call = (currentSteps[index]?.substeps || []).find(sub => sub.kind === 'agent_call');
+  return call ? call.task : '';
+}
+
+function renderAgentCall(sub, body) {
+  const context = sub.context_step == null ? Promise.resolve(null) : fetchStepOutput(sub.context_step);
+  Promise.all([fetchStepOutput(sub.output_step), context])
+    .then(([out, prev]) => {
+      const previous = prev
+        ? `🔹 ${prev.title}\n${stepTask(sub.context_step)}\n\n📝 Output:\n${prev.output}`
+        : '';
+      body.className = 'substep-body';
+      body.innerHTML = `
+<div style='border:1px solid #ccc; border-radius:8px; padding:10px; margin:8px 0; background:#fff;'>
+  <div style='font-weight:bold; color:#2563eb;'>📘 User Prompt</div>
+  <div style='white-space:pre-wrap;'>${escapeHtml(currentTopic)}</div>
+
+  <div style='font-weight:bold; color:#16a34a; margin-top:8px;'>📜 Previous Step</div>
+  <pre style='white-space:pre-wrap; background:#f9fafb; padding:6px; border-radius:6px; margin:0;'>${escapeHtml(previous)}</pre>
+
+  <div style='font-weight:bold; color:#f59e0b; margin-top:8px;'>🧹 Your next task</div>
+  <div style='white-space:pre-wrap;'>${escapeHtml(sub.task)}</div>
+
+  <div style='font-weight:bold; color:#10b981; margin-top:8px;'>✅ Output</div>
+  <div>${marked.parse(out.output || '')}</div>
+</div>`;
+    })
+    .catch(err => { body.textContent = err.message; });
+}
+
+document.addEventListener('show.bs.collapse', e => {
+  const { step, substep } = e.target.dataset;
+  if (step === undefined) return;
+  const sub = currentSteps[step]?.substeps[substep];
+  const body = e.target.querySelector('.substep-body');
+  if (sub && sub.kind === 'agent_call' && body) renderAgentCall(sub, body);
+});
+
+function applyReportDelta({ index, offset, delta }) {
+  if (index !== liveReport.index) {
+    liveReport = { index, title: currentSteps[index]?.title || '', text: '' };
+  }
+  const length = liveReport.text.length;
+  if (offset > length) {
+    // joined mid-stream or a delta was dropped: resync from the server
+    fetchLiveReport(length);
+    return;
+  }
+  liveReport.text += delta.slice(length - offset);
+  scheduleLiveRender();
+}
+
+function fetchLiveReport(offset) {
+  fetch(`/task_report/${currentTaskId}?offset=${offset}`)
+    .then(res => res.json())
+    .then(data => {
+      if (data.index === null) return;
+      if (data.index !== liveReport.index) {
+        liveReport = { index: data.index, title: data.title, text: '' };
+        if (data.offset !== 0) { fetchLiveReport(0); return; }
+      }
+      if (data.offset !== liveReport.text.length) return;
+      liveReport.text += data.text;
+      scheduleLiveRender();
+    })
+    .catch(() => {
+      // silent
+    });
+}
+
+function scheduleLiveRender() {
+  // re-render the markdown at most a few times per second
+  if (liveRenderTimer) return;
+  liveRenderTimer = setTimeout(() => {
+    liveRenderTimer = null;
+    if (finalReportMarkdown || liveReport.index === null) return;
+    document.getElementById('finalOutput').innerHTML = `
+      <h4>📝 Writing: ${liveReport.title} <span class='spinner-border spinner-border-sm text-primary'></span></h4>
+      <div id="liveReport">${marked.parse(liveReport.text)}</div>
+    `;
+  }, 250);
+}
+
+function fetchTaskStatus() {
+  fetch(`/task_status/${currentTaskId}?view=report`)
+    .then(res => res.json())
+    .then(renderTaskStatus);
+}
+
+function renderTaskStatus(task) {
+  const statusIcon = document.getElementById('statusIcon');
+
+  if (task.status === 'done') {
+    if (statusIcon) statusIcon.textContent = '✅';
+    stopProgressUpdates();
+    disableUI(false);
+  } else if (task.status === 'error') {
+    if (statusIcon) statusIcon.textContent = '❌';
+    // planning itself may have failed before any step existed
+    if (currentSteps.length === 0) {
+      const stepsIcon = document.getElementById('stepsIcon');
+      if (stepsIcon) stepsIcon.textContent = '❌';
+    }
+    stopProgressUpdates();
+    disableUI(false);
+  } else if (task.status === 'cancelled' || task.status === 'timed_out') {
+    const icon = task.status === 'cancelled' ? '⏹️' : '⌛';
+    if (statusIcon) statusIcon.textContent = icon;
+    if (currentSteps.length === 0) {
+      const stepsIcon = document.getElementById('stepsIcon');
+      if (stepsIcon) stepsIcon.textContent = icon;
+    }
+    const queueInfo = document.getElementById('queueInfo');
+    if (queueInfo) {
+      queueInfo.textContent = task.status === 'cancelled' ? 'Report cancelled' : 'Report deadline exceeded';
+    }
+    stopProgressUpdates();
+    disableUI(false);
+  }
+
+  if (typeof task.result === 'string') {
+    try { task.result = JSON.parse(task.result); } catch { return; }
+  }
+
+  if (task.status === 'done' && task.result?.html_report) {
+    liveReport = { index: null, title: '', text: '' };
+    finalReportMarkdown = task.result.html_report;
+    document.getElementById('finalOutput').innerHTML = `
+      <h4>📄 Final Report</h4>
+      <div class="mb-2">
+        <button class="btn btn-outline-secondary btn-sm me-2" onclick="downloadMarkdown()">⬇️ Download .md</button>
+        <button class="btn btn-outline-secondary btn-sm" onclick="downloadHTML()">⬇️ Download .html</button>
+      </div>
+      <div id="finalReport">${marked.parse(finalReportMarkdown)}</div>
+    `;
+  }
+}
+
+function getStatusClass(status) {
+  return status === 'done' ? 'text-success' :
+         status === 'running' ? 'text-warning' :
+         status === 'error' || status === 'timed_out' ? 'text-danger' : 'text-muted';
+}
+
+function getStepClass(status) {
+  return status === 'done' ? 'step-done' :
+         status === 'running' ? 'step-running' :
+         status === 'error' || status === 'timed_out' ? 'step-error' : 'step-pending';
+}
+
+function downloadMarkdown() {
+  const blob = new Blob([finalReportMarkdown], { type: 'text/markdown' });
+  const link = document.createElement('a');
+  link.href = URL.createObjectURL(blob);
+  link.download = `final_report_${currentTaskId}.md`;
+  link.click();
+}
+
+function downloadHTML() {
+  const htmlContent = marked.parse(finalReportMarkdown);
+  const blob = new Blob([htmlContent], { type: 'text/html' });
+  const link = document.createElement('a');
+  link.href = URL.createObjectURL(blob);
+  link.download = `final_report_${currentTaskId}.html`;
+  link.click();
+}
@@ -0,0 +1,55 @@
+"""Page-by-page PDF extraction: pdfminer fallback and the character budget."""
+from bench.fake_services import make_pdf
+from src import pdf_extract
+from src.pdf_extract import extract_clean_text, iter_pdf_pages, iter_pdf_text
+
+PDF = make_pdf("Fallback paper", pages=5)
+
+
+def _pymupdf_failing_after(pages: int):
+    real = pdf_extract._iter_pages_pymupdf
+
+    def failing(source, max_pages):
+        for i, text in enumerate(real(source, max_pages)):
+            if i == pages:
+                raise RuntimeError("broken page object")
+            yield text
+
+    return failing
+
+
+def test_pymupdf_failing_partway_falls_back_for_remaining_pages(monkeypatch):
+    expected = list(pdf_extract._iter_pages_pdfminer(PDF, None))
+    monkeypatch.setattr(pdf_extract, "_iter_pages_pymupdf", _pymupdf_failing_after(2))
+
+    pages = list(iter_pdf_pages(PDF))
+
+    assert len(pages) == 5
+    # the last three pages come from pdfminer, in order, none read twice
+    assert pages[2:] == expected[2:]
+    assert len(set(pages)) == 5
+
+
+def test_partway_fallback_respects_max_pages(monkeypatch):
+    monkeypatch.setattr(pdf_extract, "_iter_pages_pymupdf", _pymupdf_failing_after(1))
+
+    assert len(list(iter_pdf_pages(PDF, max_pages=3))) == 3
+
+
+def test_pymupdf_unavailable_uses_pdfminer(monkeypatch):
+    def missing(source, max_pages):
+        raise ImportError("No module named 'fitz'")
+        yield  # pragma: no cover
+
+    monkeypatch.setattr(pdf_extract, "_iter_pages_pymupdf", missing)
+
+    assert len(list(iter_pdf_pages(PDF, max_pages=2))) == 2
+
+
+def test_budget_never_yields_an_empty_slice():
+    first = next(iter_pdf_text(PDF))
+    # the budget runs out exactly at the separator after the first page
+    pages = list(iter_pdf_text(PDF, max_chars=len(first) + 1))
+
+    assert pages == [first]
+    assert extract_clean_text(PDF, max_chars=len(first) + 1) == first
@@ -0,0 +1,93 @@
+"""
+SSE progress across uvicorn workers: two app processes share one SQLite
+database and SQL progress store; a task submitted to one is streamed from
+the other, which only sees it through the store.
+"""
+import os
+import json
+import time
+
+import pytest
+import requests
+
+from bench.fake_services import FakeServices, free_port
+from bench.run import start_app, stop_app
+
+
+def _sse_events(response, timeout: float):
+    deadline = time.monotonic() + timeout
+    event = None
+    for line in response.iter_lines(decode_unicode=True):
+        # keep-alives arrive even when no progress does
+        if time.monotonic() > deadline:
+            pytest.fail(f"no terminal event within {timeout}s")
+        if line.startswith("event: "):
+            event = line[len("event: "):]
+        elif line.startswith("data: ") and event:
+            yield event, json.loads(line[len("data: "):])
+            event = None
+
+
+@pytest.fixture
+def two_apps(tmp_path):
+    fake = FakeServices(
+        llm_ttft=0.05, llm_tokens_per_sec=5000, report_tokens=300, tool_latency=0.05
+    ).start()
+    env = {
+        **os.environ,
+        **fake.env(),
+        "DATABASE_URL": f"sqlite:///{tmp_path}/app.sqlite3",
+        "DB_SCHEMA": "create",
+        "PROGRESS_STORE_URL": "database",
+        "TASK_PROGRESS_RECHECK_SECONDS": "0.2",
+        "EVENTS_HEARTBEAT_SECONDS": "2",
+        "STARTUP_PREWARM": "0",
+        "LLM_CACHE_URL": "off",
+        "LOCAL_CORPUS_PATH": "off",
+        "ARXIV_CACHE_DIR": str(tmp_path / "arxiv"),
+        "ARXIV_API_MIN_INTERVAL_SECONDS": "0",
+    }
+    procs, bases = [], []
+    try:
+        # one after the other, so only the first creates the tables
+        for name in ("a", "b"):
+            proc, base, _ = start_app(env, free_port(), str(tmp_path / f"{name}.log"))
+            procs.append(proc)
+            bases.append(base)
+        yield bases
+    finally:
+        for proc in procs:
+            stop_app(proc)
+        fake.stop()
+
+
+def test_stream_from_other_worker_gets_steps_and_result(two_apps):
+    runner, streamer = two_apps
+    task_id = requests.post(
+        runner + "/generate_report", json={"prompt": "shared store streaming"}, timeout=30
+    ).json()["task_id"]
+
+    events = []
+    with requests.get(f"{streamer}/task_events/{task_id}", stream=True, timeout=60) as r:
+        assert r.status_code == 200
+        for event, data in _sse_events(r, timeout=60):
+            events.append((event, data))
+            if event in ("done", "error", "cancelled", "timed_out"):
+                break
+
+    names = [event for event, _ in events]
+    assert names[0] == "snapshot"
+    assert "step" in names
+    assert names[-1] == "done"
+    result = events[-1][1]["result"]
+    assert result["html_report"]
+
+    # the streamed steps end up as the runner's final progress
+    steps = {}
+    for event, data in events:
+        if event == "snapshot":
+            steps = dict(enumerate(data["steps"]))
+        elif event == "step":
+            steps[data["index"]] = data["step"]
+    final = requests.get(f"{runner}/task_progress/{task_id}", timeout=30).json()
+    assert [steps[i] for i in sorted(steps)] == final["steps"]